@@ -14,6 +14,76 @@ class BotConfig:
     llm_api_key: str
     llm_model_name: str
 
+    # Пул соединений с БД (для SQLite не применяется)
+    db_pool_size: int = 10
+    db_max_overflow: int = 10  # сверх pool_size при пиковой нагрузке
+    db_pool_timeout: float = 30.0  # секунд ждать свободное соединение
+    db_pool_recycle: int = 1800  # пересоздавать соединения старше (с), -1 — никогда
+    db_pool_pre_ping: bool = True  # проверять соединение перед выдачей
+    db_statement_cache_size: int = 100  # 0 — для PgBouncer (pool_mode=transaction)
+    db_slow_query_ms: float = 500.0  # запросы дольше — в лог, 0 — выключено
+
+    # HTTP-клиент hh.ru
+    hh_timeout: float = 10.0
+    hh_connect_timeout: float = 5.0
+    hh_max_connections: int = 20
+    hh_max_keepalive_connections: int = 10
+    hh_keepalive_expiry: float = 30.0
+    hh_http2: bool = False
+    hh_user_agent: str = "hh-bot/1.0"
+    hh_max_pages: int = 5
+    hh_page_concurrency: int = 4
+    hh_rate_per_sec: float = 10.0
+    hh_burst: float = 10.0
+    hh_max_retries: int = 3
+    hh_backoff_base: float = 0.5
+    hh_backoff_max: float = 30.0
+    hh_initial_concurrency: int = 4
+    hh_fetch_employer_details: bool = True
+    hh_dictionaries_from_api: bool = False  # дополнительно подтянуть справочники из API при старте
+    hh_employer_cache_ttl: float = 86400.0
+    hh_employer_cache_max_size: int = 10000
+    hh_detail_ttl: float = 43200.0
+    hh_detail_concurrency: int = 4
+    hh_cache_backend: str = "memory"  # memory | sql | none
+    hh_cache_ttl: float = 300.0
+    hh_cache_max_size: int = 1000
+
+    # Движок подбора вакансий: per_user — запрос к hh.ru на каждый фильтр,
+    # pool — общий пул по регионам + локальный подбор (app/services/vacancy_pool.py)
+    vacancy_engine: str = "per_user"
+    hh_pool_roles: tuple[str, ...] = ()  # professional_role hh.ru, пусто — все
+    hh_pool_max_pages: int = 20
+    hh_pool_interval_minutes: int = 60
+
+    # Ежедневная рассылка
+    digest_concurrency: int = 8  # сколько пользователей (групп) обрабатывать параллельно
+    digest_user_timeout: float = 120.0  # секунд на одного пользователя
+    digest_default_hour: int = 9  # час рассылки по местному времени пользователя
+    digest_jitter_minutes: int = 60  # окно, по которому размазаны слоты
+    digest_tick_minutes: int = 5  # как часто планировщик забирает наступившие слоты
+    digest_batch_size: int = 200  # не больше стольких пользователей за тик
+    digest_lease_seconds: float = 600.0  # аренда задания рассылки, продлевается heartbeat'ом
+    digest_max_attempts: int = 3  # после стольких неудач задание помечается failed
+    digest_max_lag_hours: float = 6.0  # слоты старше этого после простоя не догоняем
+
+    # Outbox уведомлений
+    outbox_poll_seconds: int = 30  # как часто отправитель проверяет outbox
+    outbox_batch_size: int = 500  # уведомлений за одну аренду
+    outbox_lease_seconds: float = 300.0  # продлевается heartbeat'ом, пока идёт отправка
+    outbox_max_attempts: int = 5  # неудачных отправок до статуса failed
+    outbox_max_backlog: int = 50  # отложенных уведомлений на пользователя, старшие отменяются
+
+    # Исходящие сообщения Telegram
+    telegram_global_rate: float = 30.0  # сообщений в секунду на бота
+    telegram_chat_rate: float = 1.0  # сообщений в секунду в один чат
+    telegram_send_workers: int = 4
+    telegram_max_retries: int = 3  # повторы на TelegramRetryAfter
+
+    # Метрики Prometheus (GET /metrics); порт 0 — эндпоинт выключен
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+
 
 TG_BOT_API_KEY = os.getenv("TG_BOT_API_KEY")
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -21,6 +91,14 @@ LLM_BASE_URL = os.getenv("LLM_BASE_URL")
 LLM_API_KEY = os.getenv("LLM_API_KEY")
 LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME")
 
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 if not TG_BOT_API_KEY:
     raise RuntimeError("TG_BOT_API_KEY is not set in .env")
 if not DATABASE_URL:
@@ -34,4 +112,59 @@ config = BotConfig(
     llm_base_url=LLM_BASE_URL,
     llm_api_key=LLM_API_KEY,
     llm_model_name=LLM_MODEL_NAME,
+    db_pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    db_pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    db_pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    db_pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+    db_statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+    db_slow_query_ms=float(os.getenv("DB_SLOW_QUERY_MS", "500")),
+    hh_timeout=float(os.getenv("HH_TIMEOUT", "10")),
+    hh_connect_timeout=float(os.getenv("HH_CONNECT_TIMEOUT", "5")),
+    hh_max_connections=int(os.getenv("HH_MAX_CONNECTIONS", "20")),
+    hh_max_keepalive_connections=int(os.getenv("HH_MAX_KEEPALIVE_CONNECTIONS", "10")),
+    hh_keepalive_expiry=float(os.getenv("HH_KEEPALIVE_EXPIRY", "30")),
+    hh_http2=_env_bool("HH_HTTP2", False),
+    hh_user_agent=os.getenv("HH_USER_AGENT", "hh-bot/1.0"),
+    hh_max_pages=int(os.getenv("HH_MAX_PAGES", "5")),
+    hh_page_concurrency=int(os.getenv("HH_PAGE_CONCURRENCY", "4")),
+    hh_rate_per_sec=float(os.getenv("HH_RATE_PER_SEC", "10")),
+    hh_burst=float(os.getenv("HH_BURST", "10")),
+    hh_max_retries=int(os.getenv("HH_MAX_RETRIES", "3")),
+    hh_backoff_base=float(os.getenv("HH_BACKOFF_BASE", "0.5")),
+    hh_backoff_max=float(os.getenv("HH_BACKOFF_MAX", "30")),
+    hh_initial_concurrency=int(os.getenv("HH_INITIAL_CONCURRENCY", "4")),
+    hh_fetch_employer_details=_env_bool("HH_FETCH_EMPLOYER_DETAILS", True),
+    hh_dictionaries_from_api=_env_bool("HH_DICTIONARIES_FROM_API", False),
+    hh_employer_cache_ttl=float(os.getenv("HH_EMPLOYER_CACHE_TTL", "86400")),
+    hh_employer_cache_max_size=int(os.getenv("HH_EMPLOYER_CACHE_MAX_SIZE", "10000")),
+    hh_detail_ttl=float(os.getenv("HH_DETAIL_TTL", "43200")),
+    hh_detail_concurrency=int(os.getenv("HH_DETAIL_CONCURRENCY", "4")),
+    hh_cache_backend=os.getenv("HH_CACHE_BACKEND", "memory"),
+    hh_cache_ttl=float(os.getenv("HH_CACHE_TTL", "300")),
+    hh_cache_max_size=int(os.getenv("HH_CACHE_MAX_SIZE", "1000")),
+    vacancy_engine=os.getenv("VACANCY_ENGINE", "per_user"),
+    hh_pool_roles=tuple(r.strip() for r in os.getenv("HH_POOL_ROLES", "").split(",") if r.strip()),
+    hh_pool_max_pages=int(os.getenv("HH_POOL_MAX_PAGES", "20")),
+    hh_pool_interval_minutes=int(os.getenv("HH_POOL_INTERVAL_MINUTES", "60")),
+    digest_concurrency=int(os.getenv("DIGEST_CONCURRENCY", "8")),
+    digest_user_timeout=float(os.getenv("DIGEST_USER_TIMEOUT", "120")),
+    digest_default_hour=int(os.getenv("DIGEST_DEFAULT_HOUR", "9")),
+    digest_jitter_minutes=int(os.getenv("DIGEST_JITTER_MINUTES", "60")),
+    digest_tick_minutes=int(os.getenv("DIGEST_TICK_MINUTES", "5")),
+    digest_batch_size=int(os.getenv("DIGEST_BATCH_SIZE", "200")),
+    digest_lease_seconds=float(os.getenv("DIGEST_LEASE_SECONDS", "600")),
+    digest_max_attempts=int(os.getenv("DIGEST_MAX_ATTEMPTS", "3")),
+    digest_max_lag_hours=float(os.getenv("DIGEST_MAX_LAG_HOURS", "6")),
+    outbox_poll_seconds=int(os.getenv("OUTBOX_POLL_SECONDS", "30")),
+    outbox_batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "500")),
+    outbox_lease_seconds=float(os.getenv("OUTBOX_LEASE_SECONDS", "300")),
+    outbox_max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5")),
+    outbox_max_backlog=int(os.getenv("OUTBOX_MAX_BACKLOG", "50")),
+    telegram_global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", "30")),
+    telegram_chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE", "1")),
+    telegram_send_workers=int(os.getenv("TELEGRAM_SEND_WORKERS", "4")),
+    telegram_max_retries=int(os.getenv("TELEGRAM_MAX_RETRIES", "3")),
+    metrics_host=os.getenv("METRICS_HOST", "127.0.0.1"),
+    metrics_port=int(os.getenv("METRICS_PORT", "0")),
 )
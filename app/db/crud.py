@@ -1,10 +1,37 @@
 from datetime import datetime
-from typing import Sequence
+from typing import Any, AsyncIterator, Sequence
+import time
 
-from sqlalchemy import select, insert
+from sqlalchemy import Select, exists, false, select, insert, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
-from .models import User, SearchFilter, Vacancy, UserVacancy, VacancyStatus
+from app.utils.compression import compress_json, decompress_json
+from app.utils.metrics import Counter, Histogram
+
+from .models import (
+    User,
+    SearchFilter,
+    SearchCursor,
+    GeneratedDocument,
+    PoolCursor,
+    Vacancy,
+    VacancyPayload,
+    VacancyDetail,
+    UserVacancy,
+    VacancyStatus,
+    NotificationOutbox,
+    OutboxStatus,
+)
+
+# Скорость загрузки вакансий: rate(ingest_rows_total) — строк в секунду
+INGEST_ROWS = Counter(
+    "ingest_rows_total", "Vacancy rows passed to bulk upsert", ("result",)
+)
+INGEST_BATCH_SECONDS = Histogram(
+    "ingest_batch_seconds", "Time to upsert one batch of vacancies"
+)
 
 
 async def get_or_create_user(session: AsyncSession, telegram_id: int) -> User:
@@ -31,6 +58,9 @@ async def update_user_profile(
     if full_name is not None:
         user.full_name = full_name
     if city is not None:
+        if city != user.city:
+            # часовой пояс мог смениться — слот рассылки назначится заново
+            user.next_digest_at = None
         user.city = city
     if desired_position is not None:
         user.desired_position = desired_position
@@ -44,6 +74,15 @@ async def update_user_profile(
     return user
 
 
+async def set_digest_hour(session: AsyncSession, user: User, hour: int | None) -> User:
+    """Меняет час рассылки; слот пересчитается на ближайшем тике планировщика."""
+    user.digest_hour = hour
+    user.next_digest_at = None
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
 # app/db/crud.py
 
 from sqlalchemy import select
@@ -58,6 +97,7 @@ async def upsert_search_filters(
     city: str | None,
     min_salary: int | None,
     metro_stations: list[str] | None,
+    metro_ids: list[str] | None,
     freshness_days: int | None,
     employment_types: list[str] | None,
     experience_level: str | None,
@@ -77,6 +117,7 @@ async def upsert_search_filters(
     filt.city = city
     filt.min_salary = min_salary
     filt.metro_stations = metro_stations
+    filt.metro_ids = metro_ids
     filt.freshness_days = freshness_days
     filt.employment_types = employment_types
     filt.experience_level = experience_level
@@ -89,22 +130,131 @@ async def upsert_search_filters(
     return filt
 
 
+# Поля пользователя, которые нужны поиску и рассылке. Резюме и навыки
+# (большие Text-колонки) в фоновых задачах не читаются.
+DIGEST_USER_COLUMNS = (User.id, User.telegram_id, User.city, User.desired_position)
+
+# Строк за одну выборку из курсора при потоковом чтении пользователей
+DIGEST_STREAM_CHUNK = 500
+
+
+async def stream_digest_targets(
+    session: AsyncSession,
+    user_ids: Sequence[int] | None = None,
+    chunk_size: int = DIGEST_STREAM_CHUNK,
+) -> AsyncIterator[tuple[User, SearchFilter]]:
+    """
+    Пары (пользователь, фильтр) для фоновых задач — одним запросом с JOIN,
+    без пользователей без фильтра. Строки читаются серверным курсором
+    порциями по chunk_size; у пользователя загружены только
+    DIGEST_USER_COLUMNS, обращение к остальным полям — ошибка, а не
+    скрытый запрос.
+    """
+    query = (
+        select(User, SearchFilter)
+        .join(SearchFilter, SearchFilter.user_id == User.id)
+        .options(load_only(*DIGEST_USER_COLUMNS, raiseload=True))
+        .order_by(User.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if user_ids is not None:
+        query = query.where(User.id.in_(list(user_ids)))
+    result = await session.stream(query)
+    async for user, filt in result.tuples():
+        yield user, filt
+
+
+async def stream_digest_user_ids(
+    session: AsyncSession,
+    user_ids: Sequence[int] | None = None,
+    chunk_size: int = DIGEST_STREAM_CHUNK,
+) -> AsyncIterator[int]:
+    """Только id пользователей с фильтром — когда сам фильтр не нужен."""
+    query = (
+        select(User.id)
+        .where(exists().where(SearchFilter.user_id == User.id))
+        .order_by(User.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if user_ids is not None:
+        query = query.where(User.id.in_(list(user_ids)))
+    result = await session.stream_scalars(query)
+    async for user_id in result:
+        yield user_id
+
+
+def _unsent_query(user_id: int, limit: int, before_id: int | None = None) -> Select:
+    # индекс ix_user_vacancies_unsent: (user_id, status, skipped, id)
+    query = (
+        select(UserVacancy.id, Vacancy)
+        .join(Vacancy, Vacancy.id == UserVacancy.vacancy_id)
+        .where(
+            UserVacancy.user_id == user_id,
+            UserVacancy.status == VacancyStatus.new,
+            UserVacancy.skipped == false(),
+        )
+        .order_by(UserVacancy.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        query = query.where(UserVacancy.id < before_id)
+    return query
+
+
+def _history_query(user_id: int, limit: int, before_id: int | None = None) -> Select:
+    # индекс ix_user_vacancies_user_id_id: (user_id, id)
+    query = (
+        select(UserVacancy, Vacancy)
+        .join(Vacancy, Vacancy.id == UserVacancy.vacancy_id)
+        .where(UserVacancy.user_id == user_id)
+        .order_by(UserVacancy.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        query = query.where(UserVacancy.id < before_id)
+    return query
+
+
 async def get_unsent_vacancies_for_user(
     session: AsyncSession,
     user: User,
     limit: int = 10,
+    before_id: int | None = None,
 ) -> Sequence[Vacancy]:
-    stmt = (
-        select(Vacancy)
-        .join(UserVacancy, UserVacancy.vacancy_id == Vacancy.id)
-        .where(
-            UserVacancy.user_id == user.id,
-            UserVacancy.status == VacancyStatus.new,
+    """
+    Непоказанные вакансии пользователя, новые первыми, без скрытых («Не
+    интересно»). Постранично — по ключу: before_id — id связки
+    user_vacancies, на которой закончилась прошлая страница.
+    """
+    result = await session.execute(_unsent_query(user.id, limit, before_id))
+    return [vacancy for _, vacancy in result.tuples().all()]
+
+
+async def get_user_history(
+    session: AsyncSession,
+    user_id: int,
+    limit: int = 10,
+    before_id: int | None = None,
+) -> list[tuple[UserVacancy, Vacancy]]:
+    """Последние связки пользователя с вакансиями, новые первыми (по ключу, как выше)."""
+    result = await session.execute(_history_query(user_id, limit, before_id))
+    return list(result.tuples().all())
+
+
+async def get_documents_for_vacancies(
+    session: AsyncSession,
+    user_id: int,
+    vacancy_ids: Sequence[int],
+) -> list[GeneratedDocument]:
+    if not vacancy_ids:
+        return []
+    result = await session.execute(
+        select(GeneratedDocument).where(
+            GeneratedDocument.user_id == user_id,
+            GeneratedDocument.vacancy_id.in_(list(vacancy_ids)),
         )
-        .limit(limit)
     )
-    result = await session.execute(stmt)
-    return result.scalars().all()
+    return list(result.scalars().all())
 
 
 async def mark_vacancies_as_sent(
@@ -131,4 +281,319 @@ async def mark_vacancies_as_sent(
     for uv in links:
         uv.status = VacancyStatus.sent
 
+    # показанное вручную (/vacancies) в рассылку уже не попадёт
+    await session.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.user_id == user.id,
+            NotificationOutbox.vacancy_id.in_(vac_ids),
+            NotificationOutbox.status == OutboxStatus.pending,
+        )
+        .values(status=OutboxStatus.sent, sent_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
     await session.commit()
+
+
+def upsert_insert(session: AsyncSession):
+    """
+    insert() с поддержкой ON CONFLICT для текущего диалекта
+    или None, если диалект (или его версия) этого не умеет.
+    """
+    dialect = session.get_bind().dialect
+    if not dialect.insert_returning:
+        return None
+    if dialect.name == "postgresql":
+        return postgresql.insert
+    if dialect.name == "sqlite":
+        return sqlite.insert
+    return None
+
+
+# строк в одном INSERT вакансий: по ~13 параметров на строку, а у asyncpg
+# не больше 32767 параметров в запросе (у SQLite своё ограничение)
+VACANCY_CHUNK_SIZE = 1000
+
+
+async def bulk_upsert_vacancies(
+    session: AsyncSession,
+    rows: list[dict[str, Any]],
+) -> tuple[list[Vacancy], dict[str, int]]:
+    """
+    Вставляет вакансии пачками по VACANCY_CHUNK_SIZE, по несколько
+    запросов на пачку.
+
+    Возвращает (новые вакансии, {hh_id: id} для всех строк).
+    Уже существующие вакансии не трогаем (ON CONFLICT DO NOTHING).
+    Ключ "raw" строки (полный item hh.ru) сжимается и пишется
+    в vacancy_payloads — только для новых вакансий.
+    """
+    if not rows:
+        return [], {}
+    started = time.perf_counter()
+
+    # внутри одной пачки hh_id должны быть уникальны
+    rows = list({row["hh_id"]: row for row in rows}.values())
+    raw_by_hh_id = {row["hh_id"]: row["raw"] for row in rows if row.get("raw") is not None}
+    rows = [{k: v for k, v in row.items() if k != "raw"} for row in rows]
+
+    on_conflict_insert = upsert_insert(session)
+    new_vacancies: list[Vacancy] = []
+    ids_by_hh_id: dict[str, int] = {}
+
+    for start in range(0, len(rows), VACANCY_CHUNK_SIZE):
+        chunk = rows[start : start + VACANCY_CHUNK_SIZE]
+        hh_ids = [row["hh_id"] for row in chunk]
+
+        if on_conflict_insert is not None:
+            stmt = (
+                on_conflict_insert(Vacancy)
+                .values(chunk)
+                .on_conflict_do_nothing(index_elements=[Vacancy.hh_id])
+                .returning(Vacancy)
+            )
+            result = await session.scalars(stmt)
+            chunk_new = list(result.all())
+        else:
+            # Фолбэк без ON CONFLICT: один select существующих + одна пачка insert
+            result = await session.execute(
+                select(Vacancy.hh_id).where(Vacancy.hh_id.in_(hh_ids))
+            )
+            existing = set(result.scalars().all())
+            chunk_new = [Vacancy(**row) for row in chunk if row["hh_id"] not in existing]
+            session.add_all(chunk_new)
+            await session.flush()
+
+        payload_rows = []
+        for vacancy in chunk_new:
+            raw = raw_by_hh_id.get(vacancy.hh_id)
+            if raw is not None:
+                codec, data = compress_json(raw)
+                payload_rows.append({"vacancy_id": vacancy.id, "codec": codec, "data": data})
+        if payload_rows:
+            await session.execute(insert(VacancyPayload), payload_rows)
+
+        ids_by_hh_id.update((v.hh_id, v.id) for v in chunk_new)
+        missing = [hh_id for hh_id in hh_ids if hh_id not in ids_by_hh_id]
+        if missing:
+            result = await session.execute(
+                select(Vacancy.hh_id, Vacancy.id).where(Vacancy.hh_id.in_(missing))
+            )
+            ids_by_hh_id.update(dict(result.tuples().all()))
+        new_vacancies.extend(chunk_new)
+
+    INGEST_ROWS.labels("new").inc(len(new_vacancies))
+    INGEST_ROWS.labels("existing").inc(len(rows) - len(new_vacancies))
+    INGEST_BATCH_SECONDS.observe(time.perf_counter() - started)
+    return new_vacancies, ids_by_hh_id
+
+
+async def get_vacancy_raw(session: AsyncSession, vacancy_id: int) -> dict | None:
+    """Полный item hh.ru для вакансии (или None, если его не сохраняли)."""
+    payload = await session.get(VacancyPayload, vacancy_id)
+    if payload is None:
+        return None
+    return decompress_json(payload.codec, payload.data)
+
+
+async def get_vacancy_details(
+    session: AsyncSession,
+    vacancy_ids: list[int],
+) -> dict[int, VacancyDetail]:
+    if not vacancy_ids:
+        return {}
+    result = await session.execute(
+        select(VacancyDetail).where(VacancyDetail.vacancy_id.in_(vacancy_ids))
+    )
+    return {d.vacancy_id: d for d in result.scalars().all()}
+
+
+async def upsert_vacancy_details(
+    session: AsyncSession,
+    rows: list[dict[str, Any]],
+) -> None:
+    """
+    Записывает описания вакансий одним запросом (без commit).
+    Два пользователя могут одновременно догрузить одну вакансию —
+    побеждает последняя запись, ошибки уникальности нет.
+    """
+    if not rows:
+        return
+
+    on_conflict_insert = upsert_insert(session)
+    if on_conflict_insert is not None:
+        stmt = on_conflict_insert(VacancyDetail).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VacancyDetail.vacancy_id],
+            set_={
+                col: stmt.excluded[col]
+                for col in ("description", "key_skills", "etag", "fetched_at", "expires_at")
+            },
+        )
+        await session.execute(stmt)
+        return
+
+    for row in rows:
+        await session.merge(VacancyDetail(**row))
+    await session.flush()
+
+
+# строк в одном INSERT: у SQLite ограничено число параметров запроса
+LINK_CHUNK_SIZE = 1000
+
+
+async def link_user_vacancies(
+    session: AsyncSession,
+    pairs: list[tuple[int, int]],
+) -> list[tuple[int, int]]:
+    """
+    Привязывает вакансии к пользователям пачками (пары user_id, vacancy_id).
+    Возвращает пары, которые привязаны впервые.
+
+    ON CONFLICT DO NOTHING по uq_user_vacancy делает вставку безопасной,
+    даже если два поиска для одного пользователя идут одновременно.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    created: list[tuple[int, int]] = []
+    on_conflict_insert = upsert_insert(session)
+
+    for start in range(0, len(pairs), LINK_CHUNK_SIZE):
+        chunk = pairs[start : start + LINK_CHUNK_SIZE]
+        rows = [
+            {"user_id": uid, "vacancy_id": vid, "status": VacancyStatus.new, "skipped": False}
+            for uid, vid in chunk
+        ]
+
+        if on_conflict_insert is not None:
+            stmt = (
+                on_conflict_insert(UserVacancy)
+                .values(rows)
+                .on_conflict_do_nothing(
+                    index_elements=[UserVacancy.user_id, UserVacancy.vacancy_id]
+                )
+                .returning(UserVacancy.user_id, UserVacancy.vacancy_id)
+            )
+            result = await session.execute(stmt)
+            created.extend(result.tuples().all())
+            continue
+
+        result = await session.execute(
+            select(UserVacancy.user_id, UserVacancy.vacancy_id).where(
+                tuple_(UserVacancy.user_id, UserVacancy.vacancy_id).in_(chunk)
+            )
+        )
+        existing = set(result.tuples().all())
+        new_rows = [row for row in rows if (row["user_id"], row["vacancy_id"]) not in existing]
+        if new_rows:
+            await session.execute(insert(UserVacancy), new_rows)
+        created.extend((row["user_id"], row["vacancy_id"]) for row in new_rows)
+
+    await enqueue_notifications(session, created)
+    return created
+
+
+def notification_key(user_id: int, vacancy_id: int) -> str:
+    return f"{user_id}:{vacancy_id}"
+
+
+async def enqueue_notifications(
+    session: AsyncSession,
+    pairs: list[tuple[int, int]],
+) -> None:
+    """
+    Кладёт уведомления о новых связках в outbox (без commit — в той же
+    транзакции, что и сами связки). Ключ идемпотентности не даст поставить
+    одну вакансию одному пользователю дважды.
+    """
+    on_conflict_insert = upsert_insert(session)
+    now = datetime.utcnow()
+    for start in range(0, len(pairs), LINK_CHUNK_SIZE):
+        chunk = pairs[start : start + LINK_CHUNK_SIZE]
+        rows = [
+            {
+                "user_id": uid,
+                "vacancy_id": vid,
+                "idempotency_key": notification_key(uid, vid),
+                "status": OutboxStatus.pending,
+                "attempts": 0,
+                "created_at": now,
+            }
+            for uid, vid in chunk
+        ]
+
+        if on_conflict_insert is not None:
+            await session.execute(
+                on_conflict_insert(NotificationOutbox)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=[NotificationOutbox.idempotency_key])
+            )
+            continue
+
+        result = await session.execute(
+            select(NotificationOutbox.idempotency_key).where(
+                NotificationOutbox.idempotency_key.in_([r["idempotency_key"] for r in rows])
+            )
+        )
+        existing = set(result.scalars().all())
+        new_rows = [row for row in rows if row["idempotency_key"] not in existing]
+        if new_rows:
+            await session.execute(insert(NotificationOutbox), new_rows)
+
+
+async def link_vacancies_to_user(
+    session: AsyncSession,
+    user_id: int,
+    vacancy_ids: list[int],
+) -> list[int]:
+    """Привязывает вакансии к одному пользователю; возвращает id впервые привязанных."""
+    created = await link_user_vacancies(session, [(user_id, vid) for vid in vacancy_ids])
+    return [vid for _, vid in created]
+
+
+async def get_search_cursors(
+    session: AsyncSession,
+    filter_ids: list[int],
+) -> dict[int, SearchCursor]:
+    if not filter_ids:
+        return {}
+    result = await session.execute(
+        select(SearchCursor).where(SearchCursor.filter_id.in_(filter_ids))
+    )
+    return {c.filter_id: c for c in result.scalars().all()}
+
+
+async def save_search_cursor(
+    session: AsyncSession,
+    filt: SearchFilter,
+    cursor: SearchCursor | None,
+    last_published_at: datetime | None,
+    last_hh_ids: list[str],
+) -> SearchCursor:
+    """Сдвигает отметку фильтра (без commit — он на вызывающем)."""
+    if cursor is None:
+        cursor = SearchCursor(filter_id=filt.id)
+        session.add(cursor)
+    cursor.filter_updated_at = filt.updated_at
+    cursor.last_published_at = last_published_at
+    cursor.last_hh_ids = last_hh_ids
+    return cursor
+
+
+async def get_pool_cursor(session: AsyncSession, key: str) -> PoolCursor | None:
+    return await session.get(PoolCursor, key)
+
+
+async def save_pool_cursor(
+    session: AsyncSession,
+    key: str,
+    cursor: PoolCursor | None,
+    last_published_at: datetime | None,
+    last_hh_ids: list[str],
+) -> PoolCursor:
+    """Сдвигает отметку среза пула (без commit — он на вызывающем)."""
+    if cursor is None:
+        cursor = PoolCursor(key=key)
+        session.add(cursor)
+    cursor.last_published_at = last_published_at
+    cursor.last_hh_ids = last_hh_ids
+    return cursor
@@ -8,9 +8,11 @@ from sqlalchemy import (
     Enum,
     ForeignKey,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
+    Index,
     JSON,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -34,6 +36,27 @@ class VacancyStatus(str, enum.Enum):
     applied = "applied"
 
 
+class DigestItemStatus(str, enum.Enum):
+    pending = "pending"
+    leased = "leased"
+    done = "done"
+    failed = "failed"
+
+
+class DigestRunStatus(str, enum.Enum):
+    running = "running"
+    finished = "finished"
+    interrupted = "interrupted"
+
+
+class OutboxStatus(str, enum.Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
 class DocumentType(str, enum.Enum):
     resume = "resume"
     cover_letter = "cover_letter"
@@ -51,6 +74,11 @@ class User(Base):
     base_resume: Mapped[str | None] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    # Час рассылки по местному времени (None — час по умолчанию из конфига)
+    digest_hour: Mapped[int | None] = mapped_column(Integer)
+    # Следующий слот рассылки (UTC); None — слот ещё не назначен
+    next_digest_at: Mapped[datetime | None] = mapped_column(DateTime, index=True)
+
     search_filters = relationship("SearchFilter", back_populates="user", uselist=False)
 
 
@@ -65,6 +93,8 @@ class SearchFilter(Base):
     min_salary: Mapped[int | None] = mapped_column(Integer)
 
     metro_stations: Mapped[list[str] | None] = mapped_column(JSON)
+    # id станций hh.ru, распознанные из metro_stations при сохранении фильтра
+    metro_ids: Mapped[list[str] | None] = mapped_column(JSON)
     freshness_days: Mapped[int] = mapped_column(Integer, default=1)
 
     employment_types: Mapped[list[str] | None] = mapped_column(
@@ -82,6 +112,39 @@ class SearchFilter(Base):
     user = relationship("User", back_populates="search_filters")
 
 
+class SearchCursor(Base):
+    """
+    Высшая отметка инкрементальной загрузки для фильтра: до какого
+    published_at мы уже всё видели. Сбрасывается, когда меняется фильтр.
+    """
+
+    __tablename__ = "search_cursors"
+
+    filter_id: Mapped[int] = mapped_column(
+        ForeignKey("search_filters.id", ondelete="CASCADE"), primary_key=True
+    )
+    filter_updated_at: Mapped[datetime] = mapped_column(DateTime)
+    last_published_at: Mapped[datetime | None] = mapped_column(DateTime)
+    # hh_id вакансий, опубликованных ровно в last_published_at
+    last_hh_ids: Mapped[list[str] | None] = mapped_column(JSON)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class PoolCursor(Base):
+    """Отметка загрузки общего пула вакансий для одного среза (регион + роли)."""
+
+    __tablename__ = "pool_cursors"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_published_at: Mapped[datetime | None] = mapped_column(DateTime)
+    last_hh_ids: Mapped[list[str] | None] = mapped_column(JSON)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
 class Vacancy(Base):
     __tablename__ = "vacancies"
 
@@ -96,13 +159,57 @@ class Vacancy(Base):
     url: Mapped[str] = mapped_column(String(512))
     published_at: Mapped[datetime | None] = mapped_column(DateTime)
 
-    raw: Mapped[dict | None] = mapped_column(JSON)
+    employer_id: Mapped[str | None] = mapped_column(String(50))
+    # requirement + responsibility из выдачи поиска, без разметки hh.ru
+    snippet: Mapped[str | None] = mapped_column(Text)
+    schedule: Mapped[str | None] = mapped_column(String(50))  # fullDay, remote, ...
+    experience: Mapped[str | None] = mapped_column(String(50))  # noExperience, between1And3, ...
+
+
+class VacancyPayload(Base):
+    """
+    Полный item из выдачи hh.ru, сжатый (zstd или zlib).
+    Лежит отдельно от vacancies, чтобы списки не тянули его из БД;
+    читается только по требованию — crud.get_vacancy_raw().
+    """
+
+    __tablename__ = "vacancy_payloads"
+
+    vacancy_id: Mapped[int] = mapped_column(
+        ForeignKey("vacancies.id", ondelete="CASCADE"), primary_key=True
+    )
+    codec: Mapped[str] = mapped_column(String(10))
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+class VacancyDetail(Base):
+    """
+    Полное описание вакансии из /vacancies/{id}, уже очищенное от HTML.
+    Общее для всех пользователей; после expires_at перепроверяется
+    условным запросом с ETag.
+    """
+
+    __tablename__ = "vacancy_details"
+
+    vacancy_id: Mapped[int] = mapped_column(
+        ForeignKey("vacancies.id", ondelete="CASCADE"), primary_key=True
+    )
+    description: Mapped[str | None] = mapped_column(Text)
+    key_skills: Mapped[list[str] | None] = mapped_column(JSON)
+    etag: Mapped[str | None] = mapped_column(String(255))
+    fetched_at: Mapped[datetime] = mapped_column(DateTime)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
 
 
 class UserVacancy(Base):
     __tablename__ = "user_vacancies"
     __table_args__ = (
         UniqueConstraint("user_id", "vacancy_id", name="uq_user_vacancy"),
+        # непоказанные вакансии пользователя, новые первыми (/vacancies):
+        # все условия — равенства, дальше id по порядку, без сортировки
+        Index("ix_user_vacancies_unsent", "user_id", "status", "skipped", "id"),
+        # история пользователя, новые первыми (/history)
+        Index("ix_user_vacancies_user_id_id", "user_id", "id"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -119,6 +226,9 @@ class UserVacancy(Base):
 
 class GeneratedDocument(Base):
     __tablename__ = "generated_documents"
+    __table_args__ = (
+        Index("ix_generated_documents_user_vacancy", "user_id", "vacancy_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
@@ -128,3 +238,95 @@ class GeneratedDocument(Base):
     doc_type: Mapped[DocumentType] = mapped_column(Enum(DocumentType))
     content: Mapped[str] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class HHResponseCacheEntry(Base):
+    __tablename__ = "hh_response_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    payload: Mapped[dict] = mapped_column(JSON)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class DigestRun(Base):
+    """
+    Прогон рассылки: одна аренда заданий одним процессом. Пока прогон жив,
+    heartbeat двигает heartbeat_at; прогон без heartbeat'а — прерван.
+    """
+
+    __tablename__ = "digest_runs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    worker: Mapped[str] = mapped_column(String(128))
+    status: Mapped[DigestRunStatus] = mapped_column(
+        Enum(DigestRunStatus), default=DigestRunStatus.running, index=True
+    )
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime)
+    users: Mapped[int] = mapped_column(Integer, default=0)
+    processed: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class DigestWorkItem(Base):
+    """
+    Задание рассылки: один пользователь в одном слоте. Процесс бота берёт
+    задание в аренду (lease) и продлевает её, пока работает; аренда
+    упавшего процесса истекает, и задание забирает другой.
+    """
+
+    __tablename__ = "digest_work_items"
+    __table_args__ = (
+        UniqueConstraint("user_id", "slot_at", name="uq_digest_work_item_slot"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    slot_at: Mapped[datetime] = mapped_column(DateTime)
+    status: Mapped[DigestItemStatus] = mapped_column(
+        Enum(DigestItemStatus), default=DigestItemStatus.pending, index=True
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # последний прогон, который брал задание
+    run_id: Mapped[int | None] = mapped_column(
+        ForeignKey("digest_runs.id", ondelete="SET NULL"), index=True
+    )
+    lease_owner: Mapped[str | None] = mapped_column(String(128))
+    lease_token: Mapped[str | None] = mapped_column(String(32), index=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime)
+    error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime)
+
+
+class NotificationOutbox(Base):
+    """
+    Уведомление о вакансии, которое нужно доставить пользователю.
+    Пишется в той же транзакции, что и связка user_vacancies, а доставляется
+    отдельным отправителем (app/services/notification_outbox.py).
+    """
+
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_due", "status", "available_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    vacancy_id: Mapped[int] = mapped_column(
+        ForeignKey("vacancies.id", ondelete="CASCADE")
+    )
+    # одно уведомление на пару пользователь-вакансия, сколько бы раз её ни нашли
+    idempotency_key: Mapped[str] = mapped_column(String(64), unique=True)
+    status: Mapped[OutboxStatus] = mapped_column(
+        Enum(OutboxStatus), default=OutboxStatus.pending
+    )
+    # None — ждёт слота рассылки пользователя; иначе — когда можно отправлять
+    available_at: Mapped[datetime | None] = mapped_column(DateTime)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    lease_token: Mapped[str | None] = mapped_column(String(32), index=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime)
+    error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime)
@@ -4,12 +4,10 @@ from aiogram import Router, F, Dispatcher
 from aiogram.types import Message
 from sqlalchemy import select
 
+from app.db.crud import get_documents_for_vacancies, get_user_history
 from app.db.session import get_session
 from app.db.models import (
     User,
-    Vacancy,
-    UserVacancy,
-    GeneratedDocument,
     DocumentType,
     VacancyStatus,
 )
@@ -37,15 +35,7 @@ async def cmd_history(message: Message):
             return
 
         # 2) Берём последние 10 записей user_vacancies
-        uv_stmt = (
-            select(UserVacancy, Vacancy)
-            .join(Vacancy, Vacancy.id == UserVacancy.vacancy_id)
-            .where(UserVacancy.user_id == user.id)
-            .order_by(UserVacancy.id.desc())
-            .limit(10)
-        )
-        uv_result = await session.execute(uv_stmt)
-        rows = uv_result.all()
+        rows = await get_user_history(session, user.id, limit=10)
 
         if not rows:
             await message.answer("История пока пуста. Попробуйте команду /vacancies.")
@@ -54,12 +44,7 @@ async def cmd_history(message: Message):
         # Соберём id вакансий, чтобы одним запросом вытащить документы
         vacancy_ids = {vac.id for (_uv, vac) in rows}
 
-        doc_stmt = select(GeneratedDocument).where(
-            GeneratedDocument.user_id == user.id,
-            GeneratedDocument.vacancy_id.in_(vacancy_ids),
-        )
-        doc_result = await session.execute(doc_stmt)
-        docs = doc_result.scalars().all()
+        docs = await get_documents_for_vacancies(session, user.id, list(vacancy_ids))
 
         # Сгруппируем документы по вакансии
         docs_by_vacancy: dict[int, dict[str, bool]] = {}
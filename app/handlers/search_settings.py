@@ -14,7 +14,10 @@ from sqlalchemy import delete
 
 from app.db.session import get_session
 from app.db.crud import get_or_create_user, upsert_search_filters
-from app.db.models import CompanySize, UserVacancy, VacancyStatus
+from app.db.models import CompanySize, SearchCursor, UserVacancy, VacancyStatus
+from app.services.areas import get_area_index, resolve_area_id
+from app.services.metro import get_metro_index
+from app.services.title_matcher import get_title_matcher
 
 router = Router()
 
@@ -56,7 +59,37 @@ async def set_position(message: Message, state: FSMContext):
 
 @router.message(SearchSettingsStates.city)
 async def set_city(message: Message, state: FSMContext):
-    await state.update_data(city=(message.text or "").strip())
+    text = (message.text or "").strip()
+
+    if text.lower() in ("пропустить", "/skip", "любой"):
+        city = ""
+    else:
+        # город не угадываем: если справочник сомневается — переспрашиваем
+        index = get_area_index()
+        area = index.resolve(text)
+        if area is None:
+            suggestions = [a.name for a in index.suggest(text)]
+            kb = ReplyKeyboardMarkup(
+                keyboard=[[KeyboardButton(text=name)] for name in suggestions]
+                + [[KeyboardButton(text="Пропустить")]],
+                resize_keyboard=True,
+                one_time_keyboard=True,
+            )
+            hint = (
+                "Возможно, имелось в виду: " + ", ".join(suggestions) + "?\n"
+                if suggestions
+                else ""
+            )
+            await message.answer(
+                f"Не нашёл город «{text}» в справочнике hh.ru.\n"
+                + hint
+                + "Напиши название точнее или нажми «Пропустить».",
+                reply_markup=kb,
+            )
+            return
+        city = area.name
+
+    await state.update_data(city=city)
     await state.set_state(SearchSettingsStates.min_salary)
     await message.answer(
         "Минимальная желаемая зарплата (число)?\nЕсли без ограничения — напиши 0."
@@ -110,7 +143,26 @@ async def set_metro(message: Message, state: FSMContext):
         if not metro_stations:
             metro_stations = None
 
-    await state.update_data(metro_stations=metro_stations)
+    # Сразу переводим названия станций в id hh.ru, чтобы фильтровал сам hh
+    metro_ids: list[str] | None = None
+    if metro_stations:
+        data = await state.get_data()
+        city = data.get("city")
+        if not city:
+            # город в фильтре пропущен — поиск пойдёт по городу из профиля
+            async for session in get_session():
+                city = (await get_or_create_user(session, message.from_user.id)).city
+        area_id = resolve_area_id(city)
+        ids, unknown = get_metro_index().resolve_many(area_id, metro_stations)
+        metro_ids = ids or None
+        if unknown:
+            await message.answer(
+                "Не нашёл в справочнике hh.ru станции: "
+                + ", ".join(unknown)
+                + ".\nПо ним фильтровать не получится, остальные учту."
+            )
+
+    await state.update_data(metro_stations=metro_stations, metro_ids=metro_ids)
     await state.set_state(SearchSettingsStates.freshness)
 
     await message.answer("Свежесть вакансий в днях (1–3)?")
@@ -374,13 +426,14 @@ async def set_top_companies(message: Message, state: FSMContext):
 
     async for session in get_session():
         user = await get_or_create_user(session, message.from_user.id)
-        await upsert_search_filters(
+        filt = await upsert_search_filters(
             session,
             user,
             position=data.get("position"),
             city=data.get("city"),
             min_salary=data.get("min_salary"),
             metro_stations=data.get("metro_stations"),
+            metro_ids=data.get("metro_ids"),
             freshness_days=data.get("freshness_days"),
             employment_types=data.get("employment_types"),
             experience_level=data.get("experience_level"),
@@ -389,9 +442,16 @@ async def set_top_companies(message: Message, state: FSMContext):
             only_top_companies=data.get("only_top_companies", False),
         )
 
+        # город фильтра мог поменять часовой пояс рассылки
+        user.next_digest_at = None
         await session.execute(delete(UserVacancy).where(UserVacancy.user_id == user.id))
+        # курсор тоже сбрасываем: updated_at не меняется, если фильтр сохранили без правок
+        await session.execute(delete(SearchCursor).where(SearchCursor.filter_id == filt.id))
         await session.commit()
 
+    # в общем автомате должностей меняется только шаблон этого фильтра
+    get_title_matcher().update(filt.id, filt.position)
+
     await message.answer(
         "Фильтры поиска сохранены ✅\nМожешь проверить вакансии командой /vacancies",
         reply_markup=rm,
@@ -1,11 +1,12 @@
 # app/handlers/start.py
 
 from aiogram import Router, F, Dispatcher
-from aiogram.filters import CommandStart, StateFilter
+from aiogram.filters import Command, CommandObject, CommandStart, StateFilter
 from aiogram.types import Message
 
+from app.config import config
 from app.db.session import get_session
-from app.db.crud import get_or_create_user, update_user_profile
+from app.db.crud import get_or_create_user, set_digest_hour, update_user_profile
 from aiogram.filters import CommandStart, StateFilter
 from app.utils.keyboards import main_menu_keyboard
 
@@ -78,5 +79,37 @@ async def handle_profile_text(message: Message):
     )
 
 
+def parse_digest_hour(text: str | None) -> int | None:
+    """'8', '08:00', '8 утра' -> 8; мусор и часы вне 0..23 -> None."""
+    digits = "".join(ch for ch in (text or "").split(":")[0] if ch.isdigit())
+    if not digits:
+        return None
+    hour = int(digits)
+    return hour if 0 <= hour <= 23 else None
+
+
+@router.message(Command("digest_time"))
+async def cmd_digest_time(message: Message, command: CommandObject):
+    if not command.args:
+        await message.answer(
+            "Во сколько присылать подборку? Напиши час по местному времени, "
+            f"например: /digest_time 8 (сейчас по умолчанию {config.digest_default_hour}:00)"
+        )
+        return
+
+    hour = parse_digest_hour(command.args)
+    if hour is None:
+        await message.answer("Не понял час. Пример: /digest_time 8")
+        return
+
+    async for session in get_session():
+        user = await get_or_create_user(session, message.from_user.id)
+        await set_digest_hour(session, user, hour)
+
+    await message.answer(
+        f"Готово ✅ Подборка будет приходить около {hour}:00 по времени твоего города."
+    )
+
+
 def register_start_handlers(dp: Dispatcher):
     dp.include_router(router)
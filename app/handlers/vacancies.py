@@ -17,6 +17,7 @@ from app.services.llm_service import (
     evaluate_vacancy_comfort,
 )
 from app.services.hh_service import fetch_vacancies_for_user
+from app.services.telegram_sender import PRIORITY_INTERACTIVE, deliver
 from app.utils.pdf_utils import render_text_to_pdf
 
 router = Router()
@@ -76,7 +77,9 @@ async def cmd_vacancies(message: Message):
 
         # 3) тянем свежие вакансии из hh.ru
         try:
-            await fetch_vacancies_for_user(session, user, filt, limit=20)
+            await fetch_vacancies_for_user(
+                session, user, filt, limit=20, paginate=True
+            )
         except Exception as e:
             await message.answer(f"Не удалось получить вакансии с hh.ru: {e}")
             return
@@ -102,8 +105,12 @@ async def cmd_vacancies(message: Message):
             f"Зарплата: {salary_text}\n"
             f"<a href='{v.url}'>Ссылка на hh.ru</a>"
         )
-        await message.answer(
+        # пачка сообщений в один чат — через очередь с лимитом на чат
+        await deliver(
+            message.bot,
+            message.chat.id,
             text,
+            priority=PRIORITY_INTERACTIVE,
             reply_markup=vacancy_keyboard(v.id),
             disable_web_page_preview=True,
         )
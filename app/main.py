@@ -11,6 +11,11 @@ from app.handlers.start import register_start_handlers
 from app.handlers.search_settings import register_search_settings_handlers
 from app.handlers.vacancies import register_vacancy_handlers
 from app.services.scheduler import setup_scheduler
+from app.services.areas import init_area_index
+from app.services.hh_client import init_hh_client, close_hh_client
+from app.services.metro import init_metro_index
+from app.services.telegram_sender import init_telegram_sender, close_telegram_sender
+from app.services.metrics_server import init_metrics_server, close_metrics_server
 from app.handlers.resume import register_resume_handlers
 from app.handlers.history import register_history_handlers
 
@@ -23,7 +28,18 @@ logging.basicConfig(
 
 async def main():
     # Инициализация БД
-    await init_db(config.database_url)
+    await init_db(config.database_url, config)
+
+    # Общий пул соединений к hh.ru
+    hh_client = init_hh_client(config)
+
+    # Справочники hh.ru: по умолчанию файлы из app/data, по флагу — свежие из API
+    if config.hh_dictionaries_from_api:
+        await init_area_index(hh_client)
+        await init_metro_index(hh_client)
+
+    # Эндпоинт метрик для Prometheus
+    await init_metrics_server(config)
 
     # ✅ Новая инициализация бота для aiogram 3.7+
     bot = Bot(
@@ -33,6 +49,9 @@ async def main():
         ),
     )
 
+    # Общая очередь исходящих сообщений (лимиты Telegram)
+    init_telegram_sender(bot, config)
+
     dp = Dispatcher()
 
     # Регистрация хендлеров
@@ -49,6 +68,9 @@ async def main():
         await dp.start_polling(bot)
     finally:
         scheduler.shutdown(wait=False)
+        await close_telegram_sender()
+        await close_hh_client()
+        await close_metrics_server()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+# app/services/areas.py
+
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import re
+
+from app.services.hh_client import HHClient
+
+logger = logging.getLogger(__name__)
+
+AREAS_FILE = Path(__file__).resolve().parent.parent / "data" / "hh_areas.json"
+
+# Россия — при одинаковых названиях предпочитаем российские города
+RUSSIA_AREA_ID = 113
+
+# Разговорные и английские варианты, которых нет в справочнике hh.ru
+CITY_ALIASES: dict[str, int] = {
+    "спб": 2,
+    "питер": 2,
+    "петербург": 2,
+    "moscow": 1,
+    "saint petersburg": 2,
+    "st petersburg": 2,
+    "мск": 1,
+    "екб": 3,
+    "нск": 4,
+}
+
+# Минимальное сходство по триграммам, чтобы считать город найденным.
+# Ниже начинаются ложные совпадения: «Ростов» -> Ростов-на-Дону,
+# «Краснодарский край» -> Краснодар
+FUZZY_THRESHOLD = 0.6
+# Если второй кандидат почти так же похож, город не угадываем, а переспрашиваем
+FUZZY_MARGIN = 0.1
+# С какого сходства название годится в подсказку «возможно, вы имели в виду»
+SUGGEST_THRESHOLD = 0.3
+
+_TRANSLIT = [
+    ("shch", "щ"), ("sch", "щ"), ("zh", "ж"), ("kh", "х"), ("ts", "ц"),
+    ("ch", "ч"), ("sh", "ш"), ("yu", "ю"), ("ya", "я"), ("yo", "е"),
+    ("ye", "е"), ("a", "а"), ("b", "б"), ("v", "в"), ("g", "г"), ("d", "д"),
+    ("e", "е"), ("z", "з"), ("i", "и"), ("j", "й"), ("k", "к"), ("l", "л"),
+    ("m", "м"), ("n", "н"), ("o", "о"), ("p", "п"), ("r", "р"), ("s", "с"),
+    ("t", "т"), ("u", "у"), ("f", "ф"), ("h", "х"), ("c", "к"), ("y", "ы"),
+    ("w", "в"), ("x", "кс"), ("q", "к"),
+]
+_LATIN_RE = re.compile(r"[a-z]")
+_PUNCT_RE = re.compile(r"[^\w]+")
+_CITY_PREFIX_RE = re.compile(r"^(г|город)\s+")
+
+
+def normalize_area_name(name: str) -> str:
+    """Регистр, ё/е, дефисы и «г.» перед названием не влияют на поиск."""
+    text = name.strip().lower().replace("ё", "е")
+    text = _PUNCT_RE.sub(" ", text)
+    text = " ".join(text.split())
+    return _CITY_PREFIX_RE.sub("", text)
+
+
+def transliterate(text: str) -> str:
+    """Латиница -> кириллица (Moskva -> москва, Yekaterinburg -> екатеринбург)."""
+    if not _LATIN_RE.search(text):
+        return text
+    result = []
+    i = 0
+    while i < len(text):
+        for latin, cyr in _TRANSLIT:
+            if text.startswith(latin, i):
+                result.append(cyr)
+                i += len(latin)
+                break
+        else:
+            result.append(text[i])
+            i += 1
+    return "".join(result)
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class Area:
+    id: int
+    name: str
+    parent_id: int | None
+    root_id: int
+    depth: int
+
+
+class AreaIndex:
+    """
+    Индекс справочника регионов hh.ru.
+
+    - точное совпадение нормализованного названия — словарь, O(1);
+    - поиск по префиксу — бинарный поиск по отсортированным названиям;
+    - опечатки и транслит — инвертированный индекс триграмм.
+    """
+
+    def __init__(self, tree: list[dict[str, Any]], version: str | None = None):
+        self.version = version
+        self.areas: dict[int, Area] = {}
+        self._by_name: dict[str, list[int]] = {}
+        self._walk(tree, parent_id=None, root_id=None, depth=0)
+
+        for ids in self._by_name.values():
+            ids.sort(key=self._preference)
+        self._names = sorted(self._by_name)
+        self._trigram_index: dict[str, list[str]] = {}
+        self._trigram_counts: dict[str, int] = {}
+        for name in self._names:
+            grams = trigrams(name)
+            self._trigram_counts[name] = len(grams)
+            for gram in grams:
+                self._trigram_index.setdefault(gram, []).append(name)
+
+    def _walk(
+        self,
+        nodes: list[dict[str, Any]],
+        parent_id: int | None,
+        root_id: int | None,
+        depth: int,
+    ) -> None:
+        for node in nodes:
+            area_id = int(node["id"])
+            area = Area(
+                id=area_id,
+                name=node["name"],
+                parent_id=parent_id,
+                root_id=root_id if root_id is not None else area_id,
+                depth=depth,
+            )
+            self.areas[area_id] = area
+            self._by_name.setdefault(normalize_area_name(area.name), []).append(area_id)
+            self._walk(node.get("areas") or [], area_id, area.root_id, depth + 1)
+
+    def _preference(self, area_id: int) -> tuple:
+        area = self.areas[area_id]
+        return (area.root_id != RUSSIA_AREA_ID, area.depth, area.id)
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+    def get(self, area_id: int) -> Area | None:
+        return self.areas.get(area_id)
+
+    def exact(self, name: str) -> Area | None:
+        ids = self._by_name.get(name)
+        return self.areas[ids[0]] if ids else None
+
+    def prefix(self, query: str, limit: int = 10) -> list[Area]:
+        query = normalize_area_name(query)
+        start = bisect_left(self._names, query)
+        result: list[Area] = []
+        for name in self._names[start:]:
+            if not name.startswith(query) or len(result) >= limit:
+                break
+            result.append(self.areas[self._by_name[name][0]])
+        return result
+
+    def _similar(self, name: str) -> list[tuple[float, str]]:
+        """Названия справочника по убыванию сходства триграмм с name."""
+        grams = trigrams(name)
+        overlap: dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._trigram_index.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        scored = [
+            (common / (len(grams) + self._trigram_counts[candidate] - common), candidate)
+            for candidate, common in overlap.items()
+        ]
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return scored
+
+    def fuzzy(self, name: str) -> Area | None:
+        """Опечатки и транслит — только если лучший кандидат вне сомнений."""
+        scored = self._similar(name)
+        if not scored or scored[0][0] < FUZZY_THRESHOLD:
+            return None
+        if len(scored) > 1 and scored[0][0] - scored[1][0] < FUZZY_MARGIN:
+            return None
+        return self.exact(scored[0][1])
+
+    def suggest(self, city: str, limit: int = 3) -> list[Area]:
+        """Варианты для нераспознанного названия: по префиксу, затем похожие."""
+        name = transliterate(normalize_area_name(city))
+        if not name:
+            return []
+        result = self.prefix(name, limit)
+        for score, candidate in self._similar(name):
+            if len(result) >= limit or score < SUGGEST_THRESHOLD:
+                break
+            area = self.exact(candidate)
+            if area not in result:
+                result.append(area)
+        return result
+
+    def resolve(self, city: str | None) -> Area | None:
+        """Название города в свободной форме -> регион hh.ru (или None)."""
+        if not city:
+            return None
+        name = normalize_area_name(city)
+        if not name:
+            return None
+
+        alias_id = CITY_ALIASES.get(name)
+        if alias_id is not None and alias_id in self.areas:
+            return self.areas[alias_id]
+
+        translit = transliterate(name)
+        for candidate in (name, translit):
+            area = self.exact(candidate)
+            if area is not None:
+                return area
+
+        return self.fuzzy(translit)
+
+
+def load_area_index(path: Path = AREAS_FILE) -> AreaIndex:
+    with path.open(encoding="utf-8") as f:
+        data = json.load(f)
+    index = AreaIndex(data["areas"], version=data.get("version"))
+    logger.info("Loaded HH areas %s: %d areas", index.version, len(index))
+    return index
+
+
+_area_index: AreaIndex | None = None
+
+
+async def init_area_index(client: HHClient) -> AreaIndex:
+    """
+    Полный справочник регионов из API hh.ru (/areas). Вызывается при старте
+    с HH_DICTIONARIES_FROM_API=true;
+    если API недоступен, остаётся файл из репозитория.
+    """
+    global _area_index
+    try:
+        tree = await client.get_json("/areas")
+        _area_index = AreaIndex(tree, version=f"api-{date.today().isoformat()}")
+        logger.info("Loaded HH areas from API: %d areas", len(_area_index))
+    except Exception as e:
+        logger.warning("Failed to load HH areas from API, using %s: %r", AREAS_FILE.name, e)
+    return get_area_index()
+
+
+def get_area_index() -> AreaIndex:
+    """Справочник из API или (лениво, при первом обращении) из файла."""
+    global _area_index
+    if _area_index is None:
+        _area_index = load_area_index()
+    return _area_index
+
+
+def resolve_area_id(city: str | None) -> int | None:
+    area = get_area_index().resolve(city)
+    return area.id if area else None
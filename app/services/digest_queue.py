@@ -0,0 +1,387 @@
+# app/services/digest_queue.py
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.crud import upsert_insert
+from app.db.models import DigestItemStatus, DigestRun, DigestRunStatus, DigestWorkItem
+from app.db.session import get_session
+from app.services.digest_slots import claim_due_digests
+
+logger = logging.getLogger(__name__)
+
+# Имя процесса в аренде: по нему видно, какой хост/процесс держит задание
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Сколько хранить завершённые задания (для разбора инцидентов)
+FINISHED_ITEMS_KEEP = timedelta(days=7)
+
+
+@dataclass
+class DigestLease:
+    """Задания, взятые одним процессом за раз (одна аренда — один токен)."""
+
+    token: str
+    # id задания -> id пользователя
+    items: dict[int, int]
+    run_id: int | None = None
+
+    @property
+    def user_ids(self) -> list[int]:
+        return list(self.items.values())
+
+
+async def enqueue_due_digests(
+    session: AsyncSession,
+    now: datetime,
+    limit: int,
+    max_lag: timedelta | None = None,
+) -> int:
+    """
+    Превращает наступившие слоты в задания. Перенос слота и вставка заданий —
+    одна транзакция; если два процесса всё же возьмут один слот,
+    uq_digest_work_item_slot оставит одно задание.
+
+    Слоты, просроченные больше чем на max_lag (бот долго лежал), не
+    догоняются: слот переносится, а вакансии уйдут в следующий.
+    """
+    slots = await claim_due_digests(session, now, limit)
+    if max_lag is not None:
+        stale = {uid for uid, slot_at in slots.items() if slot_at < now - max_lag}
+        if stale:
+            logger.warning("Skipped %d digest slots older than %s", len(stale), max_lag)
+            slots = {uid: slot_at for uid, slot_at in slots.items() if uid not in stale}
+    if not slots:
+        await session.commit()
+        return 0
+
+    rows = [
+        {
+            "user_id": user_id,
+            "slot_at": slot_at,
+            "status": DigestItemStatus.pending,
+            "attempts": 0,
+            "created_at": now,
+        }
+        for user_id, slot_at in slots.items()
+    ]
+    on_conflict_insert = upsert_insert(session)
+    if on_conflict_insert is not None:
+        result = await session.execute(
+            on_conflict_insert(DigestWorkItem)
+            .values(rows)
+            .on_conflict_do_nothing(
+                index_elements=[DigestWorkItem.user_id, DigestWorkItem.slot_at]
+            )
+            .returning(DigestWorkItem.id)
+        )
+        rows = result.all()
+    else:
+        existing = await session.execute(
+            select(DigestWorkItem.user_id, DigestWorkItem.slot_at).where(
+                DigestWorkItem.user_id.in_(list(slots))
+            )
+        )
+        seen = set(existing.tuples().all())
+        rows = [row for row in rows if (row["user_id"], row["slot_at"]) not in seen]
+        if rows:
+            await session.execute(insert(DigestWorkItem), rows)
+    await session.commit()
+    return len(rows)
+
+
+def _claimable(now: datetime):
+    return or_(
+        DigestWorkItem.status == DigestItemStatus.pending,
+        and_(
+            DigestWorkItem.status == DigestItemStatus.leased,
+            DigestWorkItem.lease_expires_at < now,
+        ),
+    )
+
+
+async def lease_work_items(
+    session: AsyncSession,
+    owner: str,
+    now: datetime,
+    limit: int,
+    lease_seconds: float,
+    max_attempts: int,
+) -> DigestLease | None:
+    """
+    Берёт в аренду до limit заданий: свободные и те, чья аренда истекла
+    (процесс упал или завис). Задания прерванного прогона, уже отмеченные
+    выполненными, не берутся — новый прогон продолжает с места остановки.
+
+    PostgreSQL: SELECT ... FOR UPDATE SKIP LOCKED — параллельные процессы
+    не ждут друг друга и не берут одно и то же. SQLite блокировок строк
+    не знает, поэтому UPDATE повторяет условие выборки (compare-and-set),
+    а своё забирается обратно по токену аренды.
+    """
+    # задания, которые исчерпали попытки и снова потеряли аренду, — в failed
+    await session.execute(
+        update(DigestWorkItem)
+        .where(
+            DigestWorkItem.status == DigestItemStatus.leased,
+            DigestWorkItem.lease_expires_at < now,
+            DigestWorkItem.attempts >= max_attempts,
+        )
+        .values(
+            status=DigestItemStatus.failed,
+            error="lease expired",
+            finished_at=now,
+            lease_token=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    result = await session.execute(
+        select(DigestWorkItem.id)
+        .where(_claimable(now), DigestWorkItem.attempts < max_attempts)
+        .order_by(DigestWorkItem.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = list(result.scalars().all())
+    if not ids:
+        await session.commit()
+        return None
+
+    token = uuid.uuid4().hex
+    await session.execute(
+        update(DigestWorkItem)
+        .where(DigestWorkItem.id.in_(ids), _claimable(now))
+        .values(
+            status=DigestItemStatus.leased,
+            lease_owner=owner,
+            lease_token=token,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            attempts=DigestWorkItem.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(
+        select(DigestWorkItem.id, DigestWorkItem.user_id).where(
+            DigestWorkItem.lease_token == token
+        )
+    )
+    items = dict(result.tuples().all())
+    await session.commit()
+    return DigestLease(token=token, items=items) if items else None
+
+
+async def checkpoint_work_item(
+    session: AsyncSession,
+    lease: DigestLease,
+    user_id: int,
+    now: datetime | None = None,
+) -> None:
+    """
+    Отмечает задание пользователя выполненным сразу после его шага — в той же
+    транзакции, что и сам шаг (без commit). Если процесс упадёт посреди
+    пачки, уже обработанные пользователи повторно не пойдут.
+    """
+    item_ids = [item_id for item_id, uid in lease.items.items() if uid == user_id]
+    if not item_ids:
+        return
+    await session.execute(
+        update(DigestWorkItem)
+        .where(DigestWorkItem.lease_token == lease.token, DigestWorkItem.id.in_(item_ids))
+        .values(
+            status=DigestItemStatus.done,
+            finished_at=now or datetime.utcnow(),
+            lease_token=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def start_digest_run(
+    session: AsyncSession,
+    lease: DigestLease,
+    worker: str,
+    now: datetime,
+) -> DigestRun:
+    """Записывает прогон и привязывает к нему задания аренды (lease.run_id)."""
+    run = DigestRun(worker=worker, started_at=now, heartbeat_at=now, users=len(lease.items))
+    session.add(run)
+    await session.flush()
+    await session.execute(
+        update(DigestWorkItem)
+        .where(DigestWorkItem.lease_token == lease.token)
+        .values(run_id=run.id)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    lease.run_id = run.id
+    return run
+
+
+async def finish_digest_run(
+    session: AsyncSession,
+    run_id: int,
+    processed: int,
+    failed: int,
+    now: datetime | None = None,
+) -> None:
+    await session.execute(
+        update(DigestRun)
+        .where(DigestRun.id == run_id)
+        .values(
+            status=DigestRunStatus.finished,
+            finished_at=now or datetime.utcnow(),
+            processed=processed,
+            failed=failed,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+
+async def interrupt_stale_runs(
+    session: AsyncSession,
+    now: datetime,
+    lease_seconds: float,
+) -> int:
+    """
+    Прогоны, чей heartbeat замолчал дольше аренды, — прерваны (процесс
+    перезапущен или упал). Их невыполненные задания к этому времени уже
+    свободны и достанутся следующему прогону.
+    """
+    result = await session.execute(
+        update(DigestRun)
+        .where(
+            DigestRun.status == DigestRunStatus.running,
+            DigestRun.heartbeat_at < now - timedelta(seconds=lease_seconds),
+        )
+        .values(status=DigestRunStatus.interrupted, finished_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    if result.rowcount:
+        logger.warning("Marked %d stale digest runs as interrupted", result.rowcount)
+    return result.rowcount
+
+
+async def extend_lease(
+    session: AsyncSession,
+    token: str,
+    now: datetime,
+    lease_seconds: float,
+    run_id: int | None = None,
+) -> int:
+    """Heartbeat: продлевает аренду, пока задания ещё наши, и отмечает прогон живым."""
+    result = await session.execute(
+        update(DigestWorkItem)
+        .where(
+            DigestWorkItem.lease_token == token,
+            DigestWorkItem.status == DigestItemStatus.leased,
+        )
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    if run_id is not None:
+        await session.execute(
+            update(DigestRun)
+            .where(DigestRun.id == run_id)
+            .values(heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    await session.commit()
+    return result.rowcount
+
+
+@asynccontextmanager
+async def lease_heartbeat(lease: DigestLease, lease_seconds: float) -> AsyncIterator[None]:
+    """Продлевает аренду каждые lease_seconds / 3, пока выполняется блок."""
+
+    async def beat() -> None:
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            try:
+                async for session in get_session():
+                    await extend_lease(
+                        session, lease.token, datetime.utcnow(), lease_seconds, lease.run_id
+                    )
+            except Exception:
+                logger.warning("Digest lease heartbeat failed", exc_info=True)
+
+    task = asyncio.create_task(beat())
+    try:
+        yield
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def finish_work_items(
+    session: AsyncSession,
+    lease: DigestLease,
+    failed_user_ids: set[int],
+    max_attempts: int,
+    now: datetime | None = None,
+) -> None:
+    """
+    Закрывает аренду: успешные — done, неудачные — обратно в очередь,
+    пока не исчерпаны попытки. Задания, аренду которых уже перехватил
+    другой процесс, не трогаем (условие по токену).
+    """
+    now = now or datetime.utcnow()
+    done = [i for i, user_id in lease.items.items() if user_id not in failed_user_ids]
+    failed = [i for i, user_id in lease.items.items() if user_id in failed_user_ids]
+    ours = DigestWorkItem.lease_token == lease.token
+
+    if done:
+        await session.execute(
+            update(DigestWorkItem)
+            .where(ours, DigestWorkItem.id.in_(done))
+            .values(status=DigestItemStatus.done, finished_at=now, lease_token=None)
+            .execution_options(synchronize_session=False)
+        )
+    if failed:
+        exhausted = DigestWorkItem.attempts >= max_attempts
+        failed_ours = (ours, DigestWorkItem.id.in_(failed))
+        # попытки исчерпаны — failed, иначе задание снова ждёт в очереди
+        await session.execute(
+            update(DigestWorkItem)
+            .where(*failed_ours, exhausted)
+            .values(
+                status=DigestItemStatus.failed,
+                error="digest failed",
+                finished_at=now,
+                lease_token=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(
+            update(DigestWorkItem)
+            .where(*failed_ours, ~exhausted)
+            .values(
+                status=DigestItemStatus.pending,
+                error="digest failed",
+                lease_token=None,
+                lease_expires_at=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+    await session.commit()
+
+
+async def purge_work_items(session: AsyncSession, before: datetime) -> None:
+    await session.execute(
+        delete(DigestWorkItem).where(
+            DigestWorkItem.status.in_([DigestItemStatus.done, DigestItemStatus.failed]),
+            DigestWorkItem.finished_at < before,
+        )
+    )
+    await session.commit()
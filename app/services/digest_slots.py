@@ -0,0 +1,152 @@
+# app/services/digest_slots.py
+
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+import logging
+import zlib
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import config
+from app.db.models import SearchFilter, User
+from app.services.areas import AreaIndex, get_area_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = "Europe/Moscow"
+
+# Часовые пояса регионов hh.ru. Для региона без записи берётся ближайший
+# родитель из справочника (город -> область -> страна), иначе — Москва.
+AREA_TIMEZONES: dict[int, str] = {
+    113: "Europe/Moscow",  # Россия
+    3: "Asia/Yekaterinburg",  # Екатеринбург
+    4: "Asia/Novosibirsk",
+    11: "Asia/Barnaul",
+    22: "Asia/Vladivostok",
+    24: "Europe/Volgograd",
+    35: "Asia/Irkutsk",
+    41: "Europe/Kaliningrad",
+    54: "Asia/Krasnoyarsk",
+    68: "Asia/Omsk",
+    72: "Asia/Yekaterinburg",  # Пермь
+    78: "Europe/Samara",
+    79: "Europe/Saratov",
+    90: "Asia/Tomsk",
+    95: "Asia/Yekaterinburg",  # Тюмень
+    96: "Europe/Samara",  # Ижевск
+    99: "Asia/Yekaterinburg",  # Уфа
+    102: "Asia/Vladivostok",  # Хабаровск
+    104: "Asia/Yekaterinburg",  # Челябинск
+    16: "Europe/Minsk",  # Беларусь
+    40: "Asia/Almaty",  # Казахстан
+}
+
+
+def area_timezone(area_id: int | None, index: AreaIndex | None = None) -> ZoneInfo:
+    index = index or get_area_index()
+    current = index.get(area_id) if area_id is not None else None
+    while current is not None:
+        name = AREA_TIMEZONES.get(current.id)
+        if name:
+            return ZoneInfo(name)
+        current = index.get(current.parent_id) if current.parent_id else None
+    return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def user_timezone(
+    city: str | None,
+    filter_city: str | None = None,
+    index: AreaIndex | None = None,
+) -> ZoneInfo:
+    """Пояс по городу из профиля, иначе — по городу из фильтра поиска."""
+    index = index or get_area_index()
+    for name in (city, filter_city):
+        area = index.resolve(name)
+        if area is not None:
+            return area_timezone(area.id, index)
+    return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def jitter_seconds(user_id: int, window_minutes: int) -> int:
+    """Постоянный для пользователя сдвиг внутри окна: нагрузка размазана по часу."""
+    window = max(1, window_minutes * 60)
+    return zlib.crc32(str(user_id).encode()) % window
+
+
+def next_digest_at(
+    user_id: int,
+    tz: ZoneInfo,
+    hour: int | None,
+    after: datetime,
+    jitter_minutes: int | None = None,
+) -> datetime:
+    """
+    Ближайший слот рассылки строго после after (наивное UTC, как и все
+    даты в БД): hour:00 по местному времени + сдвиг пользователя.
+    """
+    hour = config.digest_default_hour if hour is None else hour
+    window = config.digest_jitter_minutes if jitter_minutes is None else jitter_minutes
+    offset = timedelta(hours=hour, seconds=jitter_seconds(user_id, window))
+
+    day: date = after.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    while True:
+        local = datetime.combine(day, time(), tzinfo=tz) + offset
+        slot = local.astimezone(timezone.utc).replace(tzinfo=None)
+        if slot > after:
+            return slot
+        day += timedelta(days=1)
+
+
+def _slot_rows(rows, after: datetime, index: AreaIndex) -> list[dict]:
+    return [
+        {
+            "id": user_id,
+            "next_digest_at": next_digest_at(
+                user_id, user_timezone(city, filter_city, index), hour, after
+            ),
+        }
+        for user_id, city, filter_city, hour, _ in rows
+    ]
+
+
+def _slot_query():
+    return select(
+        User.id, User.city, SearchFilter.city, User.digest_hour, User.next_digest_at
+    ).join(SearchFilter, SearchFilter.user_id == User.id)
+
+
+async def assign_digest_slots(session: AsyncSession, now: datetime) -> int:
+    """Назначает слоты новым пользователям и тем, кто сменил город или час."""
+    result = await session.execute(_slot_query().where(User.next_digest_at.is_(None)))
+    slots = _slot_rows(result.all(), now, get_area_index())
+    if slots:
+        await session.execute(update(User), slots)
+        await session.commit()
+    return len(slots)
+
+
+async def claim_due_digests(
+    session: AsyncSession,
+    now: datetime,
+    limit: int,
+) -> dict[int, datetime]:
+    """
+    Пользователи, чей слот наступил (не больше limit, самые ранние первыми):
+    {user_id: наступивший слот}. Их слоты сразу переносятся на следующий
+    день — повторный тик их не возьмёт. Без commit: вызывающий фиксирует
+    перенос в одной транзакции с заданиями рассылки.
+    """
+    result = await session.execute(
+        _slot_query()
+        .where(User.next_digest_at <= now)
+        .order_by(User.next_digest_at)
+        .limit(limit)
+        # PostgreSQL: строки, которые сейчас берёт другой процесс, пропускаем
+        .with_for_update(skip_locked=True, of=User)
+    )
+    rows = result.all()
+    slots = _slot_rows(rows, now, get_area_index())
+    if slots:
+        await session.execute(update(User), slots)
+    return {row[0]: row[4] for row in rows}
@@ -0,0 +1,200 @@
+# app/services/hh_cache.py
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable
+import logging
+import time
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import BotConfig
+from app.db.models import HHResponseCacheEntry
+from app.db.session import get_session
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache(ABC):
+    """
+    Кэш ответов поиска hh.ru по ключу нормализованного запроса.
+    Наследники реализуют _load/_store, счётчики попаданий общие.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Any | None:
+        value = await self._load(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._store(key, value)
+
+    @abstractmethod
+    async def _load(self, key: str) -> Any | None: ...
+
+    @abstractmethod
+    async def _store(self, key: str, value: Any) -> None: ...
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU с TTL. Годится, пока бот запущен в одном процессе."""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(ttl, max_size)
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def _load(self, key: str) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def _store(self, key: str, value: Any) -> None:
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {**super().stats(), "size": len(self._data)}
+
+
+class SqlResponseCache(ResponseCache):
+    """
+    Кэш в таблице hh_response_cache — общий для нескольких процессов бота.
+    Размер ограничивается периодической чисткой самых старых записей.
+    """
+
+    # как часто (в записях) чистить таблицу от просроченного и лишнего
+    purge_every = 50
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int,
+        session_maker: async_sessionmaker[AsyncSession] | None = None,
+    ):
+        super().__init__(ttl, max_size)
+        self._session_maker = session_maker
+        self._writes = 0
+
+    async def _session(self):
+        if self._session_maker is not None:
+            async with self._session_maker() as session:
+                yield session
+        else:
+            async for session in get_session():
+                yield session
+
+    async def _load(self, key: str) -> Any | None:
+        async for session in self._session():
+            entry = await session.get(HHResponseCacheEntry, key)
+            if entry is None or entry.expires_at <= datetime.utcnow():
+                return None
+            return entry.payload
+
+    async def _store(self, key: str, value: Any) -> None:
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        async for session in self._session():
+            await session.merge(
+                HHResponseCacheEntry(key=key, payload=value, expires_at=expires_at)
+            )
+            try:
+                await session.commit()
+            except IntegrityError:
+                # ту же запись только что вставил другой процесс — это нормально
+                await session.rollback()
+
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                await self._purge(session)
+
+    async def _purge(self, session: AsyncSession) -> None:
+        result = await session.execute(
+            delete(HHResponseCacheEntry).where(
+                HHResponseCacheEntry.expires_at <= datetime.utcnow()
+            )
+        )
+        removed = result.rowcount or 0
+
+        size = await session.scalar(
+            select(func.count()).select_from(HHResponseCacheEntry)
+        )
+        if size and size > self.max_size:
+            oldest = (
+                select(HHResponseCacheEntry.key)
+                .order_by(HHResponseCacheEntry.expires_at)
+                .limit(size - self.max_size)
+            )
+            result = await session.execute(
+                delete(HHResponseCacheEntry).where(HHResponseCacheEntry.key.in_(oldest))
+            )
+            removed += result.rowcount or 0
+
+        await session.commit()
+        self.evictions += removed
+
+
+_response_cache: ResponseCache | None = None
+_response_cache_ready = False
+
+
+def build_response_cache(cfg: BotConfig) -> ResponseCache | None:
+    backend = (cfg.hh_cache_backend or "").lower()
+    if backend in ("", "none", "off"):
+        return None
+    if backend == "memory":
+        return MemoryResponseCache(cfg.hh_cache_ttl, cfg.hh_cache_max_size)
+    if backend == "sql":
+        return SqlResponseCache(cfg.hh_cache_ttl, cfg.hh_cache_max_size)
+    raise ValueError(f"Unknown HH_CACHE_BACKEND: {cfg.hh_cache_backend!r}")
+
+
+def set_response_cache(cache: ResponseCache | None) -> None:
+    """Подменяет кэш (или отключает его, если передать None)."""
+    global _response_cache, _response_cache_ready
+    _response_cache = cache
+    _response_cache_ready = True
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Общий кэш ответов hh.ru, создаётся лениво по настройкам из config."""
+    global _response_cache, _response_cache_ready
+    if not _response_cache_ready:
+        from app.config import config
+
+        _response_cache = build_response_cache(config)
+        _response_cache_ready = True
+    return _response_cache
@@ -0,0 +1,264 @@
+# app/services/hh_client.py
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from app.config import BotConfig
+from app.utils.json_codec import loads
+from app.utils.metrics import Counter, Gauge, Histogram
+from app.utils.rate_limit import AIMDLimiter, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+HH_API_BASE_URL = "https://api.hh.ru"
+
+# Ответы, на которых hh.ru просит сбавить темп (режем параллельность)
+THROTTLE_STATUSES = {429, 503}
+# Ответы, которые имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+HH_REQUEST_SECONDS = Histogram(
+    "hh_request_seconds",
+    "Latency of a single HTTP request to api.hh.ru (each retry separately)",
+    ("status",),
+)
+HH_RETRIES = Counter("hh_retries_total", "Requests to api.hh.ru that were retried")
+HH_THROTTLED = Counter("hh_throttled_total", "429/503 responses from api.hh.ru")
+HH_LIMITER_TOKENS = Gauge("hh_limiter_tokens", "Tokens left in the hh.ru rate-limit bucket")
+HH_CONCURRENCY_LIMIT = Gauge("hh_concurrency_limit", "AIMD limit of parallel hh.ru requests")
+HH_IN_FLIGHT = Gauge("hh_requests_in_flight", "hh.ru requests currently in progress")
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Retry-After бывает числом секунд или HTTP-датой."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class HHClient:
+    """
+    Долгоживущий клиент API hh.ru.
+
+    Держит один пул соединений (keep-alive) на всё приложение, чтобы
+    каждый поиск не платил заново за DNS + TCP + TLS.
+
+    Все запросы проходят через общий token bucket (rate_per_sec) и
+    адаптивный лимит параллельности: на 429/503 лимит режется вдвое,
+    запрос повторяется после Retry-After или экспоненциальной паузы с jitter.
+    """
+
+    def __init__(
+        self,
+        base_url: str = HH_API_BASE_URL,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        user_agent: str = "hh-bot/1.0",
+        transport: httpx.AsyncBaseTransport | None = None,
+        rate_per_sec: float = 10.0,
+        burst: float = 10.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        initial_concurrency: int = 4,
+    ):
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+                http2 = False
+
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+            headers={"User-Agent": user_agent},
+            transport=transport,
+        )
+
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._bucket = TokenBucket(rate=rate_per_sec, capacity=burst)
+        self._concurrency = AIMDLimiter(
+            initial=initial_concurrency,
+            max_limit=max_connections,
+        )
+        self.throttled = 0
+        self.retries = 0
+
+    @classmethod
+    def from_config(cls, cfg: BotConfig) -> "HHClient":
+        return cls(
+            timeout=cfg.hh_timeout,
+            connect_timeout=cfg.hh_connect_timeout,
+            max_connections=cfg.hh_max_connections,
+            max_keepalive_connections=cfg.hh_max_keepalive_connections,
+            keepalive_expiry=cfg.hh_keepalive_expiry,
+            http2=cfg.hh_http2,
+            user_agent=cfg.hh_user_agent,
+            rate_per_sec=cfg.hh_rate_per_sec,
+            burst=cfg.hh_burst,
+            max_retries=cfg.hh_max_retries,
+            backoff_base=cfg.hh_backoff_base,
+            backoff_max=cfg.hh_backoff_max,
+            initial_concurrency=cfg.hh_initial_concurrency,
+        )
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    def limiter_stats(self) -> dict[str, float]:
+        """Состояние лимитера для мониторинга."""
+        return {
+            "tokens": round(self._bucket.tokens, 2),
+            "concurrency_limit": self._concurrency.limit,
+            "in_flight": self._concurrency.in_flight,
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: случайная пауза в [0, base * 2^attempt]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def get(
+        self,
+        path: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        """
+        GET с лимитами и повторами. Возвращает ответ 2xx или 304
+        (для условных запросов с If-None-Match), остальное — исключение.
+        """
+        attempt = 0
+        while True:
+            async with self._concurrency.slot():
+                await self._bucket.acquire()
+                started = time.perf_counter()
+                try:
+                    resp = await self._client.get(path, params=params, headers=headers)
+                except httpx.TransportError as e:
+                    HH_REQUEST_SECONDS.labels("error").observe(time.perf_counter() - started)
+                    if attempt >= self.max_retries:
+                        raise
+                    logger.warning("HH request failed (%s), retrying: %r", path, e)
+                    resp = None
+
+            if resp is not None:
+                HH_REQUEST_SECONDS.labels(resp.status_code).observe(
+                    time.perf_counter() - started
+                )
+                logger.info("HH response status: %s (%s)", resp.status_code, path)
+                if resp.status_code not in RETRY_STATUSES:
+                    if resp.status_code != 304:
+                        resp.raise_for_status()
+                    self._concurrency.on_success()
+                    return resp
+
+                delay = None
+                if resp.status_code in THROTTLE_STATUSES:
+                    self.throttled += 1
+                    HH_THROTTLED.inc()
+                    self._concurrency.on_throttle()
+                    delay = _parse_retry_after(resp.headers.get("Retry-After"))
+                    if delay is not None:
+                        # hh.ru явно сказал, сколько ждать, — ждут все запросы,
+                        # включая этот: пауза отработает в bucket.acquire()
+                        self._bucket.pause(delay)
+                        delay = 0.0
+
+                if attempt >= self.max_retries:
+                    resp.raise_for_status()
+            else:
+                delay = None
+
+            if delay is None:
+                delay = self._backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            HH_RETRIES.inc()
+            await asyncio.sleep(min(delay, self.backoff_max))
+
+    async def get_json(self, path: str, params: dict[str, Any] | None = None) -> Any:
+        resp = await self.get(path, params=params)
+        return loads(resp.content)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_hh_client: HHClient | None = None
+
+
+def init_hh_client(cfg: BotConfig) -> HHClient:
+    """Создаёт общий клиент hh.ru. Вызывается один раз при старте."""
+    global _hh_client
+    _hh_client = HHClient.from_config(cfg)
+    return _hh_client
+
+
+def set_hh_client(client: HHClient | None) -> None:
+    """Подменяет общий клиент (например, на клиент к фейковому серверу в тестах)."""
+    global _hh_client
+    _hh_client = client
+
+
+def get_hh_client() -> HHClient:
+    """
+    Возвращает общий клиент hh.ru.
+    Если init_hh_client() не вызывали (скрипты, тесты) — создаёт его лениво.
+    """
+    global _hh_client
+    if _hh_client is None or _hh_client.is_closed:
+        from app.config import config
+
+        _hh_client = HHClient.from_config(config)
+    return _hh_client
+
+
+def _limiter_stat(name: str) -> float:
+    return _hh_client.limiter_stats()[name] if _hh_client is not None else 0
+
+
+HH_LIMITER_TOKENS.set_function(lambda: _limiter_stat("tokens"))
+HH_CONCURRENCY_LIMIT.set_function(lambda: _limiter_stat("concurrency_limit"))
+HH_IN_FLIGHT.set_function(lambda: _limiter_stat("in_flight"))
+
+
+async def close_hh_client() -> None:
+    """Закрывает пул соединений. Вызывается при остановке бота."""
+    global _hh_client
+    if _hh_client is not None:
+        await _hh_client.aclose()
+        _hh_client = None
@@ -1,38 +1,76 @@
 # app/services/hh_service.py
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any
+import asyncio
+import hashlib
+import json
 import logging
+import re
 
-import httpx
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import SearchFilter, Vacancy, User, UserVacancy, VacancyStatus
+from app.config import config
+from app.db.crud import (
+    bulk_upsert_vacancies,
+    get_search_cursors,
+    link_vacancies_to_user,
+    save_search_cursor,
+)
+from app.db.models import SearchCursor, SearchFilter, Vacancy, User, UserVacancy
+from app.services.areas import resolve_area_id
+from app.services.hh_cache import get_response_cache
+from app.services.hh_client import HHClient, get_hh_client
+from app.services.title_matcher import TitleMatcher
+from app.services.vacancy_filters import filter_items
 
 logger = logging.getLogger(__name__)
 
-HH_API_URL = "https://api.hh.ru/vacancies"
+HH_VACANCIES_PATH = "/vacancies"
+HH_DICTIONARIES_PATH = "/dictionaries"
+HH_MAX_PER_PAGE = 100
+# hh.ru отдаёт не больше 2000 вакансий на один поиск (per_page * page)
+HH_MAX_DEPTH = 2000
 
-# Простейший маппинг городов в area-id hh.ru
-CITY_TO_AREA_ID: dict[str, int] = {
-    "санкт-петербург": 2,
-    "спб": 2,
-    "питер": 2,
-    "петербург": 2,
-    "москва": 1,
-    "moscow": 1,
-    "saint petersburg": 2,
-}
+_TAG_RE = re.compile(r"<[^>]+>")
 
+# Общий лимит одновременных запросов страниц на весь процесс
+_page_semaphore: asyncio.Semaphore | None = None
 
-def _normalize_city_name(city: str | None) -> str | None:
-    if not city:
-        return None
-    return city.strip().lower()
+
+def _get_page_semaphore() -> asyncio.Semaphore:
+    global _page_semaphore
+    if _page_semaphore is None:
+        _page_semaphore = asyncio.Semaphore(max(1, config.hh_page_concurrency))
+    return _page_semaphore
+
+
+def _date_from_param(window: timedelta, since: datetime | None) -> str:
+    """
+    date_from для hh.ru: начало окна или отметка курсора, если она свежее.
+    Округляется вниз до часа в самом запросе — запросы в пределах часа
+    совпадают и делят кэш ответов, а лишнее отсекает курсор. Ключ кэша
+    при этом строится от точного значения: округлять только ключ нельзя,
+    иначе более узкая выдача ответила бы на более широкий запрос.
+    """
+    date_from = datetime.utcnow() - window
+    if since is not None and since > date_from:
+        date_from = since
+    date_from = date_from.replace(minute=0, second=0, microsecond=0)
+    return date_from.isoformat(timespec="seconds")
 
 
-def _build_hh_params(user: User, filt: SearchFilter) -> dict[str, Any]:
+def _build_hh_params(
+    user: User,
+    filt: SearchFilter,
+    since: datetime | None = None,
+) -> dict[str, Any]:
+    """
+    Параметры поиска hh.ru для пользователя.
+    since — отметка инкрементальной загрузки: если она свежее окна
+    freshness_days, запрашиваем только то, что опубликовано после неё.
+    """
     params: dict[str, Any] = {}
 
     # 👉 Приоритет: позиция из фильтра, потом из профиля
@@ -46,13 +84,13 @@ def _build_hh_params(user: User, filt: SearchFilter) -> dict[str, Any]:
         params["search_field"] = "name"
 
     # дальше всё как у тебя: area, salary, date_from и т.д.
-    city_norm = _normalize_city_name(filt.city or user.city)
-    if city_norm:
-        area_id = CITY_TO_AREA_ID.get(city_norm)
+    city = (filt.city or user.city or "").strip()
+    if city:
+        area_id = resolve_area_id(city)
         if area_id is not None:
             params["area"] = area_id
         else:
-            logger.info("Unknown city for HH area mapping: %r", city_norm)
+            logger.info("Unknown city for HH area mapping: %r", city)
 
     # Минимальная зарплата
     if filt.min_salary:
@@ -61,8 +99,7 @@ def _build_hh_params(user: User, filt: SearchFilter) -> dict[str, Any]:
 
     # Свежесть
     days = filt.freshness_days or 1
-    date_from = datetime.utcnow() - timedelta(days=days)
-    params["date_from"] = date_from.isoformat(timespec="seconds")
+    params["date_from"] = _date_from_param(timedelta(days=days), since)
 
     # Опыт работы — наши коды -> коды hh
     # https://api.hh.ru/openapi/redoc#tag/Obshie-spravochniki/operation/get-experience
@@ -98,86 +135,344 @@ def _build_hh_params(user: User, filt: SearchFilter) -> dict[str, Any]:
         if schedules:
             params["schedule"] = list(schedules)
 
-    # Только прямые работодатели — для hh есть параметр only_with_salary, но
-    # фильтра "только прямые" нет, это обычно делается на стороне клиента.
-    # Поэтому просто игнорируем, но оставляем поле в БД на будущее.
+    # Только прямые работодатели, размер компании, ТОП-компании — у hh нет
+    # параметров под это, фильтруем на своей стороне до записи в БД
+    # (см. app/services/vacancy_filters.py).
 
-    # Размер компании / ТОП-компании — у hh нет прямых параметров под это,
-    # тоже можно реализовывать позже через доп. фильтрацию raw-данных.
-
-    # Метро тоже пока пропускаем (там нужна отдельная справочника станций + id)
+    # Метро: id станций распознаны по справочнику ещё при сохранении фильтра
+    if filt.metro_ids:
+        params["metro"] = list(filt.metro_ids)
 
     logger.info("Built HH params: %s", params)
     return params
 
 
-async def fetch_vacancies_for_user(
-    session: AsyncSession,
-    user: User,
-    filt: SearchFilter,
+def _canonical_params(params: dict[str, Any]) -> dict[str, Any]:
+    """
+    Приводит параметры поиска к каноническому виду, чтобы одинаковые
+    запросы давали одинаковый ключ: списки сортируются, текст нормализуется.
+    date_from входит как есть — его округляет сам запрос (_date_from_param).
+    """
+    canonical: dict[str, Any] = {}
+    for key, value in params.items():
+        if key == "text" and isinstance(value, str):
+            value = " ".join(value.lower().split())
+        elif isinstance(value, (list, tuple, set)):
+            value = sorted(str(v) for v in value)
+        canonical[key] = value
+    return canonical
+
+
+def hh_query_fingerprint(params: dict[str, Any]) -> str:
+    """Отпечаток нормализованного запроса к hh.ru (для дедупликации и кэша)."""
+    payload = json.dumps(_canonical_params(params), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SearchResult(list):
+    """
+    Список items из выдачи hh.ru плюс её метаданные.
+    complete=False — прочитали не все страницы (упёрлись в лимит или
+    остановились раньше), значит выдача обрезана.
+    """
+
+    found: int | None = None
+    complete: bool = True
+
+
+async def _fetch_page(
+    client: HHClient,
+    params: dict[str, Any],
+    page: int,
+) -> dict[str, Any]:
+    page_params = {**params, "page": page}
+
+    cache = get_response_cache()
+    if cache is not None:
+        key = hh_query_fingerprint(page_params)
+        cached = await cache.get(key)
+        if cached is not None:
+            return cached
+
+    async with _get_page_semaphore():
+        data = await client.get_json(HH_VACANCIES_PATH, params=page_params)
+
+    if cache is not None:
+        await cache.set(key, data)
+    return data
+
+
+async def search_vacancies(
+    params: dict[str, Any],
     limit: int = 50,
-) -> list[Vacancy]:
-    params = _build_hh_params(user, filt)
+    client: HHClient | None = None,
+    max_pages: int = 1,
+    want_new: int | None = None,
+    known_ids: set[str] | None = None,
+    max_found: int | None = None,
+) -> SearchResult:
+    """
+    Поиск на hh.ru. Возвращает сырые items.
+
+    Первая страница читается всегда; по её pages/found остальные страницы
+    (не больше max_pages) качаются параллельно волнами. Если задан want_new,
+    загрузка останавливается, как только набралось столько вакансий,
+    которых нет в known_ids. Если found больше max_found, остальные страницы
+    не читаются вовсе: такой запрос вызывающий всё равно будет дробить.
+
+    hh.ru отдаёт не больше HH_MAX_DEPTH вакансий и урезает pages до этой
+    глубины, поэтому выдача полна, только если прочитано всё найденное (found).
+    """
+    params = dict(params)
     params["per_page"] = limit
 
     logger.info("Requesting HH vacancies with params: %s", params)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(HH_API_URL, params=params)
-        logger.info("HH response status: %s", resp.status_code)
-        resp.raise_for_status()
-        data = resp.json()
+    client = client or get_hh_client()
+    data = await _fetch_page(client, params, 0)
+
+    items = SearchResult(data.get("items", []))
+    items.found = data.get("found")
+    total_pages = data.get("pages") or 1
+    pages = min(data.get("pages") or 1, max_pages, max(1, HH_MAX_DEPTH // limit))
+    logger.info(
+        "HH found %s vacancies on %s pages, reading %d",
+        data.get("found"),
+        data.get("pages"),
+        pages,
+    )
+
+    if max_found is not None and (items.found or 0) > max_found:
+        items.complete = False
+        return items
+
+    known = known_ids or set()
+    new_count = sum(1 for item in items if item["id"] not in known)
 
-    items = data.get("items", [])
+    next_page = 1
+    wave_size = max(1, config.hh_page_concurrency)
+    while next_page < pages:
+        if want_new is not None and new_count >= want_new:
+            logger.info("Enough new vacancies (%d), stop at page %d", new_count, next_page)
+            break
+
+        wave = range(next_page, min(next_page + wave_size, pages))
+        results = await asyncio.gather(
+            *(_fetch_page(client, params, page) for page in wave)
+        )
+        for page_data in results:
+            page_items = page_data.get("items", [])
+            items.extend(page_items)
+            new_count += sum(1 for item in page_items if item["id"] not in known)
+        next_page = wave.stop
+
+    items.complete = next_page >= total_pages and (
+        items.found is None or items.found <= len(items)
+    )
     logger.info("HH returned %d items", len(items))
+    return items
+
+
+async def fetch_currency_rates(client: HHClient | None = None) -> dict[str, float]:
+    """
+    Курсы валют из справочника hh.ru: сколько единиц валюты в одном рубле
+    ({"RUR": 1, "USD": 0.011, ...}). По ним hh.ru сравнивает зарплаты.
+    """
+    client = client or get_hh_client()
+    data = await client.get_json(HH_DICTIONARIES_PATH)
+    return {
+        currency["code"]: float(currency["rate"])
+        for currency in data.get("currency") or []
+        if currency.get("code") and currency.get("rate")
+    }
+
+
+def _parse_published_at(value: str | None) -> datetime | None:
+    """'2025-01-01T10:00:00+0300' -> naive UTC, как и остальные даты в БД."""
+    if not value:
+        return None
+    try:
+        moment = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return None
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
 
-    # 👉 Дополнительно фильтруем по названию, если указана позиция
-    if filt.position:
-        p = filt.position.strip().lower()
-        items = [item for item in items if p in (item.get("name") or "").lower()]
-        logger.info("Filtered items by position '%s': %d left", p, len(items))
 
-    new_vacancies: list[Vacancy] = []
+def cursor_since(filt: SearchFilter, cursor: SearchCursor | None) -> datetime | None:
+    """Отметка курсора, если он ещё действителен для текущей версии фильтра."""
+    if cursor is None or cursor.filter_updated_at != filt.updated_at:
+        # фильтр поменялся — полная пересинхронизация по окну freshness_days
+        return None
+    return cursor.last_published_at
+
+
+def _after_cursor(
+    rows: list[dict[str, Any]],
+    since: datetime | None,
+    seen_ids: set[str],
+) -> list[dict[str, Any]]:
+    if since is None:
+        return rows
+    return [
+        row
+        for row in rows
+        if row["published_at"] is None
+        or row["published_at"] > since
+        or (row["published_at"] == since and row["hh_id"] not in seen_ids)
+    ]
+
+
+def _advance_cursor(
+    rows: list[dict[str, Any]],
+    since: datetime | None,
+    seen_ids: set[str],
+) -> tuple[datetime | None, list[str]]:
+    """Новая высшая отметка: самый свежий published_at и id вакансий на нём."""
+    newest = since
+    ids = set(seen_ids) if since is not None else set()
+    for row in rows:
+        published_at = row["published_at"]
+        if published_at is None:
+            continue
+        if newest is None or published_at > newest:
+            newest = published_at
+            ids = set()
+        if published_at == newest:
+            ids.add(row["hh_id"])
+    return newest, sorted(ids)
+
+
+def _snippet_text(item: dict[str, Any]) -> str | None:
+    """Сниппет выдачи (обязанности + требования) без <highlighttext>."""
+    snippet = item.get("snippet") or {}
+    parts = []
+    for key in ("responsibility", "requirement"):
+        text = snippet.get(key)
+        if text:
+            parts.append(" ".join(_TAG_RE.sub("", text).split()))
+    return "\n".join(parts) or None
+
+
+def _dict_id(value: Any) -> str | None:
+    if not isinstance(value, dict) or value.get("id") is None:
+        return None
+    return str(value["id"])
+
+
+def _vacancy_row(item: dict[str, Any]) -> dict[str, Any]:
+    """
+    Сырой item hh.ru -> значения колонок таблицы vacancies.
+    Полный item уходит под ключом "raw" в сжатую vacancy_payloads.
+    """
+    salary = item.get("salary") or {}
+    employer = item.get("employer") or {}
+    return {
+        "hh_id": item["id"],
+        "title": item.get("name") or "",
+        "company": employer.get("name") or "",
+        "city": (item.get("area") or {}).get("name"),
+        "url": item.get("alternate_url") or "",
+        "salary_from": salary.get("from"),
+        "salary_to": salary.get("to"),
+        "currency": salary.get("currency"),
+        "published_at": _parse_published_at(item.get("published_at")),
+        "employer_id": _dict_id(employer),
+        "snippet": _snippet_text(item),
+        "schedule": _dict_id(item.get("schedule")),
+        "experience": _dict_id(item.get("experience")),
+        "raw": item,
+    }
 
-    existing_stmt = select(Vacancy).where(
-        Vacancy.hh_id.in_([item["id"] for item in items])
+
+async def store_vacancies_for_user(
+    session: AsyncSession,
+    user: User,
+    filt: SearchFilter,
+    items: list[dict[str, Any]],
+    complete: bool = True,
+    title_matcher: TitleMatcher | None = None,
+) -> list[Vacancy]:
+    """
+    Сохраняет найденные вакансии и привязывает их к пользователю.
+
+    Сначала отбрасываются вакансии, не новее курсора фильтра, затем —
+    не проходящие фильтры пользователя (название, прямой работодатель,
+    размер/ТОП компании): в БД пишется только то, что он увидит, а карточки
+    работодателей догружаются лишь для новых вакансий.
+    Курсор сдвигается, только если выдача прочитана целиком (complete):
+    иначе мы бы «перепрыгнули» через непрочитанные страницы.
+    """
+    all_rows = [_vacancy_row(item) for item in items]
+
+    cursor = (await get_search_cursors(session, [filt.id])).get(filt.id)
+    # фильтрам может понадобиться сходить в hh.ru — не держим транзакцию
+    await session.commit()
+    since = cursor_since(filt, cursor)
+    seen_ids = set(cursor.last_hh_ids or []) if since is not None else set()
+
+    rows = _after_cursor(all_rows, since, seen_ids)
+    if len(rows) != len(all_rows):
+        logger.info("Skipped %d items already seen by cursor", len(all_rows) - len(rows))
+
+    fresh_ids = {row["hh_id"] for row in rows}
+    kept = await filter_items(
+        [item for item in items if item["id"] in fresh_ids],
+        filt,
+        title_matcher=title_matcher,
     )
-    result = await session.execute(existing_stmt)
-    existing_by_hh_id = {v.hh_id: v for v in result.scalars().all()}
-
-    for item in items:
-        hh_id = item["id"]
-        vac = existing_by_hh_id.get(hh_id)
-        if not vac:
-            vac = Vacancy(
-                hh_id=hh_id,
-                title=item.get("name"),
-                company=(item.get("employer") or {}).get("name"),
-                city=(item.get("area") or {}).get("name"),
-                url=item.get("alternate_url"),
-                salary_from=(item.get("salary") or {}).get("from"),
-                salary_to=(item.get("salary") or {}).get("to"),
-                currency=(item.get("salary") or {}).get("currency"),
-                raw=item,
-            )
-            session.add(vac)
-            await session.flush()
-            new_vacancies.append(vac)
-
-        uv_stmt = select(UserVacancy).where(
-            UserVacancy.user_id == user.id,
-            UserVacancy.vacancy_id == vac.id,
-        )
-        uv_result = await session.execute(uv_stmt)
-        uv = uv_result.scalar_one_or_none()
-        if uv is None:
-            session.add(
-                UserVacancy(
-                    user_id=user.id,
-                    vacancy_id=vac.id,
-                    status=VacancyStatus.new,
-                )
-            )
+    kept_ids = {item["id"] for item in kept}
+    rows = [row for row in rows if row["hh_id"] in kept_ids]
+
+    new_vacancies, ids_by_hh_id = await bulk_upsert_vacancies(session, rows)
+    await link_vacancies_to_user(session, user.id, list(ids_by_hh_id.values()))
+
+    if complete:
+        last_published_at, last_hh_ids = _advance_cursor(all_rows, since, seen_ids)
+        await save_search_cursor(session, filt, cursor, last_published_at, last_hh_ids)
 
     await session.commit()
     return new_vacancies
+
+
+async def _linked_hh_ids(session: AsyncSession, user: User) -> set[str]:
+    result = await session.execute(
+        select(Vacancy.hh_id)
+        .join(UserVacancy, UserVacancy.vacancy_id == Vacancy.id)
+        .where(UserVacancy.user_id == user.id)
+    )
+    return set(result.scalars().all())
+
+
+async def fetch_vacancies_for_user(
+    session: AsyncSession,
+    user: User,
+    filt: SearchFilter,
+    limit: int = 50,
+    client: HHClient | None = None,
+    paginate: bool = False,
+) -> list[Vacancy]:
+    """
+    Тянет вакансии с hh.ru и сохраняет их для пользователя.
+
+    paginate=False — одна страница из limit вакансий (как раньше).
+    paginate=True — читаем до config.hh_max_pages страниц по 100 штук,
+    пока не наберётся limit вакансий, которых пользователь ещё не видел.
+    """
+    cursors = await get_search_cursors(session, [filt.id])
+    since = cursor_since(filt, cursors.get(filt.id))
+
+    params = _build_hh_params(user, filt, since=since)
+    if paginate:
+        items = await search_vacancies(
+            params,
+            limit=HH_MAX_PER_PAGE,
+            client=client,
+            max_pages=config.hh_max_pages,
+            want_new=limit,
+            known_ids=await _linked_hh_ids(session, user),
+        )
+    else:
+        items = await search_vacancies(params, limit=limit, client=client)
+    return await store_vacancies_for_user(
+        session, user, filt, items, complete=items.complete
+    )
@@ -1,8 +1,56 @@
+import time
+
 import httpx
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import config
 from app.db.models import User, Vacancy, GeneratedDocument, DocumentType
+from app.services.vacancy_details import get_detail_fetcher
+from app.utils.metrics import Counter, Histogram
+
+# Описание длиннее этого режем, чтобы не раздувать промпт
+DESCRIPTION_MAX_CHARS = 6000
+
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds",
+    "Latency of one chat completion request",
+    ("status",),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 60.0),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the LLM API", ("kind",))
+
+
+class _ChatMessage(BaseModel):
+    content: str | None = None
+
+
+class _ChatChoice(BaseModel):
+    message: _ChatMessage
+
+
+class _Usage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class ChatCompletion(BaseModel):
+    """
+    Нужная нам часть ответа /v1/chat/completions. Разбирается прямо из байтов
+    (pydantic-core): остальные поля (logprobs, ...) пропускаются,
+    не превращаясь в Python-объекты.
+    """
+
+    choices: list[_ChatChoice]
+    usage: _Usage | None = None
+
+
+def parse_chat_completion(body: bytes) -> ChatCompletion:
+    return ChatCompletion.model_validate_json(body)
+
+
+def parse_chat_content(body: bytes) -> str:
+    return parse_chat_completion(body).choices[0].message.content or ""
 
 
 class LLMClient:
@@ -28,12 +76,21 @@ class LLMClient:
             "temperature": 0.4,
         }
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.post(url, json=payload, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
+        started = time.perf_counter()
+        try:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                resp = await client.post(url, json=payload, headers=headers)
+                resp.raise_for_status()
+        except Exception:
+            LLM_REQUEST_SECONDS.labels("error").observe(time.perf_counter() - started)
+            raise
+        LLM_REQUEST_SECONDS.labels("ok").observe(time.perf_counter() - started)
 
-        return data["choices"][0]["message"]["content"]
+        completion = parse_chat_completion(resp.content)
+        if completion.usage is not None:
+            LLM_TOKENS.labels("prompt").inc(completion.usage.prompt_tokens)
+            LLM_TOKENS.labels("completion").inc(completion.usage.completion_tokens)
+        return completion.choices[0].message.content or ""
 
 
 # Один глобальный клиент на модуль
@@ -44,11 +101,19 @@ llm_client = LLMClient(
 )
 
 
+async def _vacancy_description(session: AsyncSession, vacancy: Vacancy) -> str:
+    """Полное описание с hh.ru (через кэш), а если его нет — сниппет из выдачи."""
+    description = await get_detail_fetcher().get_description(session, vacancy)
+    text = description or vacancy.snippet or ""
+    return text[:DESCRIPTION_MAX_CHARS]
+
+
 async def generate_adapted_resume(
     session: AsyncSession,
     user: User,
     vacancy: Vacancy,
 ) -> GeneratedDocument:
+    description = await _vacancy_description(session, vacancy)
     prompt = f"""
 Составь адаптированное резюме для вакансии.
 
@@ -57,7 +122,8 @@ async def generate_adapted_resume(
 Компания: {vacancy.company}
 Город: {vacancy.city}
 Зарплата: от {vacancy.salary_from} до {vacancy.salary_to} {vacancy.currency}
-Полное описание (если есть в raw): {vacancy.raw.get('snippet', {}) if vacancy.raw else ''}
+Описание вакансии:
+{description}
 
 Профиль кандидата:
 ФИО: {user.full_name}
@@ -88,6 +154,7 @@ async def generate_cover_letter(
     user: User,
     vacancy: Vacancy,
 ) -> GeneratedDocument:
+    description = await _vacancy_description(session, vacancy)
     prompt = f"""
 Напиши короткое сопроводительное письмо к вакансии.
 
@@ -95,6 +162,8 @@ async def generate_cover_letter(
 Название: {vacancy.title}
 Компания: {vacancy.company}
 Город: {vacancy.city}
+Описание:
+{description}
 
 Кандидат:
 ФИО: {user.full_name}
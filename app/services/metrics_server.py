@@ -0,0 +1,63 @@
+# app/services/metrics_server.py
+
+import logging
+
+from aiohttp import web
+
+from app.config import BotConfig
+from app.utils.metrics import CONTENT_TYPE, REGISTRY, Registry
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = "/metrics"
+
+
+def build_metrics_app(registry: Registry = REGISTRY) -> web.Application:
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode(),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+
+    app = web.Application()
+    app.router.add_get(METRICS_PATH, metrics)
+    return app
+
+
+_runner: web.AppRunner | None = None
+
+
+async def init_metrics_server(cfg: BotConfig) -> web.AppRunner | None:
+    """
+    Поднимает HTTP-эндпоинт /metrics для Prometheus (aiohttp уже есть
+    как зависимость aiogram). METRICS_PORT=0 — эндпоинт выключен.
+    """
+    global _runner
+    if not cfg.metrics_port:
+        return None
+    runner = web.AppRunner(build_metrics_app(), access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, cfg.metrics_host, cfg.metrics_port).start()
+    except OSError as e:
+        # порт занят (второй процесс бота на том же хосте) — работаем без метрик
+        logger.warning(
+            "Metrics endpoint disabled: cannot bind %s:%d (%s)",
+            cfg.metrics_host,
+            cfg.metrics_port,
+            e,
+        )
+        await runner.cleanup()
+        return None
+    logger.info(
+        "Metrics endpoint on http://%s:%d%s", cfg.metrics_host, cfg.metrics_port, METRICS_PATH
+    )
+    _runner = runner
+    return runner
+
+
+async def close_metrics_server() -> None:
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
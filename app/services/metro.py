@@ -0,0 +1,107 @@
+# app/services/metro.py
+
+from datetime import date
+from pathlib import Path
+from typing import Any
+import json
+import logging
+
+from app.services.areas import FUZZY_THRESHOLD, normalize_area_name, trigrams
+from app.services.hh_client import HHClient
+
+logger = logging.getLogger(__name__)
+
+METRO_FILE = Path(__file__).resolve().parent.parent / "data" / "hh_metro.json"
+
+
+class MetroIndex:
+    """
+    Справочник станций метро hh.ru по городам (id города = area id).
+    Название станции в свободной форме -> id станций hh.ru ("1.2").
+    Одна станция на пересадке встречается на нескольких линиях —
+    тогда возвращаем все её id.
+    """
+
+    def __init__(self, cities: list[dict[str, Any]], version: str | None = None):
+        self.version = version
+        self.stations: dict[int, dict[str, list[str]]] = {}
+        for city in cities:
+            by_name: dict[str, list[str]] = {}
+            for line in city.get("lines") or []:
+                for station in line.get("stations") or []:
+                    name = normalize_area_name(station["name"])
+                    by_name.setdefault(name, []).append(str(station["id"]))
+            self.stations[int(city["id"])] = by_name
+
+    def resolve(self, area_id: int, station: str) -> list[str]:
+        by_name = self.stations.get(area_id)
+        if not by_name:
+            return []
+
+        name = normalize_area_name(station)
+        if name in by_name:
+            return by_name[name]
+
+        # опечатки: лучший кандидат по сходству триграмм
+        grams = trigrams(name)
+        best_name, best_score = None, 0.0
+        for candidate in by_name:
+            other = trigrams(candidate)
+            common = len(grams & other)
+            score = common / (len(grams) + len(other) - common)
+            if score > best_score:
+                best_name, best_score = candidate, score
+        if best_name is None or best_score < FUZZY_THRESHOLD:
+            return []
+        return by_name[best_name]
+
+    def resolve_many(
+        self,
+        area_id: int | None,
+        stations: list[str],
+    ) -> tuple[list[str], list[str]]:
+        """Возвращает (id найденных станций, нераспознанные названия)."""
+        ids: list[str] = []
+        unknown: list[str] = []
+        for station in stations:
+            found = self.resolve(area_id, station) if area_id is not None else []
+            if found:
+                ids.extend(i for i in found if i not in ids)
+            else:
+                unknown.append(station)
+        return ids, unknown
+
+
+def load_metro_index(path: Path = METRO_FILE) -> MetroIndex:
+    with path.open(encoding="utf-8") as f:
+        data = json.load(f)
+    index = MetroIndex(data["cities"], version=data.get("version"))
+    logger.info("Loaded HH metro %s: %d cities", index.version, len(index.stations))
+    return index
+
+
+_metro_index: MetroIndex | None = None
+
+
+async def init_metro_index(client: HHClient) -> MetroIndex:
+    """
+    Справочник метро из API hh.ru (/metro). Вызывается при старте
+    с HH_DICTIONARIES_FROM_API=true;
+    если API недоступен, остаётся файл из репозитория.
+    """
+    global _metro_index
+    try:
+        cities = await client.get_json("/metro")
+        _metro_index = MetroIndex(cities, version=f"api-{date.today().isoformat()}")
+        logger.info("Loaded HH metro from API: %d cities", len(_metro_index.stations))
+    except Exception as e:
+        logger.warning("Failed to load HH metro from API, using %s: %r", METRO_FILE.name, e)
+    return get_metro_index()
+
+
+def get_metro_index() -> MetroIndex:
+    """Справочник из API или (лениво, при первом обращении) из файла."""
+    global _metro_index
+    if _metro_index is None:
+        _metro_index = load_metro_index()
+    return _metro_index
@@ -0,0 +1,396 @@
+# app/services/notification_outbox.py
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import uuid
+
+from aiogram import Bot
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import config
+from app.db.models import (
+    NotificationOutbox,
+    OutboxStatus,
+    User,
+    UserVacancy,
+    Vacancy,
+    VacancyStatus,
+)
+from app.db.session import get_session
+from app.services.telegram_sender import PRIORITY_DIGEST, deliver
+from app.utils.concurrency import run_bounded
+
+logger = logging.getLogger(__name__)
+
+# Вакансий в одном сообщении рассылки (и за один слот)
+DIGEST_MAX_VACANCIES = 10
+
+# Пауза перед повтором неудачной отправки: 1, 2, 4, ... минуты
+RETRY_BASE_SECONDS = 60
+
+
+def format_digest(vacancies: list[Vacancy]) -> str:
+    text_parts = []
+    for v in vacancies:
+        line = (
+            f"<b>{v.title}</b>\n"
+            f"{v.company} — {v.city}\n"
+            f"Зарплата: {v.salary_from}–{v.salary_to} {v.currency}\n"
+            f"<a href='{v.url}'>Ссылка на hh.ru</a>\n"
+        )
+        text_parts.append(line)
+
+    return "Вот новые вакансии для вас:\n\n" + "\n".join(text_parts)
+
+
+async def release_notifications(
+    session: AsyncSession,
+    user_id: int,
+    now: datetime,
+    limit: int = DIGEST_MAX_VACANCIES,
+    max_backlog: int | None = None,
+) -> int:
+    """
+    Слот рассылки пользователя наступил: до limit самых свежих отложенных
+    уведомлений становятся доступны отправителю. Остальные ждут следующего
+    слота, но не больше max_backlog: более старые отменяются — иначе при
+    потоке больше limit в день пользователь получал бы всё более старые
+    вакансии, а очередь росла бы без конца.
+    Без commit: выпуск фиксируется вместе с отметкой задания рассылки.
+    """
+    if max_backlog is None:
+        max_backlog = config.outbox_max_backlog
+    held = (
+        select(NotificationOutbox.id)
+        .where(
+            NotificationOutbox.user_id == user_id,
+            NotificationOutbox.status == OutboxStatus.pending,
+            NotificationOutbox.available_at.is_(None),
+        )
+        .order_by(NotificationOutbox.id.desc())
+    )
+    result = await session.execute(held.limit(limit))
+    ids = list(result.scalars().all())
+    if ids:
+        await session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(ids))
+            .values(available_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+    # выпущенные из выборки уже выпали — из оставшихся хранится
+    # не больше max_backlog самых свежих
+    result = await session.execute(held.offset(max_backlog))
+    overflow = list(result.scalars().all())
+    if overflow:
+        await session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(overflow))
+            .values(status=OutboxStatus.cancelled, error="backlog overflow")
+            .execution_options(synchronize_session=False)
+        )
+    return len(ids)
+
+
+@dataclass
+class OutboxLease:
+    token: str
+    # id пользователя -> [(id уведомления, id вакансии)]
+    by_user: dict[int, list[tuple[int, int]]]
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(
+            NotificationOutbox.status == OutboxStatus.pending,
+            NotificationOutbox.available_at <= now,
+        ),
+        and_(
+            NotificationOutbox.status == OutboxStatus.sending,
+            NotificationOutbox.lease_expires_at < now,
+        ),
+    )
+
+
+async def lease_notifications(
+    session: AsyncSession,
+    now: datetime,
+    limit: int,
+    lease_seconds: float,
+) -> OutboxLease | None:
+    """
+    Берёт в работу до limit доступных уведомлений — тем же способом, что
+    и задания рассылки: SKIP LOCKED в PostgreSQL, compare-and-set + токен
+    в SQLite. Уведомления процесса, упавшего посреди отправки, вернутся
+    в работу, когда истечёт аренда.
+    """
+    result = await session.execute(
+        select(NotificationOutbox.id)
+        .where(_claimable(now))
+        .order_by(NotificationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = list(result.scalars().all())
+    if not ids:
+        await session.commit()
+        return None
+
+    token = uuid.uuid4().hex
+    await session.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(ids), _claimable(now))
+        .values(
+            status=OutboxStatus.sending,
+            lease_token=token,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            attempts=NotificationOutbox.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(
+        select(
+            NotificationOutbox.id, NotificationOutbox.user_id, NotificationOutbox.vacancy_id
+        )
+        .where(NotificationOutbox.lease_token == token)
+        .order_by(NotificationOutbox.id)
+    )
+    by_user: dict[int, list[tuple[int, int]]] = {}
+    for outbox_id, user_id, vacancy_id in result.tuples().all():
+        by_user.setdefault(user_id, []).append((outbox_id, vacancy_id))
+    await session.commit()
+    return OutboxLease(token=token, by_user=by_user) if by_user else None
+
+
+async def extend_outbox_lease(
+    session: AsyncSession,
+    token: str,
+    now: datetime,
+    lease_seconds: float,
+) -> int:
+    """Heartbeat: продлевает аренду ещё не отправленных уведомлений пачки."""
+    result = await session.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.lease_token == token,
+            NotificationOutbox.status == OutboxStatus.sending,
+        )
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def _set_status(
+    session: AsyncSession,
+    token: str,
+    ids: list[int],
+    **values,
+) -> None:
+    await session.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.lease_token == token, NotificationOutbox.id.in_(ids))
+        .values(lease_token=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@dataclass
+class OutboxRunStats:
+    """Статистика одного прохода отправителя."""
+
+    messages: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    cancelled: int = 0
+
+
+async def _deliver_user(
+    bot: Bot,
+    session: AsyncSession,
+    lock: asyncio.Lock,
+    lease: OutboxLease,
+    user_id: int,
+    entries: list[tuple[int, int]],
+    stats: OutboxRunStats,
+) -> None:
+    vacancy_ids = [vacancy_id for _, vacancy_id in entries]
+
+    async with lock:
+        user = await session.get(User, user_id)
+        if user is None:
+            # пользователя удалили — иначе строки вечно возвращались бы по истечении аренды
+            await _set_status(
+                session,
+                lease.token,
+                [i for i, _ in entries],
+                status=OutboxStatus.cancelled,
+                error="user not found",
+            )
+            await session.commit()
+            stats.cancelled += len(entries)
+            return
+        result = await session.execute(
+            select(Vacancy)
+            .join(UserVacancy, UserVacancy.vacancy_id == Vacancy.id)
+            .where(
+                UserVacancy.user_id == user_id,
+                UserVacancy.vacancy_id.in_(vacancy_ids),
+                UserVacancy.status == VacancyStatus.new,
+            )
+            .order_by(Vacancy.id)
+        )
+        vacancies = list(result.scalars().all())
+        fresh = {v.id for v in vacancies}
+        # уже показаны другим путём (например, /vacancies) — не дублируем
+        stale = [i for i, vid in entries if vid not in fresh]
+        if stale:
+            await _set_status(session, lease.token, stale, status=OutboxStatus.cancelled)
+            await session.commit()
+            stats.cancelled += len(stale)
+        ids = [i for i, vid in entries if vid in fresh]
+
+    if not ids:
+        return
+
+    try:
+        await asyncio.wait_for(
+            deliver(
+                bot,
+                user.telegram_id,
+                format_digest(vacancies),
+                priority=PRIORITY_DIGEST,
+                disable_web_page_preview=True,
+            ),
+            timeout=config.digest_user_timeout,
+        )
+    except Exception as e:
+        logger.warning("Outbox delivery to user %s failed: %r", user_id, e)
+        await _retry_later(session, lock, lease.token, ids, repr(e), stats)
+        return
+
+    # отправлено — фиксируем сразу, пока не упали
+    now = datetime.utcnow()
+    async with lock:
+        await _set_status(session, lease.token, ids, status=OutboxStatus.sent, sent_at=now)
+        await session.execute(
+            update(UserVacancy)
+            .where(
+                UserVacancy.user_id == user_id,
+                UserVacancy.vacancy_id.in_(list(fresh)),
+            )
+            .values(status=VacancyStatus.sent, sent_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    stats.messages += 1
+    stats.sent += len(ids)
+
+
+async def _retry_later(
+    session: AsyncSession,
+    lock: asyncio.Lock,
+    token: str,
+    ids: list[int],
+    error: str,
+    stats: OutboxRunStats,
+) -> None:
+    now = datetime.utcnow()
+    async with lock:
+        result = await session.execute(
+            select(NotificationOutbox.id, NotificationOutbox.attempts).where(
+                NotificationOutbox.id.in_(ids)
+            )
+        )
+        attempts = dict(result.tuples().all())
+        exhausted = [i for i in ids if attempts.get(i, 0) >= config.outbox_max_attempts]
+        retry = [i for i in ids if i not in exhausted]
+        if exhausted:
+            await _set_status(session, token, exhausted, status=OutboxStatus.failed, error=error)
+        if retry:
+            delay = RETRY_BASE_SECONDS * 2 ** (max(attempts[i] for i in retry) - 1)
+            await _set_status(
+                session,
+                token,
+                retry,
+                status=OutboxStatus.pending,
+                available_at=now + timedelta(seconds=delay),
+                error=error,
+            )
+        await session.commit()
+    stats.failed += len(exhausted)
+    stats.retried += len(retry)
+
+
+async def _drain_batch(bot: Bot, now: datetime | None, stats: OutboxRunStats) -> bool:
+    async for session in get_session():
+        lease = await lease_notifications(
+            session,
+            now or datetime.utcnow(),
+            config.outbox_batch_size,
+            config.outbox_lease_seconds,
+        )
+        if lease is None:
+            return False
+
+        lock = asyncio.Lock()
+
+        async def handle(item: tuple[int, list[tuple[int, int]]]) -> None:
+            user_id, entries = item
+            try:
+                await _deliver_user(bot, session, lock, lease, user_id, entries, stats)
+            except Exception:
+                logger.exception("Outbox delivery to user %s crashed", user_id)
+
+        async def heartbeat() -> None:
+            # пачка может отправляться дольше аренды (очередь Telegram,
+            # таймаут на пользователя) — без продления её перехватил бы
+            # параллельный проход и отправил бы сообщения второй раз
+            lease_seconds = config.outbox_lease_seconds
+            while True:
+                await asyncio.sleep(lease_seconds / 3)
+                try:
+                    async with lock:
+                        await extend_outbox_lease(
+                            session, lease.token, datetime.utcnow(), lease_seconds
+                        )
+                except Exception:
+                    logger.warning("Outbox lease heartbeat failed", exc_info=True)
+
+        beat = asyncio.create_task(heartbeat())
+        try:
+            await run_bounded(list(lease.by_user.items()), handle, config.digest_concurrency)
+        finally:
+            # под замком heartbeat не посреди запроса: отмена не рвёт соединение
+            async with lock:
+                beat.cancel()
+            await asyncio.gather(beat, return_exceptions=True)
+    return True
+
+
+async def drain_outbox(bot: Bot, now: datetime | None = None) -> OutboxRunStats:
+    """
+    Отправляет доступные уведомления пачками по outbox_batch_size: одно
+    сообщение на пользователя. Отправка идёт параллельно (лимиты Telegram
+    держит общая очередь), записи в БД — по одной через общую сессию.
+    """
+    stats = OutboxRunStats()
+    while await _drain_batch(bot, now, stats):
+        pass
+
+    if stats.messages or stats.retried or stats.failed:
+        logger.info(
+            "Outbox: messages=%d, sent=%d, retried=%d, failed=%d, cancelled=%d",
+            stats.messages,
+            stats.sent,
+            stats.retried,
+            stats.failed,
+            stats.cancelled,
+        )
+    return stats
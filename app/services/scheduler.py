@@ -1,64 +1,407 @@
-from datetime import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+import asyncio
+import logging
+import time
 
 from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import config
 from app.db.session import get_session
 from app.db.models import User, SearchFilter
-from app.db.crud import get_unsent_vacancies_for_user, mark_vacancies_as_sent
-from app.services.hh_service import fetch_vacancies_for_user
+from app.db.crud import (
+    get_search_cursors,
+    stream_digest_targets,
+    stream_digest_user_ids,
+)
+from app.services.digest_queue import (
+    FINISHED_ITEMS_KEEP,
+    WORKER_ID,
+    checkpoint_work_item,
+    enqueue_due_digests,
+    finish_digest_run,
+    finish_work_items,
+    interrupt_stale_runs,
+    lease_heartbeat,
+    lease_work_items,
+    purge_work_items,
+    start_digest_run,
+)
+from app.services.digest_slots import assign_digest_slots
+from app.services.hh_service import (
+    HH_MAX_PER_PAGE,
+    _build_hh_params,
+    cursor_since,
+    hh_query_fingerprint,
+    search_vacancies,
+    store_vacancies_for_user,
+)
+from app.services.notification_outbox import drain_outbox, release_notifications
+from app.services.telegram_sender import get_telegram_sender
+from app.services.title_matcher import get_title_matcher
+from app.services.vacancy_pool import VACANCY_ENGINE_POOL, run_pool_cycle
+from app.utils.concurrency import run_bounded
+from app.utils.metrics import Counter, Histogram
+from app.utils.stats import percentile
 
+logger = logging.getLogger(__name__)
 
-async def _daily_job(bot: Bot):
-    # один общий проход по всем пользователям
+DIGEST_RUN_SECONDS = Histogram(
+    "digest_run_seconds",
+    "Duration of one digest run (a batch of due users)",
+    ("engine",),
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0),
+)
+DIGEST_USER_SECONDS = Histogram(
+    "digest_user_seconds",
+    "Time to process one user in a digest run",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+DIGEST_USERS = Counter("digest_users_total", "Users handled by digest runs", ("result",))
+
+
+@dataclass
+class DigestRunStats:
+    """Статистика одного прогона ежедневной рассылки."""
+
+    users: int = 0
+    hh_queries: int = 0
+    sent: int = 0
+    processed: int = 0
+    failed: int = 0
+    # время обработки каждого пользователя, секунды
+    durations: list[float] = field(default_factory=list)
+    # id пользователей, которым не удалось отправить рассылку
+    failed_user_ids: set[int] = field(default_factory=set)
+
+    @property
+    def hh_queries_saved(self) -> int:
+        return self.users - self.hh_queries
+
+    @property
+    def p50(self) -> float:
+        return percentile(self.durations, 50)
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.durations, 95)
+
+
+async def _release_digest(session: AsyncSession, user_id: int) -> bool:
+    """
+    Слот пользователя наступил: его уведомления из outbox становятся
+    доступны отправителю. True — если было что слать.
+    """
+    return await release_notifications(session, user_id, datetime.utcnow()) > 0
+
+
+Checkpoint = Callable[[AsyncSession, int], Awaitable[None]]
+
+
+async def _process_user(
+    stats: DigestRunStats,
+    user_id: int,
+    step: Callable[[AsyncSession], Awaitable[bool]],
+    extra_seconds: float = 0.0,
+    checkpoint: Checkpoint | None = None,
+) -> None:
+    """
+    Шаг рассылки для одного пользователя: своя сессия, свой таймаут.
+    Ошибка или зависание одного пользователя не прерывает прогон.
+    checkpoint отмечает пользователя обработанным в той же транзакции.
+    """
+    stats.users += 1
+    started = time.monotonic()
+
+    async def run() -> bool:
+        sent = False
+        # aclosing: при таймауте сессия закрывается сразу, а не сборщиком мусора
+        async with aclosing(get_session()) as sessions:
+            async for session in sessions:
+                sent = await step(session)
+                if checkpoint is not None:
+                    await checkpoint(session, user_id)
+                await session.commit()
+        return sent
+
+    try:
+        sent = await asyncio.wait_for(run(), timeout=config.digest_user_timeout)
+    except asyncio.TimeoutError:
+        stats.failed += 1
+        stats.failed_user_ids.add(user_id)
+        logger.warning("Digest for user %s timed out", user_id)
+    except Exception:
+        stats.failed += 1
+        stats.failed_user_ids.add(user_id)
+        logger.exception("Digest for user %s failed", user_id)
+    else:
+        stats.processed += 1
+        if sent:
+            stats.sent += 1
+    finally:
+        duration = time.monotonic() - started + extra_seconds
+        stats.durations.append(duration)
+        DIGEST_USER_SECONDS.observe(duration)
+
+
+def _log_summary(stats: DigestRunStats, engine: str) -> None:
+    DIGEST_USERS.labels("processed").inc(stats.processed)
+    DIGEST_USERS.labels("failed").inc(stats.failed)
+    DIGEST_USERS.labels("sent").inc(stats.sent)
+    logger.info(
+        "Daily digest (%s): users=%d, processed=%d, sent=%d, failed=%d, "
+        "hh_queries=%d (saved %d), p50=%.2fs, p95=%.2fs",
+        engine,
+        stats.users,
+        stats.processed,
+        stats.sent,
+        stats.failed,
+        stats.hh_queries,
+        stats.hh_queries_saved,
+        stats.p50,
+        stats.p95,
+    )
+    sender = get_telegram_sender()
+    if sender is not None:
+        sender_stats = sender.stats()
+        logger.info(
+            "Telegram queue: depth=%d, delayed=%d, sent=%d, retried=%d, failed=%d, "
+            "latency p50=%.2fs, p95=%.2fs",
+            sender_stats["queue_depth"],
+            sender_stats["delayed"],
+            sender_stats["sent"],
+            sender_stats["retried"],
+            sender_stats["failed"],
+            sender_stats["latency_p50"],
+            sender_stats["latency_p95"],
+        )
+
+
+async def _pool_daily_job(
+    user_ids: list[int] | None = None,
+    checkpoint: Checkpoint | None = None,
+) -> DigestRunStats:
+    """
+    Рассылка в режиме пула: подбор уже сделан локально, только отправляем.
+    Для пачки по слотам (user_ids) пул не пополняется — это делает
+    отдельная интервальная задача.
+    """
+    stats = DigestRunStats()
+    if user_ids is None:
+        pool_stats = await run_pool_cycle()
+        stats.hh_queries = pool_stats.slices
+
+    # отправке нужны только id — ни профилей, ни фильтров не грузим
     async for session in get_session():
-        result = await session.execute(select(User))
-        users = result.scalars().all()
+        targets = [user_id async for user_id in stream_digest_user_ids(session, user_ids)]
+
+    async def handle(user_id: int) -> None:
+        await _process_user(
+            stats,
+            user_id,
+            lambda session: _release_digest(session, user_id),
+            checkpoint=checkpoint,
+        )
+
+    await run_bounded(targets, handle, config.digest_concurrency)
+    _log_summary(stats, "pool")
+    return stats
+
+
+async def _daily_job(
+    bot: Bot,
+    user_ids: list[int] | None = None,
+    checkpoint: Checkpoint | None = None,
+) -> DigestRunStats:
+    """
+    Рассылка всем пользователям с фильтрами или только пачке user_ids:
+    подбор вакансий и выпуск уведомлений, затем — их отправка.
+    """
+    with DIGEST_RUN_SECONDS.labels(config.vacancy_engine).time():
+        if config.vacancy_engine == VACANCY_ENGINE_POOL:
+            stats = await _pool_daily_job(user_ids, checkpoint)
+        else:
+            stats = await _per_user_daily_job(user_ids, checkpoint)
+
+    # выпущенное уходит сразу; неудачные отправки повторит интервальная задача
+    try:
+        await drain_outbox(bot)
+    except Exception:
+        logger.exception("Outbox drain after digest failed")
+    return stats
 
-    for user in users:
-        async for session in get_session():
-            result = await session.execute(
-                select(SearchFilter).where(SearchFilter.user_id == user.id)
+
+async def _per_user_daily_job(
+    user_ids: list[int] | None = None,
+    checkpoint: Checkpoint | None = None,
+) -> DigestRunStats:
+    stats = DigestRunStats()
+
+    # один запрос на всю пачку: пользователь с фильтром, только нужные поля
+    async for session in get_session():
+        targets = [row async for row in stream_digest_targets(session, user_ids)]
+        cursors = await get_search_cursors(session, [filt.id for _, filt in targets])
+
+    # должности всех пользователей — в один автомат; между прогонами
+    # он перестраивается только для изменившихся фильтров
+    title_matcher = get_title_matcher()
+    if user_ids is None:
+        title_matcher.sync({filt.id: filt.position for _, filt in targets})
+    else:
+        # пачка — лишь часть пользователей, остальных из автомата не убираем
+        for _, filt in targets:
+            title_matcher.update(filt.id, filt.position)
+
+    # группируем пользователей с одинаковым запросом к hh.ru
+    # (курсор в отпечаток не входит — он у каждого свой)
+    groups: dict[str, list[tuple[User, SearchFilter]]] = {}
+    for user, filt in targets:
+        key = hh_query_fingerprint(_build_hh_params(user, filt))
+        groups.setdefault(key, []).append((user, filt))
+
+    # общий лимит на шаги пользователей: участники большой группы идут
+    # параллельно, но вместе с другими группами не больше digest_concurrency
+    user_slots = asyncio.Semaphore(config.digest_concurrency)
+
+    async def handle(members: list[tuple[User, SearchFilter]]) -> None:
+        # группе нужен запрос от самого «старого» курсора;
+        # лишнее каждый участник отсечёт своим курсором при сохранении
+        since_values = [cursor_since(f, cursors.get(f.id)) for _, f in members]
+        since = None if None in since_values else min(since_values)
+        user, filt = members[0]
+
+        # один запрос к hh.ru на всю группу
+        started = time.monotonic()
+        try:
+            items = await asyncio.wait_for(
+                search_vacancies(
+                    _build_hh_params(user, filt, since=since),
+                    limit=HH_MAX_PER_PAGE,
+                    max_pages=config.hh_max_pages,
+                ),
+                timeout=config.digest_user_timeout,
             )
-            filt = result.scalar_one_or_none()
-            if not filt:
-                continue
-
-            # получаем новые вакансии
-            await fetch_vacancies_for_user(session, user, filt, limit=50)
-            vacancies = await get_unsent_vacancies_for_user(session, user, limit=10)
-
-            if not vacancies:
-                continue
-
-            # отправляем пользователю
-            text_parts = []
-            for v in vacancies:
-                line = (
-                    f"<b>{v.title}</b>\n"
-                    f"{v.company} — {v.city}\n"
-                    f"Зарплата: {v.salary_from}–{v.salary_to} {v.currency}\n"
-                    f"<a href='{v.url}'>Ссылка на hh.ru</a>\n"
+        except Exception as e:
+            logger.warning("HH search failed for %d users: %r", len(members), e)
+            stats.users += len(members)
+            stats.failed += len(members)
+            stats.failed_user_ids.update(user.id for user, _ in members)
+            return
+        search_seconds = time.monotonic() - started
+        stats.hh_queries += 1
+
+        async def process(user: User, filt: SearchFilter) -> None:
+            async def step(session: AsyncSession) -> bool:
+                await store_vacancies_for_user(
+                    session,
+                    user,
+                    filt,
+                    items,
+                    complete=items.complete,
+                    title_matcher=title_matcher,
                 )
-                text_parts.append(line)
+                return await _release_digest(session, user.id)
 
-            text = "Вот новые вакансии для вас:\n\n" + "\n".join(text_parts)
-            await bot.send_message(
-                user.telegram_id, text, disable_web_page_preview=True
-            )
+            async with user_slots:
+                await _process_user(
+                    stats, user.id, step, extra_seconds=search_seconds, checkpoint=checkpoint
+                )
+
+        # поиск сделан один раз — участники сохраняют его результат параллельно
+        await asyncio.gather(*(process(user, filt) for user, filt in members))
 
-            await mark_vacancies_as_sent(session, user, list(vacancies))
+    await run_bounded(list(groups.values()), handle, config.digest_concurrency)
+    _log_summary(stats, "per_user")
+    return stats
+
+
+async def _digest_tick(bot: Bot, now: datetime | None = None) -> DigestRunStats | None:
+    """
+    Рассылает пачку пользователей, у которых наступил слот. Слоты размазаны
+    по дню (часовой пояс, выбранный час, сдвиг по id), поэтому каждый тик —
+    небольшая порция запросов к hh.ru, БД и Telegram.
+
+    Наступившие слоты становятся заданиями в digest_work_items; задания
+    берутся в аренду, так что тик можно запускать в нескольких процессах
+    сразу: каждый возьмёт свою часть, а задания упавшего процесса заберут
+    остальные, когда истечёт аренда.
+
+    Каждая аренда — прогон в digest_runs. Пользователь отмечается выполненным
+    в одной транзакции со своим шагом, так что прогон, прерванный деплоем
+    или падением, продолжится с того же места, без повторов.
+    """
+    now = now or datetime.utcnow()
+    async for session in get_session():
+        await interrupt_stale_runs(session, now, config.digest_lease_seconds)
+        await assign_digest_slots(session, now)
+        await enqueue_due_digests(
+            session,
+            now,
+            config.digest_batch_size,
+            max_lag=timedelta(hours=config.digest_max_lag_hours),
+        )
+        await purge_work_items(session, now - FINISHED_ITEMS_KEEP)
+        lease = await lease_work_items(
+            session,
+            WORKER_ID,
+            now,
+            config.digest_batch_size,
+            config.digest_lease_seconds,
+            config.digest_max_attempts,
+        )
+        if lease is not None:
+            await start_digest_run(session, lease, WORKER_ID, now)
+    if lease is None:
+        return None
+
+    async def checkpoint(session: AsyncSession, user_id: int) -> None:
+        await checkpoint_work_item(session, lease, user_id)
+
+    async with lease_heartbeat(lease, config.digest_lease_seconds):
+        stats = await _daily_job(bot, lease.user_ids, checkpoint=checkpoint)
+
+    async for session in get_session():
+        await finish_work_items(
+            session, lease, stats.failed_user_ids, config.digest_max_attempts
+        )
+        await finish_digest_run(session, lease.run_id, stats.processed, stats.failed)
+    return stats
 
 
 def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
     scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
-    # каждый день в 09:00
+    # слоты пользователей проверяются каждые несколько минут, по одному тику
+    # за раз; первый — сразу при старте, чтобы подхватить прерванный прогон,
+    # а пропущенные запуски схлопываются в один (тик забирает всё наступившее)
+    scheduler.add_job(
+        _digest_tick,
+        trigger="interval",
+        minutes=config.digest_tick_minutes,
+        args=(bot,),
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=config.digest_tick_minutes * 60,
+        next_run_time=datetime.now(timezone.utc),
+    )
+    # повторы неудачных отправок и всё, что выпущено другими процессами
     scheduler.add_job(
-        _daily_job,
-        trigger="cron",
-        hour=9,
-        minute=0,
+        drain_outbox,
+        trigger="interval",
+        seconds=config.outbox_poll_seconds,
         args=(bot,),
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=config.outbox_poll_seconds,
     )
+    if config.vacancy_engine == VACANCY_ENGINE_POOL:
+        # пул пополняется в течение дня, независимо от числа пользователей
+        scheduler.add_job(
+            run_pool_cycle,
+            trigger="interval",
+            minutes=config.hh_pool_interval_minutes,
+        )
     return scheduler
@@ -0,0 +1,289 @@
+# app/services/telegram_sender.py
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+import asyncio
+import itertools
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.config import BotConfig
+from app.utils.metrics import Counter, Gauge, Histogram
+from app.utils.rate_limit import TokenBucket
+from app.utils.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+# Чем меньше число, тем раньше уходит сообщение
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DIGEST = 10
+
+# Сколько лимитов по чатам держать в памяти до чистки простаивающих
+MAX_CHAT_BUCKETS = 10_000
+
+TELEGRAM_SEND_SECONDS = Histogram(
+    "telegram_send_seconds",
+    "Time from enqueue to a successful Telegram API call (queue wait included)",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+TELEGRAM_SENT = Counter("telegram_sent_total", "Telegram API calls that succeeded")
+TELEGRAM_ERRORS = Counter(
+    "telegram_errors_total", "Failed Telegram API calls", ("reason",)
+)
+TELEGRAM_QUEUE_DEPTH = Gauge("telegram_queue_depth", "Messages waiting in the send queue")
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    chat_id: int = field(compare=False)
+    call: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class TelegramSender:
+    """
+    Единая очередь исходящих сообщений Telegram.
+
+    - общий лимит бота (~30 сообщений/с) и лимит на чат (~1 сообщение/с) —
+      token bucket'ы;
+    - приоритеты: ответы на команды уходят раньше ежедневной рассылки,
+      внутри приоритета — в порядке постановки;
+    - TelegramRetryAfter: чат ставится на паузу на retry_after секунд,
+      сообщение повторяется (не больше max_retries раз).
+
+    Сообщение, упёршееся в лимит чата, не держит обработчик: оно
+    откладывается и возвращается в очередь, когда лимит освободится.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        workers: int = 4,
+        max_retries: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bot = bot
+        self.max_retries = max_retries
+        self._workers_count = max(1, workers)
+        self._clock = clock
+        self._queue: asyncio.PriorityQueue[_Job] = asyncio.PriorityQueue()
+        self._global = TokenBucket(rate=global_rate, capacity=global_rate, clock=clock)
+        self._chat_rate = chat_rate
+        self._chats: dict[int, TokenBucket] = {}
+        self._seq = itertools.count()
+        self._workers: list[asyncio.Task] = []
+        # отложенные задания (лимит чата, RetryAfter): seq -> (таймер, задание)
+        self._timers: dict[int, tuple[asyncio.TimerHandle, _Job]] = {}
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    @classmethod
+    def from_config(cls, bot: Bot, cfg: BotConfig) -> "TelegramSender":
+        return cls(
+            bot,
+            global_rate=cfg.telegram_global_rate,
+            chat_rate=cfg.telegram_chat_rate,
+            workers=cfg.telegram_send_workers,
+            max_retries=cfg.telegram_max_retries,
+        )
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker()) for _ in range(self._workers_count)
+            ]
+
+    async def stop(self) -> None:
+        workers, self._workers = self._workers, []
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # отложенные задания в очередь уже не вернутся — их ждущие не должны висеть
+        timers, self._timers = self._timers, {}
+        for handle, job in timers.values():
+            handle.cancel()
+            if not job.future.done():
+                job.future.cancel()
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.cancel()
+
+    def stats(self) -> dict[str, float]:
+        """Состояние очереди для мониторинга."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "delayed": len(self._timers),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_p50": percentile(self._latencies, 50),
+            "latency_p95": percentile(self._latencies, 95),
+        }
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                # полный бакет = чат давно молчит, его можно забыть
+                self._chats = {
+                    cid: b for cid, b in self._chats.items() if b.tokens < b.capacity
+                }
+            bucket = TokenBucket(rate=self._chat_rate, capacity=1, clock=self._clock)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def submit(
+        self,
+        chat_id: int,
+        call: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_DIGEST,
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(priority, next(self._seq), chat_id, call, future, self._clock())
+        self._queue.put_nowait(job)
+        return future
+
+    async def call(
+        self,
+        chat_id: int,
+        call: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_DIGEST,
+    ) -> Any:
+        return await self.submit(chat_id, call, priority)
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        priority: int = PRIORITY_DIGEST,
+        **kwargs: Any,
+    ) -> Any:
+        return await self.call(
+            chat_id,
+            lambda: self.bot.send_message(chat_id, text, **kwargs),
+            priority,
+        )
+
+    def _requeue_later(self, job: _Job, delay: float) -> None:
+        def put() -> None:
+            self._timers.pop(job.seq, None)
+            self._queue.put_nowait(job)
+
+        handle = asyncio.get_running_loop().call_later(delay, put)
+        self._timers[job.seq] = (handle, job)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            except Exception:
+                logger.exception("Telegram sender worker failed")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: _Job) -> None:
+        if job.future.done():
+            # вызывающий уже не ждёт (отмена, таймаут)
+            return
+
+        wait = self._chat_bucket(job.chat_id).try_acquire()
+        if wait > 0:
+            self._requeue_later(job, wait)
+            return
+        await self._global.acquire()
+
+        try:
+            result = await job.call()
+        except TelegramRetryAfter as e:
+            job.attempts += 1
+            self.retried += 1
+            TELEGRAM_ERRORS.labels("retry_after").inc()
+            self._chat_bucket(job.chat_id).pause(e.retry_after)
+            if job.attempts > self.max_retries:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                return
+            logger.warning(
+                "Telegram flood control for chat %s, retry in %ss", job.chat_id, e.retry_after
+            )
+            self._requeue_later(job, e.retry_after)
+            return
+        except Exception as e:
+            self.failed += 1
+            TELEGRAM_ERRORS.labels(type(e).__name__).inc()
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+
+        self.sent += 1
+        latency = self._clock() - job.enqueued_at
+        self._latencies.append(latency)
+        TELEGRAM_SENT.inc()
+        TELEGRAM_SEND_SECONDS.observe(latency)
+        if not job.future.done():
+            job.future.set_result(result)
+
+
+_sender: TelegramSender | None = None
+
+
+def init_telegram_sender(bot: Bot, cfg: BotConfig) -> TelegramSender:
+    """Создаёт и запускает общую очередь. Вызывается один раз при старте."""
+    global _sender
+    _sender = TelegramSender.from_config(bot, cfg)
+    _sender.start()
+    return _sender
+
+
+def get_telegram_sender() -> TelegramSender | None:
+    return _sender
+
+
+def _queue_depth() -> float:
+    return _sender.stats()["queue_depth"] if _sender is not None else 0
+
+
+TELEGRAM_QUEUE_DEPTH.set_function(_queue_depth)
+
+
+async def close_telegram_sender() -> None:
+    global _sender
+    if _sender is not None:
+        await _sender.stop()
+        _sender = None
+
+
+async def deliver(
+    bot: Bot,
+    chat_id: int,
+    text: str,
+    priority: int = PRIORITY_DIGEST,
+    **kwargs: Any,
+) -> Any:
+    """
+    Отправляет сообщение через общую очередь, если она запущена,
+    иначе напрямую (скрипты, тесты).
+    """
+    sender = _sender
+    if sender is None or not sender.running:
+        return await bot.send_message(chat_id, text, **kwargs)
+    return await sender.send_message(chat_id, text, priority=priority, **kwargs)
@@ -0,0 +1,157 @@
+# app/services/title_matcher.py
+
+from collections import deque
+from typing import Hashable
+
+Owner = Hashable
+
+# Сколько разных названий помнить между изменениями автомата
+MEMO_MAX_SIZE = 50_000
+
+
+def normalize_title(text: str | None) -> str:
+    """Регистр, ё/е и лишние пробелы не влияют на совпадение."""
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+
+class _Node:
+    __slots__ = ("children", "fail", "out", "owners")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.fail: "_Node | None" = None
+        # ближайший по fail-цепочке узел, где кончается какой-то шаблон
+        self.out: "_Node | None" = None
+        self.owners: set[Owner] = set()
+
+
+class TitleMatcher:
+    """
+    Автомат Ахо — Корасик по должностям из фильтров всех пользователей.
+
+    Шаблон — нормализованная строка filt.position, владелец — id фильтра.
+    match(title) за один проход по названию вакансии возвращает всех
+    владельцев, чья должность входит в название подстрокой (как и
+    прежняя проверка `position in name.lower()`).
+
+    Изменения инкрементальные: новый шаблон дописывается в бор,
+    удалённый — только снимается с узла; fail-ссылки пересчитываются
+    лениво, один раз на пачку изменений, перед следующим match().
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._patterns: dict[Owner, str] = {}
+        self._dirty = False
+        self._memo: dict[str, frozenset[Owner]] = {}
+        self.rebuilds = 0
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def pattern_of(self, owner: Owner) -> str | None:
+        return self._patterns.get(owner)
+
+    def _node_for(self, pattern: str, create: bool) -> _Node | None:
+        node = self._root
+        for ch in pattern:
+            child = node.children.get(ch)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[ch] = _Node()
+                self._dirty = True
+            node = child
+        return node
+
+    def remove(self, owner: Owner) -> None:
+        pattern = self._patterns.pop(owner, None)
+        if pattern is None:
+            return
+        node = self._node_for(pattern, create=False)
+        if node is not None:
+            node.owners.discard(owner)
+        self._memo.clear()
+
+    def update(self, owner: Owner, position: str | None) -> None:
+        """Добавляет, меняет или (для пустой должности) убирает шаблон владельца."""
+        pattern = normalize_title(position)
+        if self._patterns.get(owner) == pattern:
+            return
+        self.remove(owner)
+        if not pattern:
+            return
+        self._patterns[owner] = pattern
+        node = self._node_for(pattern, create=True)
+        if not node.owners:
+            # узел стал концом шаблона — out-ссылки других узлов устарели
+            self._dirty = True
+        node.owners.add(owner)
+        self._memo.clear()
+
+    def sync(self, positions: dict[Owner, str | None]) -> None:
+        """Приводит автомат к набору {владелец: должность}, трогая только разницу."""
+        for owner in [o for o in self._patterns if o not in positions]:
+            self.remove(owner)
+        for owner, position in positions.items():
+            self.update(owner, position)
+
+    def _build_links(self) -> None:
+        root = self._root
+        root.fail = None
+        root.out = None
+        queue: deque[_Node] = deque()
+        for child in root.children.values():
+            child.fail = root
+            child.out = None
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for ch, child in node.children.items():
+                fail = node.fail
+                while fail is not None and ch not in fail.children:
+                    fail = fail.fail
+                child.fail = fail.children[ch] if fail is not None else root
+                child.out = child.fail if child.fail.owners else child.fail.out
+                queue.append(child)
+
+        self._dirty = False
+        self.rebuilds += 1
+
+    def match(self, title: str | None) -> frozenset[Owner]:
+        """Владельцы всех шаблонов, входящих в название. Результат кэшируется."""
+        text = normalize_title(title)
+        cached = self._memo.get(text)
+        if cached is not None:
+            return cached
+        if self._dirty:
+            self._build_links()
+
+        found: set[Owner] = set()
+        node = self._root
+        for ch in text:
+            while node is not self._root and ch not in node.children:
+                node = node.fail
+            node = node.children.get(ch, self._root)
+            hit = node if node.owners else node.out
+            while hit is not None:
+                found.update(hit.owners)
+                hit = hit.out
+
+        result = frozenset(found)
+        if len(self._memo) >= MEMO_MAX_SIZE:
+            self._memo.clear()
+        self._memo[text] = result
+        return result
+
+
+_title_matcher: TitleMatcher | None = None
+
+
+def get_title_matcher() -> TitleMatcher:
+    """Общий автомат процесса; живёт между прогонами рассылки."""
+    global _title_matcher
+    if _title_matcher is None:
+        _title_matcher = TitleMatcher()
+    return _title_matcher
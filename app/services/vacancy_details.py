@@ -0,0 +1,201 @@
+# app/services/vacancy_details.py
+
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from typing import Any, Callable
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import config
+from app.db.crud import get_vacancy_details, upsert_vacancy_details
+from app.db.models import Vacancy
+from app.services.hh_client import HHClient, get_hh_client
+from app.utils.json_codec import loads
+
+logger = logging.getLogger(__name__)
+
+BLOCK_TAGS = {
+    "p", "div", "br", "ul", "ol", "li", "tr", "table",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote",
+}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        if tag == "li":
+            self.parts.append("- ")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        self.parts.append(data)
+
+
+def html_to_text(html: str | None) -> str:
+    """HTML описания hh.ru -> простой текст: абзацы и пункты списков по строкам."""
+    if not html:
+        return ""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+
+    lines = (" ".join(line.split()) for line in "".join(parser.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def detail_text(description: str | None, key_skills: list[str] | None) -> str | None:
+    """Описание вакансии для промпта LLM."""
+    parts = []
+    if description:
+        parts.append(description)
+    if key_skills:
+        parts.append("Ключевые навыки: " + ", ".join(key_skills))
+    return "\n\n".join(parts) or None
+
+
+class VacancyDetailFetcher:
+    """
+    Полные описания вакансий (/vacancies/{id}) с кэшем в таблице vacancy_details.
+
+    Описание очищается от HTML один раз при загрузке и общее для всех
+    пользователей. Устаревшие записи перепроверяются с If-None-Match:
+    на 304 hh.ru не присылает тело, мы только продлеваем срок.
+    Одна и та же вакансия, запрошенная параллельно, качается один раз
+    (отдельно для запросов с разным ETag: кому нужно тело, не получит 304).
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        concurrency: int = 4,
+        client: HHClient | None = None,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        self.ttl = timedelta(seconds=ttl)
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._client = client
+        self._clock = clock
+        # (hh_id, etag) -> запрос к hh.ru
+        self._in_flight: dict[tuple[str, str | None], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
+
+    async def _request(self, hh_id: str, etag: str | None) -> dict[str, Any]:
+        headers = {"If-None-Match": etag} if etag else None
+        async with self._semaphore:
+            client = self._client or get_hh_client()
+            resp = await client.get(f"/vacancies/{hh_id}", headers=headers)
+
+        if resp.status_code == 304:
+            return {"not_modified": True, "etag": resp.headers.get("ETag") or etag}
+        data = loads(resp.content)
+        return {
+            "not_modified": False,
+            "description": html_to_text(data.get("description")),
+            "key_skills": [s["name"] for s in data.get("key_skills") or [] if s.get("name")],
+            "etag": resp.headers.get("ETag"),
+        }
+
+    async def _fetch(self, hh_id: str, etag: str | None) -> dict[str, Any]:
+        key = (hh_id, etag)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(hh_id, etag))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await task
+
+    async def get_descriptions(
+        self,
+        session: AsyncSession,
+        vacancies: list[Vacancy],
+    ) -> dict[int, str | None]:
+        """
+        {vacancy.id: текст описания}. Если hh.ru недоступен, отдаём
+        устаревшее описание, а если его нет — None (дальше сниппет).
+        """
+        details = await get_vacancy_details(session, [v.id for v in vacancies])
+        now = self._clock()
+
+        result: dict[int, str | None] = {}
+        stale: list[Vacancy] = []
+        for vacancy in vacancies:
+            detail = details.get(vacancy.id)
+            if detail is not None and detail.expires_at > now:
+                self.hits += 1
+                result[vacancy.id] = detail_text(detail.description, detail.key_skills)
+            else:
+                stale.append(vacancy)
+        if not stale:
+            return result
+
+        fetched = await asyncio.gather(
+            *(
+                self._fetch(v.hh_id, details[v.id].etag if v.id in details else None)
+                for v in stale
+            ),
+            return_exceptions=True,
+        )
+
+        rows = []
+        for vacancy, data in zip(stale, fetched):
+            old = details.get(vacancy.id)
+            if isinstance(data, Exception):
+                logger.warning("Failed to load HH vacancy %s: %r", vacancy.hh_id, data)
+                result[vacancy.id] = detail_text(old.description, old.key_skills) if old else None
+                continue
+
+            if data["not_modified"] and old is not None:
+                self.revalidated += 1
+                description, key_skills = old.description, old.key_skills
+            else:
+                self.misses += 1
+                description, key_skills = data.get("description"), data.get("key_skills")
+
+            rows.append(
+                {
+                    "vacancy_id": vacancy.id,
+                    "description": description,
+                    "key_skills": key_skills,
+                    "etag": data["etag"],
+                    "fetched_at": now,
+                    "expires_at": now + self.ttl,
+                }
+            )
+            result[vacancy.id] = detail_text(description, key_skills)
+
+        if rows:
+            await upsert_vacancy_details(session, rows)
+            # не держим транзакцию открытой, пока вызывающий ждёт LLM
+            await session.commit()
+        return result
+
+    async def get_description(self, session: AsyncSession, vacancy: Vacancy) -> str | None:
+        return (await self.get_descriptions(session, [vacancy])).get(vacancy.id)
+
+
+_detail_fetcher: VacancyDetailFetcher | None = None
+
+
+def get_detail_fetcher() -> VacancyDetailFetcher:
+    global _detail_fetcher
+    if _detail_fetcher is None:
+        _detail_fetcher = VacancyDetailFetcher(
+            ttl=config.hh_detail_ttl,
+            concurrency=config.hh_detail_concurrency,
+        )
+    return _detail_fetcher
@@ -0,0 +1,248 @@
+# app/services/vacancy_filters.py
+
+from dataclasses import dataclass, field
+from typing import Any, Callable
+import asyncio
+import logging
+
+from app.config import config
+from app.db.models import CompanySize, SearchFilter
+from app.services.hh_cache import MemoryResponseCache
+from app.services.hh_client import HHClient, get_hh_client
+from app.services.title_matcher import TitleMatcher, normalize_title
+
+logger = logging.getLogger(__name__)
+
+# hh.ru не отдаёт численность компании, поэтому размер оцениваем
+# по числу открытых вакансий работодателя (open_vacancies)
+COMPANY_SIZE_BOUNDS: dict[CompanySize, tuple[int, int | None]] = {
+    CompanySize.small: (0, 5),
+    CompanySize.medium: (5, 50),
+    CompanySize.large: (50, None),
+}
+
+DIRECT_EMPLOYER_TYPES = {"company"}
+
+EMPLOYER_DETAIL_FIELDS = ("type", "open_vacancies", "trusted", "accredited_it_employer")
+
+Item = dict[str, Any]
+Employer = dict[str, Any]
+Predicate = Callable[[Item, Employer], bool]
+
+
+def _employer(item: Item) -> Employer:
+    return item.get("employer") or {}
+
+
+def _is_direct(item: Item, employer: Employer) -> bool:
+    # анонимные вакансии почти всегда публикуют кадровые агентства
+    if not employer.get("id"):
+        return False
+    employer_type = employer.get("type")
+    if employer_type is None:
+        # подробностей нет — не выкидываем вакансию по незнанию
+        return True
+    return employer_type in DIRECT_EMPLOYER_TYPES
+
+
+def _size_predicate(size: CompanySize) -> Predicate:
+    low, high = COMPANY_SIZE_BOUNDS[size]
+
+    def predicate(item: Item, employer: Employer) -> bool:
+        open_vacancies = employer.get("open_vacancies")
+        if open_vacancies is None:
+            return True
+        return open_vacancies >= low and (high is None or open_vacancies < high)
+
+    return predicate
+
+
+def _is_top(item: Item, employer: Employer) -> bool:
+    # «ТОП» по данным hh.ru: проверенный работодатель с IT-аккредитацией
+    # или крупная компания
+    if not employer.get("trusted"):
+        return False
+    if employer.get("accredited_it_employer"):
+        return True
+    open_vacancies = employer.get("open_vacancies")
+    large_from = COMPANY_SIZE_BOUNDS[CompanySize.large][0]
+    return open_vacancies is None or open_vacancies >= large_from
+
+
+def _title_predicate(position: str) -> Predicate:
+    p = normalize_title(position)
+
+    def predicate(item: Item, employer: Employer) -> bool:
+        return p in normalize_title(item.get("name"))
+
+    return predicate
+
+
+def _matcher_predicate(matcher: TitleMatcher, owner: int) -> Predicate:
+    # название каждой вакансии разбирается автоматом один раз на всех
+    def predicate(item: Item, employer: Employer) -> bool:
+        return owner in matcher.match(item.get("name"))
+
+    return predicate
+
+
+@dataclass
+class CompiledFilter:
+    """Набор предикатов фильтра пользователя, проверяемых за один проход."""
+
+    # проверяются по выдаче поиска
+    predicates: list[Predicate] = field(default_factory=list)
+    # нужны поля, которых в выдаче нет (type, open_vacancies) — карточка работодателя
+    employer_predicates: list[Predicate] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.predicates or self.employer_predicates)
+
+    @property
+    def needs_employer_details(self) -> bool:
+        return bool(self.employer_predicates)
+
+    def matches_listing(self, item: Item) -> bool:
+        """Дешёвая часть фильтра: без карточки работодателя."""
+        employer = _employer(item)
+        return all(predicate(item, employer) for predicate in self.predicates)
+
+    def matches(self, item: Item, employer: Employer) -> bool:
+        return all(predicate(item, employer) for predicate in self.predicates) and all(
+            predicate(item, employer) for predicate in self.employer_predicates
+        )
+
+
+def compile_filter(
+    filt: SearchFilter,
+    title_matcher: TitleMatcher | None = None,
+    with_title: bool = True,
+) -> CompiledFilter:
+    """with_title=False — должность уже проверена снаружи (индексом пула)."""
+    compiled = CompiledFilter()
+    if with_title and filt.position and filt.position.strip():
+        if (
+            title_matcher is not None
+            and title_matcher.pattern_of(filt.id) == normalize_title(filt.position)
+        ):
+            compiled.predicates.append(_matcher_predicate(title_matcher, filt.id))
+        else:
+            compiled.predicates.append(_title_predicate(filt.position))
+    if filt.only_direct_employers:
+        compiled.employer_predicates.append(_is_direct)
+    if filt.company_size:
+        compiled.employer_predicates.append(_size_predicate(CompanySize(filt.company_size)))
+    if filt.only_top_companies:
+        compiled.employer_predicates.append(_is_top)
+    return compiled
+
+
+class EmployerDetailCache:
+    """Кэш карточек работодателей (/employers/{id}) с ограниченной параллельностью."""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int,
+        concurrency: int = 4,
+        client: HHClient | None = None,
+    ):
+        self._cache = MemoryResponseCache(ttl, max_size)
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._client = client
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+    async def _fetch(self, employer_id: str) -> Employer | None:
+        async with self._semaphore:
+            try:
+                client = self._client or get_hh_client()
+                detail = await client.get_json(f"/employers/{employer_id}")
+            except Exception as e:
+                logger.warning("Failed to load HH employer %s: %r", employer_id, e)
+                return None
+        # карточка большая (описание, брендинг) — храним только нужные поля
+        detail = {key: detail.get(key) for key in EMPLOYER_DETAIL_FIELDS}
+        await self._cache.set(employer_id, detail)
+        return detail
+
+    async def get_many(self, employer_ids: set[str]) -> dict[str, Employer]:
+        result: dict[str, Employer] = {}
+        missing: list[str] = []
+        for employer_id in employer_ids:
+            detail = await self._cache.get(employer_id)
+            if detail is None:
+                missing.append(employer_id)
+            else:
+                result[employer_id] = detail
+
+        fetched = await asyncio.gather(*(self._fetch(eid) for eid in missing))
+        for employer_id, detail in zip(missing, fetched):
+            if detail is not None:
+                result[employer_id] = detail
+        return result
+
+
+_employer_cache: EmployerDetailCache | None = None
+
+
+def get_employer_cache() -> EmployerDetailCache | None:
+    """Общий кэш работодателей или None, если догружать карточки запрещено."""
+    global _employer_cache
+    if not config.hh_fetch_employer_details:
+        return None
+    if _employer_cache is None:
+        _employer_cache = EmployerDetailCache(
+            ttl=config.hh_employer_cache_ttl,
+            max_size=config.hh_employer_cache_max_size,
+            concurrency=config.hh_page_concurrency,
+        )
+    return _employer_cache
+
+
+def merge_employer_details(item: Item, details: dict[str, Employer]) -> Employer:
+    """employer из выдачи, дополненный карточкой работодателя (если загружена)."""
+    employer = _employer(item)
+    detail = details.get(str(employer.get("id")))
+    if detail:
+        employer = {**employer, **{k: v for k, v in detail.items() if v is not None}}
+    return employer
+
+
+async def filter_items(
+    items: list[Item],
+    filt: SearchFilter,
+    employer_cache: EmployerDetailCache | None = None,
+    title_matcher: TitleMatcher | None = None,
+) -> list[Item]:
+    """
+    Отбрасывает вакансии, которые пользователь всё равно не увидит,
+    ещё до записи в БД. Карточки работодателей догружаются только
+    для фильтров, которым не хватает полей из выдачи поиска, и только
+    для вакансий, прошедших остальные условия.
+    С title_matcher должность проверяется общим автоматом (рассылка).
+    """
+    compiled = compile_filter(filt, title_matcher)
+    if not compiled:
+        return items
+
+    candidates = [item for item in items if compiled.matches_listing(item)]
+
+    details: dict[str, Employer] = {}
+    if compiled.needs_employer_details:
+        cache = employer_cache or get_employer_cache()
+        if cache is not None:
+            employer_ids = {
+                str(_employer(i)["id"]) for i in candidates if _employer(i).get("id")
+            }
+            details = await cache.get_many(employer_ids)
+
+    result = []
+    for item in candidates:
+        employer = merge_employer_details(item, details)
+        if compiled.matches(item, employer):
+            result.append(item)
+
+    logger.info("Client-side filters kept %d of %d items", len(result), len(items))
+    return result
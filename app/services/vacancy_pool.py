@@ -0,0 +1,468 @@
+# app/services/vacancy_pool.py
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import config
+from app.db.crud import (
+    bulk_upsert_vacancies,
+    get_pool_cursor,
+    link_user_vacancies,
+    save_pool_cursor,
+    stream_digest_targets,
+)
+from app.db.models import SearchFilter, User
+from app.db.session import get_session
+from app.services.areas import AreaIndex, get_area_index
+from app.services.hh_client import HHClient
+from app.services.hh_service import (
+    HH_MAX_DEPTH,
+    HH_MAX_PER_PAGE,
+    SearchResult,
+    _advance_cursor,
+    _after_cursor,
+    _build_hh_params,
+    _date_from_param,
+    _dict_id,
+    _parse_published_at,
+    _vacancy_row,
+    fetch_currency_rates,
+    hh_query_fingerprint,
+    search_vacancies,
+)
+from app.services.title_matcher import TitleMatcher
+from app.services.vacancy_filters import (
+    CompiledFilter,
+    EmployerDetailCache,
+    compile_filter,
+    get_employer_cache,
+    merge_employer_details,
+)
+
+logger = logging.getLogger(__name__)
+
+VACANCY_ENGINE_PER_USER = "per_user"
+VACANCY_ENGINE_POOL = "pool"
+
+# Окно первой загрузки среза, пока у него нет отметки
+POOL_INITIAL_DAYS = 1
+
+# Валюта, в которой hh.ru понимает зарплату из запроса (параметр salary)
+DEFAULT_CURRENCY = "RUR"
+
+# Окно, которое уже не дробится, даже если hh.ru нашёл в нём больше,
+# чем отдаёт одним поиском
+POOL_MIN_WINDOW = timedelta(minutes=1)
+
+Item = dict[str, Any]
+
+
+@dataclass(frozen=True)
+class CrawlSpec:
+    """
+    Срез общего пула: регион hh.ru и (необязательно) профессиональные роли.
+    area=None — без региона; из такой выдачи hh.ru отдаст только
+    самые свежие 2000 вакансий.
+    """
+
+    area: int | None
+    roles: tuple[str, ...] = ()
+
+    @property
+    def key(self) -> str:
+        return hh_query_fingerprint({"area": self.area, "professional_role": list(self.roles)})
+
+    def params(self, since: datetime | None) -> dict[str, Any]:
+        params: dict[str, Any] = {"order_by": "publication_time"}
+        if self.area is not None:
+            params["area"] = self.area
+        if self.roles:
+            params["professional_role"] = list(self.roles)
+        params["date_from"] = _date_from_param(timedelta(days=POOL_INITIAL_DAYS), since)
+        return params
+
+
+def crawl_specs(
+    targets: list[tuple[User, SearchFilter]],
+    roles: tuple[str, ...] = (),
+) -> list[CrawlSpec]:
+    """Срезы, которые покрывают регионы всех фильтров — по одному на регион."""
+    areas = {_build_hh_params(user, filt).get("area") for user, filt in targets}
+    ordered = sorted(areas, key=lambda a: (a is None, a or 0))
+    return [CrawlSpec(area, tuple(roles)) for area in ordered]
+
+
+@dataclass
+class PoolDoc:
+    """Вакансия, попавшая в пул в этом цикле, вместе с её item из выдачи."""
+
+    vacancy_id: int
+    item: Item
+
+
+async def crawl_pool(
+    session: AsyncSession,
+    specs: list[CrawlSpec],
+    client: HHClient | None = None,
+) -> list[PoolDoc]:
+    """
+    Догружает в vacancies всё, что опубликовано в срезах после их отметок.
+    Возвращает вакансии, которые ещё не видели в этих срезах.
+    """
+    docs: dict[int, PoolDoc] = {}
+    for spec in specs:
+        cursor = await get_pool_cursor(session, spec.key)
+        since = cursor.last_published_at if cursor is not None else None
+        seen_ids = set(cursor.last_hh_ids or []) if since is not None else set()
+
+        items = await _search_window(spec.params(since), client)
+        all_rows = [_vacancy_row(item) for item in items]
+        rows = _after_cursor(all_rows, since, seen_ids)
+        _, ids_by_hh_id = await bulk_upsert_vacancies(session, rows)
+        for row in rows:
+            vacancy_id = ids_by_hh_id[row["hh_id"]]
+            docs[vacancy_id] = PoolDoc(vacancy_id=vacancy_id, item=row["raw"])
+
+        if items.complete:
+            last_published_at, last_hh_ids = _advance_cursor(all_rows, since, seen_ids)
+            await save_pool_cursor(session, spec.key, cursor, last_published_at, last_hh_ids)
+        else:
+            logger.warning(
+                "Pool slice area=%s is truncated (%s found), cursor not advanced",
+                spec.area,
+                items.found,
+            )
+        await session.commit()
+        logger.info("Pool slice area=%s: %d new items", spec.area, len(rows))
+
+    return list(docs.values())
+
+
+def _iso(moment: datetime) -> str:
+    return moment.replace(microsecond=0).isoformat(timespec="seconds")
+
+
+async def _search_window(
+    params: dict[str, Any],
+    client: HHClient | None,
+    date_to: datetime | None = None,
+) -> SearchResult:
+    """
+    Выдача среза за окно [date_from, date_to]. hh.ru отдаёт одним поиском не
+    больше HH_MAX_DEPTH вакансий (и не больше, чем мы читаем страниц): если
+    найдено больше, окно делится пополам по времени, пока каждая половина
+    не поместится. Выдача полна, только если полны все части.
+    """
+    depth = min(HH_MAX_DEPTH, config.hh_pool_max_pages * HH_MAX_PER_PAGE)
+    window = dict(params)
+    if date_to is not None:
+        window["date_to"] = _iso(date_to)
+    items = await search_vacancies(
+        window,
+        limit=HH_MAX_PER_PAGE,
+        client=client,
+        max_pages=config.hh_pool_max_pages,
+        max_found=depth,
+    )
+    if items.complete or (items.found or 0) <= depth:
+        return items
+
+    date_from = datetime.fromisoformat(params["date_from"])
+    end = date_to or datetime.utcnow()
+    if end - date_from <= POOL_MIN_WINDOW:
+        return items
+
+    middle = date_from + (end - date_from) / 2
+    older = await _search_window(params, client, date_to=middle)
+    newer = await _search_window({**params, "date_from": _iso(middle)}, client, date_to)
+
+    # половины пересекаются на границе — дубли убираем
+    result = SearchResult({item["id"]: item for item in [*older, *newer]}.values())
+    result.found = (older.found or 0) + (newer.found or 0)
+    result.complete = older.complete and newer.complete
+    return result
+
+
+def _add(index: dict[Any, set[int]], keys, filter_id: int) -> None:
+    for key in keys:
+        index.setdefault(key, set()).add(filter_id)
+
+
+@dataclass
+class _Dimension:
+    """Инвертированный индекс по одному признаку вакансии."""
+
+    by_value: dict[Any, set[int]] = field(default_factory=dict)
+    # фильтры, которым признак не важен
+    any: set[int] = field(default_factory=set)
+
+    def add(self, filter_id: int, values) -> None:
+        if values:
+            _add(self.by_value, values, filter_id)
+        else:
+            self.any.add(filter_id)
+
+    def select(self, values) -> set[int]:
+        result = set(self.any)
+        for value in values:
+            result |= self.by_value.get(value, set())
+        return result
+
+
+class Percolator:
+    """
+    Обратный поиск: вместо «фильтр -> вакансии» — «вакансия -> фильтры».
+
+    Параметры каждого фильтра берутся из того же _build_hh_params, что и
+    при запросе к hh.ru, и раскладываются по инвертированным индексам:
+    регион (с учётом вложенности), опыт, занятость, график, метро,
+    зарплата (отсортированный список сумм) и должность (автомат
+    Ахо — Корасик). Кандидаты — пересечение индексов; оставшиеся
+    условия (свежесть, прямой работодатель, размер/ТОП) проверяются только
+    для кандидатов.
+
+    currency_rates — курсы hh.ru к рублю: вилки в других валютах
+    сравниваются с суммой фильтра после пересчёта, как это делает hh.ru.
+    """
+
+    def __init__(
+        self,
+        targets: list[tuple[User, SearchFilter]],
+        title_matcher: TitleMatcher | None = None,
+        area_index: AreaIndex | None = None,
+        currency_rates: dict[str, float] | None = None,
+    ):
+        self.title_matcher = title_matcher or TitleMatcher()
+        self._areas = area_index or get_area_index()
+        self._rates = currency_rates or {DEFAULT_CURRENCY: 1.0}
+        self.user_ids: dict[int, int] = {}
+        self._compiled: dict[int, CompiledFilter] = {}
+        self._max_age: dict[int, timedelta] = {}
+
+        self._area = _Dimension()
+        self._experience = _Dimension()
+        self._employment = _Dimension()
+        self._schedule = _Dimension()
+        self._metro = _Dimension()
+        self._any_title: set[int] = set()
+        self._any_salary: set[int] = set()
+        # сумма задана, но вакансии без зарплаты не отсекаются (нет only_with_salary)
+        self._salary_optional: set[int] = set()
+        salaries: list[tuple[int, int]] = []
+        texts: dict[int, str] = {}
+
+        for user, filt in targets:
+            filter_id = filt.id
+            params = _build_hh_params(user, filt)
+            self.user_ids[filter_id] = user.id
+
+            area = params.get("area")
+            self._area.add(filter_id, [area] if area is not None else [])
+            experience = params.get("experience")
+            self._experience.add(filter_id, [experience] if experience else [])
+            self._employment.add(filter_id, params.get("employment") or [])
+            self._schedule.add(filter_id, params.get("schedule") or [])
+            self._metro.add(filter_id, params.get("metro") or [])
+
+            if params.get("salary"):
+                salaries.append((int(params["salary"]), filter_id))
+                if not params.get("only_with_salary"):
+                    self._salary_optional.add(filter_id)
+            else:
+                self._any_salary.add(filter_id)
+
+            if params.get("text"):
+                texts[filter_id] = params["text"]
+            else:
+                self._any_title.add(filter_id)
+
+            self._compiled[filter_id] = compile_filter(filt, with_title=False)
+            self._max_age[filter_id] = timedelta(days=filt.freshness_days or 1)
+
+        salaries.sort()
+        self._salary_bounds = [bound for bound, _ in salaries]
+        self._salary_ids = [filter_id for _, filter_id in salaries]
+        self.title_matcher.sync(texts)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def needs_employer_details(self, filter_id: int) -> bool:
+        return self._compiled[filter_id].needs_employer_details
+
+    def _area_chain(self, item: Item) -> list[int]:
+        area_id = _dict_id(item.get("area"))
+        chain: list[int] = []
+        current = self._areas.get(int(area_id)) if area_id is not None else None
+        if current is None and area_id is not None:
+            chain.append(int(area_id))
+        while current is not None:
+            chain.append(current.id)
+            current = self._areas.get(current.parent_id) if current.parent_id else None
+        return chain
+
+    def _salary_candidates(self, item: Item) -> set[int]:
+        """
+        Как параметр salary у hh.ru: вакансия подходит, если её вилка
+        (в пересчёте на рубли) включает сумму фильтра. Вакансии без
+        зарплаты отсекает только only_with_salary.
+        """
+        result = set(self._any_salary)
+        salary = item.get("salary") or {}
+        low, high = salary.get("from"), salary.get("to")
+        if low is None and high is None:
+            return result | self._salary_optional
+        rate = self._rates.get(salary.get("currency") or DEFAULT_CURRENCY)
+        if not rate:
+            # курса нет — сравнить не с чем, вакансию не теряем
+            result.update(self._salary_ids)
+            return result
+        start = bisect_left(self._salary_bounds, low / rate) if low is not None else 0
+        stop = (
+            bisect_right(self._salary_bounds, high / rate)
+            if high is not None
+            else len(self._salary_bounds)
+        )
+        result.update(self._salary_ids[start:stop])
+        return result
+
+    def candidates(self, item: Item) -> set[int]:
+        """Фильтры, которые проходит вакансия по индексируемым признакам."""
+        result = self._area.select(self._area_chain(item))
+        if not result:
+            return result
+
+        address = item.get("address") or {}
+        stations = [s.get("station_id") for s in address.get("metro_stations") or []]
+        checks = (
+            lambda: self._experience.select([_dict_id(item.get("experience"))]),
+            lambda: self._employment.select([_dict_id(item.get("employment"))]),
+            lambda: self._schedule.select([_dict_id(item.get("schedule"))]),
+            lambda: self._metro.select(stations),
+            lambda: self._salary_candidates(item),
+            lambda: self._any_title | self.title_matcher.match(item.get("name")),
+        )
+        for check in checks:
+            result &= check()
+            if not result:
+                break
+        return result
+
+    def match(
+        self,
+        item: Item,
+        candidates: set[int],
+        employer: dict[str, Any],
+        now: datetime | None = None,
+    ) -> set[int]:
+        """Дочищает кандидатов условиями, которых нет в индексах."""
+        now = now or datetime.utcnow()
+        published_at = _parse_published_at(item.get("published_at"))
+        result = set()
+        for filter_id in candidates:
+            if published_at is not None and now - published_at > self._max_age[filter_id]:
+                continue
+            if self._compiled[filter_id].matches(item, employer):
+                result.add(filter_id)
+        return result
+
+
+async def percolate(
+    session: AsyncSession,
+    docs: list[PoolDoc],
+    percolator: Percolator,
+    employer_cache: EmployerDetailCache | None = None,
+) -> int:
+    """Подбирает пользователей для новых вакансий пула; связи пишутся пачкой."""
+    candidates = {doc.vacancy_id: percolator.candidates(doc.item) for doc in docs}
+
+    details: dict[str, dict[str, Any]] = {}
+    employer_ids = {
+        str(doc.item["employer"]["id"])
+        for doc in docs
+        if (doc.item.get("employer") or {}).get("id")
+        and any(percolator.needs_employer_details(f) for f in candidates[doc.vacancy_id])
+    }
+    if employer_ids:
+        cache = employer_cache or get_employer_cache()
+        if cache is not None:
+            details = await cache.get_many(employer_ids)
+
+    now = datetime.utcnow()
+    pairs: list[tuple[int, int]] = []
+    for doc in docs:
+        filter_ids = candidates[doc.vacancy_id]
+        if not filter_ids:
+            continue
+        employer = merge_employer_details(doc.item, details)
+        for filter_id in percolator.match(doc.item, filter_ids, employer, now):
+            pairs.append((percolator.user_ids[filter_id], doc.vacancy_id))
+
+    created = await link_user_vacancies(session, pairs)
+    await session.commit()
+    logger.info(
+        "Percolated %d items against %d filters: %d new links",
+        len(docs),
+        len(percolator),
+        len(created),
+    )
+    return len(created)
+
+
+@dataclass
+class PoolRunStats:
+    """Статистика одного цикла пула."""
+
+    slices: int = 0
+    ingested: int = 0
+    links: int = 0
+
+
+# автомат должностей пула живёт между циклами и меняется инкрементально
+_title_matcher = TitleMatcher()
+
+# последние известные курсы валют hh.ru: если справочник недоступен,
+# цикл работает по ним
+_currency_rates: dict[str, float] | None = None
+
+
+async def _load_currency_rates(client: HHClient | None) -> dict[str, float] | None:
+    global _currency_rates
+    try:
+        _currency_rates = await fetch_currency_rates(client) or _currency_rates
+    except Exception as e:
+        logger.warning("Failed to load HH currency rates: %r", e)
+    return _currency_rates
+
+
+async def run_pool_cycle(client: HHClient | None = None) -> PoolRunStats:
+    """Цикл пула: загрузка срезов hh.ru -> подбор по всем фильтрам."""
+    stats = PoolRunStats()
+    async for session in get_session():
+        targets = [row async for row in stream_digest_targets(session)]
+        if not targets:
+            return stats
+
+        specs = crawl_specs(targets, config.hh_pool_roles)
+        docs = await crawl_pool(session, specs, client=client)
+        percolator = Percolator(
+            targets,
+            title_matcher=_title_matcher,
+            currency_rates=await _load_currency_rates(client),
+        )
+        stats.slices = len(specs)
+        stats.ingested = len(docs)
+        stats.links = await percolate(session, docs, percolator)
+
+    logger.info(
+        "Vacancy pool: slices=%d, ingested=%d, links=%d",
+        stats.slices,
+        stats.ingested,
+        stats.links,
+    )
+    return stats
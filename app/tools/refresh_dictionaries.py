@@ -0,0 +1,78 @@
+# app/tools/refresh_dictionaries.py
+"""
+Обновление локальных справочников hh.ru в app/data.
+
+Бот работает по этим файлам (из API при старте — только с
+HH_DICTIONARIES_FROM_API=true). Запускается руками (или в CI),
+результат коммитится в репозиторий:
+
+    python -m app.tools.refresh_dictionaries areas metro
+"""
+
+from datetime import date
+from pathlib import Path
+import argparse
+import json
+import sys
+
+import httpx
+
+HH_API_BASE_URL = "https://api.hh.ru"
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def _download(path: str, user_agent: str) -> object:
+    resp = httpx.get(
+        f"{HH_API_BASE_URL}{path}",
+        headers={"User-Agent": user_agent},
+        timeout=60.0,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _write(filename: str, key: str, payload: object, source: str) -> Path:
+    target = DATA_DIR / filename
+    data = {
+        "version": date.today().isoformat(),
+        "source": source,
+        key: payload,
+    }
+    tmp = target.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        f.write("\n")
+    tmp.replace(target)
+    return target
+
+
+def refresh_areas(user_agent: str) -> Path:
+    areas = _download("/areas", user_agent)
+    return _write("hh_areas.json", "areas", areas, f"{HH_API_BASE_URL}/areas")
+
+
+def refresh_metro(user_agent: str) -> Path:
+    cities = _download("/metro", user_agent)
+    return _write("hh_metro.json", "cities", cities, f"{HH_API_BASE_URL}/metro")
+
+
+COMMANDS = {
+    "areas": refresh_areas,
+    "metro": refresh_metro,
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("what", nargs="+", choices=sorted(COMMANDS))
+    parser.add_argument("--user-agent", default="hh-bot/1.0")
+    args = parser.parse_args(argv)
+
+    for name in args.what:
+        target = COMMANDS[name](args.user_agent)
+        print(f"{name}: written {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# app/utils/compression.py
+
+from typing import Any
+import zlib
+
+import zstandard
+
+from app.utils.json_codec import dumps, loads
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 6
+
+
+# zstandard — обязательная зависимость: кодек записи не должен зависеть от того,
+# что случайно установлено, иначе процесс без пакета не прочтёт чужие данные
+def default_codec() -> str:
+    return CODEC_ZSTD
+
+
+def compress_json(obj: Any, codec: str | None = None) -> tuple[str, bytes]:
+    """JSON -> (кодек, сжатые байты). Кодек хранится рядом с данными."""
+    codec = codec or default_codec()
+    data = dumps(obj)
+    if codec == CODEC_ZSTD:
+        return codec, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == CODEC_ZLIB:
+        return codec, zlib.compress(data, ZLIB_LEVEL)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def decompress_json(codec: str, data: bytes) -> Any:
+    if codec == CODEC_ZSTD:
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == CODEC_ZLIB:
+        raw = zlib.decompress(data)
+    else:
+        raise ValueError(f"Unknown codec: {codec}")
+    return loads(raw)
@@ -0,0 +1,27 @@
+# app/utils/concurrency.py
+
+from typing import Awaitable, Callable, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+
+async def run_bounded(
+    jobs: list[T],
+    handler: Callable[[T], Awaitable[None]],
+    concurrency: int,
+) -> None:
+    """Обрабатывает jobs не больше чем concurrency обработчиками одновременно."""
+    queue: asyncio.Queue[T] = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def worker() -> None:
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await handler(job)
+
+    await asyncio.gather(*(worker() for _ in range(min(max(1, concurrency), len(jobs)))))
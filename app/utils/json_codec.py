@@ -0,0 +1,26 @@
+# app/utils/json_codec.py
+
+from typing import Any
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него работает стандартный json
+    orjson = None
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    Разбирает JSON прямо из байтов ответа.
+    orjson не декодирует тело в промежуточную str и строит объекты в C.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Компактный JSON в UTF-8 (без экранирования кириллицы)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
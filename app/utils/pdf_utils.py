@@ -6,6 +6,10 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
+from app.utils.metrics import Histogram
+
+PDF_RENDER_SECONDS = Histogram("pdf_render_seconds", "Time to render one PDF document")
+
 # Регистрируем кириллический шрифт один раз при импорте модуля
 try:
     pdfmetrics.registerFont(TTFont("DejaVu", "app/fonts/DejaVuLGCSans.ttf"))
@@ -18,6 +22,11 @@ def render_text_to_pdf(text: str, title: str | None = None) -> bytes:
     Генерация PDF с поддержкой русского языка.
     Использует шрифт DejaVuSans (TrueType), который полностью поддерживает Unicode.
     """
+    with PDF_RENDER_SECONDS.time():
+        return _render_text_to_pdf(text, title)
+
+
+def _render_text_to_pdf(text: str, title: str | None) -> bytes:
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
@@ -0,0 +1,120 @@
+# app/utils/rate_limit.py
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Классический token bucket: rate токенов в секунду, не больше capacity.
+    acquire() ждёт, пока не появится токен.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Берёт токен, если он есть. Иначе возвращает, сколько секунд ждать."""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            while True:
+                wait = self.try_acquire(tokens)
+                if wait <= 0:
+                    return
+                await self._sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Обнуляет бакет на seconds вперёд (например, по Retry-After)."""
+        if seconds <= 0:
+            # Retry-After: 0 — ждать нечего, накопленные токены не трогаем
+            return
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class AIMDLimiter:
+    """
+    Адаптивный лимит одновременных запросов (AIMD, как в TCP):
+    после каждого успешного ответа лимит растёт примерно на 1 за «окно»,
+    при троттлинге — умножается на decrease_factor.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._clock = clock
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._cond = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self) -> None:
+        self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+    def on_throttle(self) -> None:
+        # Пачка 429 от одного всплеска режет лимит один раз, а не N раз подряд
+        now = self._clock()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.decrease_factor)
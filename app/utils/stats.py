@@ -0,0 +1,13 @@
+# app/utils/stats.py
+
+from typing import Iterable
+import math
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга (0.0 для пустого набора)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
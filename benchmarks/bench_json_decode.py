@@ -0,0 +1,142 @@
+# benchmarks/bench_json_decode.py
+"""
+Микробенчмарк разбора JSON: стандартный путь (resp.json()) против
+быстрого (app.utils.json_codec.loads, ChatCompletion.model_validate_json).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_json_decode
+"""
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils import json_codec  # noqa: E402
+
+PAGE_SIZE = 100
+ROUNDS = 200
+
+
+def make_hh_page(n: int = PAGE_SIZE) -> bytes:
+    """Страница выдачи /vacancies, похожая на настоящую по размеру и вложенности."""
+    items = []
+    for i in range(n):
+        items.append(
+            {
+                "id": str(90000000 + i),
+                "premium": False,
+                "name": f"Python-разработчик (backend) {i}",
+                "department": None,
+                "has_test": False,
+                "area": {"id": "1", "name": "Москва", "url": "https://api.hh.ru/areas/1"},
+                "salary": {"from": 200000, "to": 350000, "currency": "RUR", "gross": False},
+                "type": {"id": "open", "name": "Открытая"},
+                "address": {
+                    "city": "Москва",
+                    "street": "улица Льва Толстого",
+                    "building": "16",
+                    "lat": 55.733974,
+                    "lng": 37.587093,
+                    "metro_stations": [
+                        {"station_name": "Парк культуры", "line_name": "Сокольническая",
+                         "station_id": "1.61", "line_id": "1", "lat": 55.735, "lng": 37.593},
+                    ],
+                },
+                "published_at": "2026-10-18T09:15:00+0300",
+                "created_at": "2026-10-18T09:15:00+0300",
+                "archived": False,
+                "apply_alternate_url": f"https://hh.ru/applicant/vacancy_response?vacancyId={i}",
+                "url": f"https://api.hh.ru/vacancies/{90000000 + i}?host=hh.ru",
+                "alternate_url": f"https://hh.ru/vacancy/{90000000 + i}",
+                "employer": {
+                    "id": str(1000 + i % 7),
+                    "name": "ООО «Яндекс»",
+                    "url": "https://api.hh.ru/employers/1740",
+                    "alternate_url": "https://hh.ru/employer/1740",
+                    "logo_urls": {
+                        "90": "https://img.hhcdn.ru/employer-logo/1.png",
+                        "240": "https://img.hhcdn.ru/employer-logo/2.png",
+                        "original": "https://img.hhcdn.ru/employer-logo-original/3.png",
+                    },
+                    "trusted": True,
+                    "accredited_it_employer": True,
+                },
+                "snippet": {
+                    "requirement": "Опыт коммерческой разработки на <highlighttext>Python</highlighttext> от 3 лет. "
+                    "Уверенное знание PostgreSQL, asyncio.",
+                    "responsibility": "Разработка и поддержка высоконагруженных сервисов. Участие в код-ревью.",
+                },
+                "schedule": {"id": "remote", "name": "Удаленная работа"},
+                "working_days": [],
+                "working_time_intervals": [],
+                "working_time_modes": [],
+                "accept_temporary": False,
+                "professional_roles": [{"id": "96", "name": "Программист, разработчик"}],
+                "experience": {"id": "between3And6", "name": "От 3 до 6 лет"},
+                "employment": {"id": "full", "name": "Полная занятость"},
+            }
+        )
+    page = {"items": items, "found": 12345, "pages": 20, "page": 0, "per_page": n}
+    return json.dumps(page, ensure_ascii=False).encode("utf-8")
+
+
+def make_chat_completion() -> bytes:
+    content = "Резюме кандидата.\n" + "Опыт работы: разработка сервисов на Python. " * 80
+    body = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 1760000000,
+        "model": "dummy",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "logprobs": {"content": [{"token": "x", "logprob": -0.1, "top_logprobs": []}] * 200},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 900, "completion_tokens": 700, "total_tokens": 1600},
+    }
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+def stdlib_decode(body: bytes):
+    # то же, что делает httpx.Response.json(): bytes -> str -> json.loads
+    return json.loads(body.decode("utf-8"))
+
+
+def stdlib_chat(body: bytes) -> str:
+    return stdlib_decode(body)["choices"][0]["message"]["content"]
+
+
+def measure(name: str, func, body: bytes) -> None:
+    seconds = min(timeit.repeat(lambda: func(body), number=ROUNDS, repeat=5)) / ROUNDS
+    tracemalloc.start()
+    result = func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"  {name:<40} {seconds * 1e6:9.1f} us   peak {peak / 1024:8.1f} KiB")
+
+
+def main() -> None:
+    from app.services.llm_service import parse_chat_content
+
+    page = make_hh_page()
+    print(f"HH page: {PAGE_SIZE} items, {len(page) / 1024:.1f} KiB")
+    measure("json.loads(body.decode())", stdlib_decode, page)
+    backend = "orjson" if json_codec.orjson is not None else "json (orjson not installed)"
+    measure(f"json_codec.loads [{backend}]", json_codec.loads, page)
+
+    chat = make_chat_completion()
+    print(f"\nChat completion: {len(chat) / 1024:.1f} KiB")
+    measure("json.loads + ['choices'][0]...", stdlib_chat, chat)
+    measure("ChatCompletion.model_validate_json", parse_chat_content, chat)
+
+
+if __name__ == "__main__":
+    main()
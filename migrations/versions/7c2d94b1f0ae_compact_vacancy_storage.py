@@ -0,0 +1,136 @@
+"""compact vacancy storage
+
+Revision ID: 7c2d94b1f0ae
+Revises: a83f21c4d7e6
+Create Date: 2026-10-18 13:02:41.530218
+
+"""
+from typing import Sequence, Union
+import json
+import re
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d94b1f0ae'
+down_revision: Union[str, Sequence[str], None] = 'a83f21c4d7e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+_TAG_RE = re.compile(r"<[^>]+>")
+
+vacancies = sa.table(
+    'vacancies',
+    sa.column('id', sa.Integer),
+    sa.column('raw', sa.JSON),
+    sa.column('employer_id', sa.String),
+    sa.column('snippet', sa.Text),
+    sa.column('schedule', sa.String),
+    sa.column('experience', sa.String),
+)
+vacancy_payloads = sa.table(
+    'vacancy_payloads',
+    sa.column('vacancy_id', sa.Integer),
+    sa.column('codec', sa.String),
+    sa.column('data', sa.LargeBinary),
+)
+
+
+def _dict_id(value):
+    if not isinstance(value, dict) or value.get('id') is None:
+        return None
+    return str(value['id'])
+
+
+def _snippet_text(item):
+    snippet = item.get('snippet') or {}
+    parts = []
+    for key in ('responsibility', 'requirement'):
+        text = snippet.get(key)
+        if text:
+            parts.append(' '.join(_TAG_RE.sub('', text).split()))
+    return '\n'.join(parts) or None
+
+
+def _move_raw_to_payloads() -> None:
+    """Переносит vacancies.raw в сжатую vacancy_payloads пачками по id."""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(vacancies.c.id, vacancies.c.raw)
+            .where(vacancies.c.id > last_id, vacancies.c.raw.isnot(None))
+            .order_by(vacancies.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        payloads = []
+        for vacancy_id, item in rows:
+            if isinstance(item, str):
+                item = json.loads(item)
+            data = json.dumps(item, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            payloads.append({'vacancy_id': vacancy_id, 'codec': 'zlib', 'data': zlib.compress(data, 6)})
+            bind.execute(
+                vacancies.update()
+                .where(vacancies.c.id == vacancy_id)
+                .values(
+                    employer_id=_dict_id(item.get('employer')),
+                    snippet=_snippet_text(item),
+                    schedule=_dict_id(item.get('schedule')),
+                    experience=_dict_id(item.get('experience')),
+                )
+            )
+        bind.execute(vacancy_payloads.insert(), payloads)
+        last_id = rows[-1][0]
+
+
+def _restore_raw_from_payloads() -> None:
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(vacancy_payloads.c.vacancy_id, vacancy_payloads.c.codec, vacancy_payloads.c.data)
+    )
+    for vacancy_id, codec, data in rows.all():
+        if codec == 'zstd':
+            import zstandard
+
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = zlib.decompress(data)
+        bind.execute(
+            vacancies.update()
+            .where(vacancies.c.id == vacancy_id)
+            .values(raw=json.loads(data))
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('vacancy_payloads',
+    sa.Column('vacancy_id', sa.Integer(), nullable=False),
+    sa.Column('codec', sa.String(length=10), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['vacancy_id'], ['vacancies.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('vacancy_id')
+    )
+    op.add_column('vacancies', sa.Column('employer_id', sa.String(length=50), nullable=True))
+    op.add_column('vacancies', sa.Column('snippet', sa.Text(), nullable=True))
+    op.add_column('vacancies', sa.Column('schedule', sa.String(length=50), nullable=True))
+    op.add_column('vacancies', sa.Column('experience', sa.String(length=50), nullable=True))
+    _move_raw_to_payloads()
+    op.drop_column('vacancies', 'raw')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('vacancies', sa.Column('raw', sa.JSON(), nullable=True))
+    _restore_raw_from_payloads()
+    op.drop_column('vacancies', 'experience')
+    op.drop_column('vacancies', 'schedule')
+    op.drop_column('vacancies', 'snippet')
+    op.drop_column('vacancies', 'employer_id')
+    op.drop_table('vacancy_payloads')
@@ -4,6 +4,7 @@ import os
 import sys
 import asyncio
 import pytest
+import pytest_asyncio
 
 # === Добавляем корень проекта в sys.path ===
 # Файл conftest.py лежит в hh-bot/hh-bot/tests
@@ -13,6 +14,52 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 
+class FakeClock:
+    """Часы, которые тест двигает сам: clock.now = ... или clock.now += ..."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBot:
+    """
+    Бот для тестов отправки. Отправленное копится в sent как (chat_id, text).
+    fail_for — чаты с ошибкой, slow_for — «зависающие» чаты,
+    flood_for — сколько раз чату ответить TelegramRetryAfter, delay — пауза
+    перед каждой отправкой.
+    """
+
+    def __init__(self, fail_for=(), slow_for=(), flood_for=None, delay: float = 0.0):
+        self.fail_for = set(fail_for)
+        self.slow_for = set(slow_for)
+        self.flood_for = dict(flood_for or {})
+        self.delay = delay
+        self.sent: list[tuple[int, str]] = []
+        self.times: list[float] = []
+
+    @property
+    def chats(self) -> list[int]:
+        return [chat_id for chat_id, _ in self.sent]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        from aiogram.exceptions import TelegramRetryAfter
+
+        await asyncio.sleep(self.delay)
+        if self.flood_for.get(chat_id):
+            self.flood_for[chat_id] -= 1
+            raise TelegramRetryAfter(method=None, message="Flood control", retry_after=0.05)
+        if chat_id in self.fail_for:
+            raise RuntimeError("chat not found")
+        if chat_id in self.slow_for:
+            await asyncio.sleep(10)
+        self.sent.append((chat_id, text))
+        self.times.append(asyncio.get_running_loop().time())
+        return len(self.sent)
+
+
 @pytest.fixture(scope="session")
 def event_loop():
     """
@@ -22,3 +69,51 @@ def event_loop():
     loop = asyncio.new_event_loop()
     yield loop
     loop.close()
+
+
+@pytest_asyncio.fixture
+async def session_maker():
+    """
+    Фабрика сессий поверх SQLite в памяти со всей схемой.
+    В maker.statements копятся все выполненные SQL-запросы.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import (
+        AsyncSession,
+        async_sessionmaker,
+        create_async_engine,
+    )
+
+    from app.db.models import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    statements: list[str] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    maker.statements = statements
+    yield maker
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def no_hh_response_cache(monkeypatch):
+    """По умолчанию тесты ходят в (фейковый) hh.ru мимо кэша ответов."""
+    from app.services import hh_cache
+
+    monkeypatch.setattr(hh_cache, "_response_cache", None)
+    monkeypatch.setattr(hh_cache, "_response_cache_ready", True)
+
+
+@pytest.fixture(autouse=True)
+def no_employer_details(monkeypatch):
+    """Карточки работодателей в тестах не догружаем — только то, что в items."""
+    from app.services import vacancy_filters
+
+    monkeypatch.setattr(vacancy_filters, "get_employer_cache", lambda: None)
@@ -0,0 +1,109 @@
+# tests/test_areas.py
+
+import httpx
+import pytest
+
+from app.services import areas
+from app.services.areas import AreaIndex, get_area_index, init_area_index, normalize_area_name
+from app.services.hh_client import HHClient
+
+TREE = [
+    {
+        "id": "113",
+        "name": "Россия",
+        "areas": [
+            {"id": "1", "name": "Москва", "areas": []},
+            {
+                "id": "1620",
+                "name": "Республика Марий Эл",
+                "areas": [{"id": "4000", "name": "Королёв", "areas": []}],
+            },
+            {"id": "4001", "name": "Нижний Новгород", "areas": []},
+        ],
+    },
+    {
+        "id": "5",
+        "name": "Украина",
+        "areas": [{"id": "9000", "name": "Москва", "areas": []}],
+    },
+]
+
+
+@pytest.fixture
+def index() -> AreaIndex:
+    return AreaIndex(TREE, version="test")
+
+
+def test_normalize_area_name():
+    assert normalize_area_name("  г. Королёв ") == "королев"
+    assert normalize_area_name("Ростов-на-Дону") == "ростов на дону"
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("Москва", 1),  # одноимённый город не из России проигрывает
+        ("МОСКВА", 1),
+        ("королев", 4000),
+        ("Moskva", 1),
+        ("nizhniy novgorod", 4001),  # транслит + нечёткое совпадение
+        ("Нижний Новгрод", 4001),  # опечатка
+        ("Марсианск", None),
+        ("", None),
+    ],
+)
+def test_resolve(index, query, expected):
+    area = index.resolve(query)
+    assert (area.id if area else None) == expected
+
+
+def test_prefix(index):
+    assert [a.id for a in index.prefix("Ниж")] == [4001]
+
+
+def test_bundled_dictionary_knows_aliases_and_big_cities():
+    index = get_area_index()
+    assert index.version
+    assert index.resolve("СПб").id == 2
+    assert index.resolve("Екатеринбург").id == 3
+    assert index.resolve("Kazan").id == 88
+
+
+def test_ambiguous_names_are_not_guessed():
+    index = get_area_index()
+    # в стартовом срезе нет ни Ростова Великого, ни Краснодарского края —
+    # похожие города не подставляем, а предлагаем на выбор
+    assert index.resolve("Ростов") is None
+    assert index.resolve("Краснодарский край") is None
+    assert [a.id for a in index.suggest("Ростов")] == [76]
+    assert 53 in [a.id for a in index.suggest("Краснодарский край")]
+
+
+@pytest.mark.asyncio
+async def test_full_dictionary_is_loaded_from_api(monkeypatch):
+    monkeypatch.setattr(areas, "_area_index", None)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/areas"
+        return httpx.Response(200, json=TREE)
+
+    client = HHClient(transport=httpx.MockTransport(handler))
+    index = await init_area_index(client)
+    await client.aclose()
+
+    assert get_area_index() is index
+    assert index.version.startswith("api-")
+    assert index.resolve("Королёв").id == 4000
+
+
+@pytest.mark.asyncio
+async def test_bundled_dictionary_is_used_when_api_fails(monkeypatch):
+    monkeypatch.setattr(areas, "_area_index", None)
+    client = HHClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(404)),
+        backoff_base=0,
+    )
+    index = await init_area_index(client)
+    await client.aclose()
+
+    assert index.resolve("СПб").id == 2
@@ -0,0 +1,182 @@
+# tests/test_daily_digest.py
+
+import asyncio
+
+import pytest
+
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from app.config import config
+from app.db.crud import stream_digest_targets
+from app.db.models import NotificationOutbox, OutboxStatus, SearchFilter, User
+from app.services import notification_outbox, scheduler
+from app.services.hh_service import SearchResult
+from app.utils.stats import percentile
+
+from conftest import FakeBot
+
+
+def make_items(prefix: str, n: int = 3) -> SearchResult:
+    return SearchResult(
+        {
+            "id": f"{prefix}{i}",
+            "name": f"Python developer {i}",
+            "employer": {"id": "1", "name": "Corp"},
+            "alternate_url": "",
+        }
+        for i in range(n)
+    )
+
+
+@pytest.fixture
+def digest_env(monkeypatch, session_maker):
+    async def get_session():
+        async with session_maker() as session:
+            yield session
+
+    monkeypatch.setattr(scheduler, "get_session", get_session)
+    monkeypatch.setattr(notification_outbox, "get_session", get_session)
+    monkeypatch.setattr(config, "vacancy_engine", "per_user")
+    monkeypatch.setattr(config, "digest_concurrency", 4)
+    monkeypatch.setattr(config, "digest_user_timeout", 0.5)
+    return session_maker
+
+
+async def add_users(maker, positions: dict[int, str]) -> None:
+    async with maker() as session:
+        for telegram_id, position in positions.items():
+            user = User(telegram_id=telegram_id)
+            session.add(user)
+            await session.flush()
+            session.add(SearchFilter(user_id=user.id, position=position))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_daily_job_isolates_failures_and_timeouts(digest_env, monkeypatch):
+    await add_users(
+        digest_env,
+        {1: "python", 2: "python", 3: "python", 4: "java", 5: "golang"},
+    )
+
+    async def fake_search(params, **kwargs):
+        if params.get("text") == "golang":
+            raise RuntimeError("HH is down")
+        return make_items(params.get("text"))
+
+    monkeypatch.setattr(scheduler, "search_vacancies", fake_search)
+    # у SQLite в памяти одно соединение на все сессии — пишем последовательно
+    monkeypatch.setattr(config, "digest_concurrency", 1)
+    bot = FakeBot(fail_for={2}, slow_for={3})
+
+    stats = await scheduler._daily_job(bot)
+
+    # java: вакансии не проходят фильтр по должности — слать нечего
+    assert stats.users == 5
+    assert stats.hh_queries == 2
+    assert stats.processed == 4
+    assert stats.sent == 3
+    # 5 — ошибка hh.ru
+    assert stats.failed == 1
+    assert stats.failed_user_ids == {5}
+    assert len(stats.durations) == 4
+
+    # доставка — отдельно: 2 — ошибка Telegram, 3 — таймаут; оба ждут повтора
+    assert bot.chats == [1]
+    async with digest_env() as session:
+        result = await session.execute(
+            select(User.telegram_id, NotificationOutbox.status, NotificationOutbox.attempts)
+            .join(User, User.id == NotificationOutbox.user_id)
+            .distinct()
+        )
+        outbox = {telegram_id: (status, attempts) for telegram_id, status, attempts in result}
+    assert outbox == {
+        1: (OutboxStatus.sent, 1),
+        2: (OutboxStatus.pending, 1),
+        3: (OutboxStatus.pending, 1),
+    }
+
+
+@pytest.mark.asyncio
+async def test_daily_job_runs_groups_concurrently(digest_env, monkeypatch):
+    await add_users(digest_env, {i: f"python {i}" for i in range(1, 9)})
+    in_flight = 0
+    peak = 0
+
+    async def fake_search(params, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return SearchResult()
+
+    monkeypatch.setattr(scheduler, "search_vacancies", fake_search)
+
+    stats = await scheduler._daily_job(FakeBot())
+
+    assert stats.hh_queries == 8
+    assert stats.processed == 8
+    assert peak == config.digest_concurrency
+
+
+@pytest.mark.asyncio
+async def test_daily_job_processes_group_members_concurrently(digest_env, monkeypatch):
+    await add_users(digest_env, {i: "python" for i in range(1, 9)})
+    searches = 0
+    in_flight = 0
+    peak = 0
+
+    async def fake_search(params, **kwargs):
+        nonlocal searches
+        searches += 1
+        return SearchResult()
+
+    async def slow_store(*args, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+
+    monkeypatch.setattr(scheduler, "search_vacancies", fake_search)
+    monkeypatch.setattr(scheduler, "store_vacancies_for_user", slow_store)
+
+    stats = await scheduler._daily_job(FakeBot())
+
+    # один запрос на группу, а участники — параллельно в пределах общего лимита
+    assert searches == 1
+    assert stats.processed == 8
+    assert peak == config.digest_concurrency
+
+
+@pytest.mark.asyncio
+async def test_digest_targets_load_only_needed_columns(digest_env):
+    await add_users(digest_env, {1: "python", 2: "java"})
+    async with digest_env() as session:
+        session.add(User(telegram_id=3, base_resume="x" * 10_000))
+        await session.commit()
+
+    digest_env.statements.clear()
+    async with digest_env() as session:
+        targets = [row async for row in stream_digest_targets(session, chunk_size=1)]
+        # непрочитанные поля не догружаются скрытым запросом
+        with pytest.raises(InvalidRequestError):
+            targets[0][0].base_resume
+
+    # пользователь без фильтра отсечён в SQL, всё — одним запросом
+    assert [(user.telegram_id, filt.position) for user, filt in targets] == [
+        (1, "python"),
+        (2, "java"),
+    ]
+    assert len(digest_env.statements) == 1
+    assert "base_resume" not in digest_env.statements[0]
+    assert "skills" not in digest_env.statements[0]
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile([], 95) == 0.0
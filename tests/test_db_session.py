@@ -0,0 +1,92 @@
+# tests/test_db_session.py
+
+import dataclasses
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import config
+from app.db import session as db_session
+from app.db.session import InstrumentedQueuePool, engine_options, instrument_engine
+
+
+def test_engine_options_for_postgres_behind_pgbouncer():
+    cfg = dataclasses.replace(config, db_pool_size=3, db_statement_cache_size=0)
+    options = engine_options("postgresql+asyncpg://u:p@db/hh", cfg)
+
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == 3
+    assert options["pool_pre_ping"] is True
+    connect_args = options["connect_args"]
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    # имена подготовленных запросов не повторяются между соединениями PgBouncer
+    name = connect_args["prepared_statement_name_func"]
+    assert name() != name()
+
+
+def test_engine_options_keep_sqlite_pool():
+    options = engine_options("sqlite+aiosqlite:///:memory:", config)
+    assert "poolclass" not in options and "pool_size" not in options
+
+
+@pytest.mark.asyncio
+async def test_pool_wait_and_timeout_are_measured(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    wait = db_session.DB_POOL_WAIT_SECONDS.labels()
+    waits_before = wait.count
+    timeouts_before = db_session.DB_POOL_TIMEOUTS.labels().value
+
+    async with engine.connect():
+        # единственное соединение занято — второй запрос ждёт и сдаётся
+        with pytest.raises(PoolTimeoutError):
+            async with engine.connect():
+                pass
+    await engine.dispose()
+
+    assert wait.count - waits_before == 2
+    assert wait.sum >= 0.1
+    assert db_session.DB_POOL_TIMEOUTS.labels().value - timeouts_before == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged_without_parameters(caplog):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    instrument_engine(engine.sync_engine, slow_query_seconds=1e-9)
+
+    with caplog.at_level(logging.WARNING, logger="app.db.session"):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT :secret"), {"secret": "token-123"})
+    await engine.dispose()
+
+    messages = [r.getMessage() for r in caplog.records if "Slow query" in r.getMessage()]
+    assert messages and "SELECT ?" in messages[0]
+    assert "token-123" not in "\n".join(messages)
+
+
+@pytest.mark.asyncio
+async def test_failed_statements_leave_nothing_on_connection():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    instrument_engine(engine.sync_engine)
+    timings = db_session.DB_STATEMENT_SECONDS.labels("SELECT")
+    before = timings.count
+
+    async with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                await conn.execute(text("SELECT * FROM missing_table"))
+        await conn.execute(text("SELECT 1"))
+        info = (await conn.get_raw_connection()).info
+    await engine.dispose()
+
+    assert "query_started" not in info
+    assert timings.count - before == 1
@@ -0,0 +1,176 @@
+# tests/test_digest_queue.py
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.config import config
+from app.db.models import (
+    DigestItemStatus,
+    DigestRun,
+    DigestRunStatus,
+    DigestWorkItem,
+    SearchFilter,
+    User,
+)
+from app.services import scheduler
+from app.services.digest_queue import (
+    enqueue_due_digests,
+    extend_lease,
+    finish_work_items,
+    lease_work_items,
+)
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+async def add_due_users(maker, count: int) -> None:
+    async with maker() as session:
+        for telegram_id in range(1, count + 1):
+            user = User(telegram_id=telegram_id, next_digest_at=NOW - timedelta(minutes=1))
+            session.add(user)
+            await session.flush()
+            session.add(SearchFilter(user_id=user.id, position="python"))
+        await session.commit()
+
+
+async def item_statuses(session) -> dict[int, tuple[DigestItemStatus, int]]:
+    result = await session.execute(
+        select(DigestWorkItem.user_id, DigestWorkItem.status, DigestWorkItem.attempts)
+    )
+    return {user_id: (status, attempts) for user_id, status, attempts in result.all()}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_creates_one_item_per_slot(session_maker):
+    await add_due_users(session_maker, 3)
+    async with session_maker() as session:
+        assert await enqueue_due_digests(session, NOW, limit=10) == 3
+        # слоты уже перенесены — повторный тик ничего не добавит
+        assert await enqueue_due_digests(session, NOW, limit=10) == 0
+
+        # гонка двух процессов: тот же слот вставляется второй раз
+        user = await session.get(User, 1)
+        slot_at = (await session.execute(select(DigestWorkItem.slot_at))).scalars().first()
+        user.next_digest_at = slot_at
+        await session.commit()
+        assert await enqueue_due_digests(session, NOW, limit=10) == 0
+        assert len(await item_statuses(session)) == 3
+
+
+@pytest.mark.asyncio
+async def test_workers_lease_disjoint_items(session_maker):
+    await add_due_users(session_maker, 5)
+    async with session_maker() as session:
+        await enqueue_due_digests(session, NOW, limit=10)
+        first = await lease_work_items(session, "a", NOW, 3, 60, max_attempts=3)
+        second = await lease_work_items(session, "b", NOW, 3, 60, max_attempts=3)
+        third = await lease_work_items(session, "c", NOW, 3, 60, max_attempts=3)
+
+    assert len(first.items) == 3
+    assert len(second.items) == 2
+    assert not set(first.items) & set(second.items)
+    assert third is None
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over(session_maker):
+    await add_due_users(session_maker, 2)
+    async with session_maker() as session:
+        await enqueue_due_digests(session, NOW, limit=10)
+        crashed = await lease_work_items(session, "a", NOW, 10, 60, max_attempts=3)
+
+        # heartbeat держит аренду живой
+        assert await extend_lease(session, crashed.token, NOW + timedelta(seconds=50), 60) == 2
+        assert await lease_work_items(session, "b", NOW + timedelta(seconds=90), 10, 60, 3) is None
+
+        # процесс «упал»: аренда истекла, задания забирает другой
+        later = NOW + timedelta(seconds=200)
+        taken = await lease_work_items(session, "b", later, 10, 60, max_attempts=3)
+        assert sorted(taken.user_ids) == [1, 2]
+
+        # старый владелец очнулся — его отчёт уже ничего не меняет
+        await finish_work_items(session, crashed, set(), max_attempts=3)
+        statuses = await item_statuses(session)
+
+    assert statuses == {1: (DigestItemStatus.leased, 2), 2: (DigestItemStatus.leased, 2)}
+
+
+@pytest.mark.asyncio
+async def test_failed_items_are_retried_until_attempts_run_out(session_maker):
+    await add_due_users(session_maker, 2)
+    async with session_maker() as session:
+        await enqueue_due_digests(session, NOW, limit=10)
+
+        for attempt in range(2):
+            lease = await lease_work_items(session, "a", NOW, 10, 60, max_attempts=2)
+            await finish_work_items(session, lease, {2}, max_attempts=2)
+
+        statuses = await item_statuses(session)
+        leftover = await lease_work_items(session, "a", NOW, 10, 60, max_attempts=2)
+
+    # 1 отправлен с первой попытки, 2 — две неудачи и failed
+    assert statuses == {1: (DigestItemStatus.done, 1), 2: (DigestItemStatus.failed, 2)}
+    assert leftover is None
+
+
+@pytest.mark.asyncio
+async def test_stale_slots_are_skipped_after_downtime(session_maker):
+    await add_due_users(session_maker, 2)
+    async with session_maker() as session:
+        user = await session.get(User, 2)
+        user.next_digest_at = NOW - timedelta(hours=10)
+        await session.commit()
+        created = await enqueue_due_digests(session, NOW, 10, max_lag=timedelta(hours=6))
+        statuses = await item_statuses(session)
+        skipped = await session.get(User, 2)
+
+    assert created == 1
+    assert list(statuses) == [1]
+    # слот перенесён, вакансии уйдут в следующий
+    assert skipped.next_digest_at > NOW
+
+
+@pytest.mark.asyncio
+async def test_interrupted_run_resumes_from_checkpoint(session_maker, monkeypatch):
+    async def get_session():
+        async with session_maker() as session:
+            yield session
+
+    monkeypatch.setattr(scheduler, "get_session", get_session)
+    monkeypatch.setattr(config, "digest_lease_seconds", 60)
+    await add_due_users(session_maker, 3)
+    seen: list[list[int]] = []
+
+    async def crashing_job(bot, user_ids=None, checkpoint=None):
+        seen.append(sorted(user_ids))
+        async with session_maker() as session:
+            await checkpoint(session, user_ids[0])
+            await session.commit()
+        raise RuntimeError("deploy")
+
+    monkeypatch.setattr(scheduler, "_daily_job", crashing_job)
+    with pytest.raises(RuntimeError):
+        await scheduler._digest_tick(None, NOW)
+
+    async def job(bot, user_ids=None, checkpoint=None):
+        seen.append(sorted(user_ids))
+        return scheduler.DigestRunStats(processed=len(user_ids))
+
+    monkeypatch.setattr(scheduler, "_daily_job", job)
+    # аренда ещё жива — второй процесс чужие задания не берёт
+    assert await scheduler._digest_tick(None, NOW + timedelta(seconds=30)) is None
+    # после рестарта и истечения аренды — только необработанные
+    await scheduler._digest_tick(None, NOW + timedelta(minutes=5))
+
+    async with session_maker() as session:
+        statuses = await item_statuses(session)
+        runs = (await session.execute(select(DigestRun).order_by(DigestRun.id))).scalars().all()
+
+    first = seen[0][0]
+    assert seen[1] == [u for u in seen[0] if u != first]
+    assert statuses[first] == (DigestItemStatus.done, 1)
+    assert all(status == DigestItemStatus.done for status, _ in statuses.values())
+    assert [run.status for run in runs] == [DigestRunStatus.interrupted, DigestRunStatus.finished]
+    assert runs[1].users == 2 and runs[1].processed == 2
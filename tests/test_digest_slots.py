@@ -0,0 +1,113 @@
+# tests/test_digest_slots.py
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.config import config
+from app.db.models import SearchFilter, User
+from app.handlers.start import parse_digest_hour
+from app.services import scheduler
+from app.services.digest_slots import (
+    assign_digest_slots,
+    claim_due_digests,
+    jitter_seconds,
+    next_digest_at,
+    user_timezone,
+)
+
+
+def test_timezone_from_profile_city_then_filter_city():
+    assert user_timezone("Екатеринбург").key == "Asia/Yekaterinburg"
+    assert user_timezone("Владивосток").key == "Asia/Vladivostok"
+    # город без своей записи — пояс страны
+    assert user_timezone("Сочи").key == "Europe/Moscow"
+    assert user_timezone("Минск").key == "Europe/Minsk"
+    assert user_timezone(None, "Новосибирск").key == "Asia/Novosibirsk"
+    assert user_timezone("Атлантида").key == "Europe/Moscow"
+
+
+def test_next_slot_is_local_hour_plus_stable_jitter():
+    tz = user_timezone("Екатеринбург")  # UTC+5
+    after = datetime(2026, 10, 18, 0, 0)
+    slot = next_digest_at(42, tz, 9, after, jitter_minutes=60)
+    jitter = timedelta(seconds=jitter_seconds(42, 60))
+
+    assert slot == datetime(2026, 10, 18, 4, 0) + jitter
+    assert timedelta(0) <= jitter < timedelta(hours=1)
+    # слот уже прошёл — следующий завтра
+    assert next_digest_at(42, tz, 9, slot, jitter_minutes=60) == slot + timedelta(days=1)
+
+
+def test_jitter_spreads_users_across_window():
+    minutes = {jitter_seconds(user_id, 60) // 60 for user_id in range(1, 1001)}
+    assert len(minutes) > 50
+
+
+def test_parse_digest_hour():
+    assert parse_digest_hour("8") == 8
+    assert parse_digest_hour("08:30") == 8
+    assert parse_digest_hour("25") is None
+    assert parse_digest_hour("утром") is None
+
+
+async def add_users(maker, cities: dict[int, str]) -> None:
+    async with maker() as session:
+        for telegram_id, city in cities.items():
+            user = User(telegram_id=telegram_id, city=city)
+            session.add(user)
+            await session.flush()
+            session.add(SearchFilter(user_id=user.id, position="python"))
+        # пользователь без фильтра слот не получает
+        session.add(User(telegram_id=999))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_assign_and_claim_due_users(session_maker, monkeypatch):
+    monkeypatch.setattr(config, "digest_default_hour", 9)
+    await add_users(session_maker, {1: "Владивосток", 2: "Москва", 3: "Калининград"})
+    now = datetime(2026, 10, 18, 3, 0)  # 13:00 во Владивостоке, 6:00 в Москве
+
+    async with session_maker() as session:
+        assert await assign_digest_slots(session, now) == 3
+        assert await assign_digest_slots(session, now) == 0
+
+        # к 8:00 UTC слоты наступили у Москвы (9:xx MSK) и Калининграда (9:xx EET)
+        later = now + timedelta(hours=5)
+        before = dict((await session.execute(select(User.id, User.next_digest_at))).all())
+        due = await claim_due_digests(session, later, limit=1)
+        due.update(await claim_due_digests(session, later, limit=10))
+        again = await claim_due_digests(session, later, limit=10)
+        slots = dict((await session.execute(select(User.id, User.next_digest_at))).all())
+
+    assert due == {2: before[2], 3: before[3]}
+    assert again == {}
+    assert all(slots[user_id] > later for user_id in due)
+
+
+@pytest.mark.asyncio
+async def test_tick_sends_only_due_users(session_maker, monkeypatch):
+    async def get_session():
+        async with session_maker() as session:
+            yield session
+
+    handled: list[list[int] | None] = []
+
+    async def fake_daily_job(bot, user_ids=None, checkpoint=None):
+        handled.append(sorted(user_ids))
+        return scheduler.DigestRunStats()
+
+    monkeypatch.setattr(scheduler, "get_session", get_session)
+    monkeypatch.setattr(scheduler, "_daily_job", fake_daily_job)
+    monkeypatch.setattr(config, "digest_default_hour", 9)
+    await add_users(session_maker, {1: "Москва", 2: "Владивосток"})
+
+    now = datetime(2026, 10, 18, 3, 0)  # 6:00 в Москве, 13:00 во Владивостоке
+    assert await scheduler._digest_tick(None, now) is None
+    await scheduler._digest_tick(None, now + timedelta(hours=4))
+    # во Владивостоке 9:xx следующего дня — это ~23:xx UTC
+    await scheduler._digest_tick(None, now + timedelta(hours=21))
+
+    assert handled == [[1], [2]]
@@ -0,0 +1,79 @@
+# tests/test_hh_cache.py
+
+import httpx
+import pytest
+
+from app.services.hh_cache import MemoryResponseCache, SqlResponseCache, set_response_cache
+from app.services.hh_client import HHClient
+from app.services.hh_service import search_vacancies
+
+from conftest import FakeClock
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_ttl_and_counters():
+    clock = FakeClock()
+    cache = MemoryResponseCache(ttl=60, max_size=10, clock=clock)
+
+    assert await cache.get("a") is None
+    await cache.set("a", {"items": []})
+    assert await cache.get("a") == {"items": []}
+
+    clock.now = 61
+    assert await cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0, "size": 0}
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryResponseCache(ttl=60, max_size=2, clock=FakeClock())
+
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    await cache.get("a")  # "a" теперь свежее, чем "b"
+    await cache.set("c", 3)
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+    assert await cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_sql_cache_roundtrip_and_purge(session_maker):
+    cache = SqlResponseCache(ttl=60, max_size=2, session_maker=session_maker)
+    cache.purge_every = 4
+
+    assert await cache.get("a") is None
+    await cache.set("a", {"items": [1]})
+    await cache.set("a", {"items": [2]})
+    assert await cache.get("a") == {"items": [2]}
+
+    await cache.set("b", {"items": []})
+    await cache.set("c", {"items": []})  # срабатывает чистка до max_size
+    assert cache.evictions == 1
+    assert cache.hits == 1 and cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_search_hits_cache_for_repeated_query():
+    calls: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"items": [{"id": "1"}], "pages": 1})
+
+    client = HHClient(transport=httpx.MockTransport(handler))
+    cache = MemoryResponseCache(ttl=60, max_size=10)
+    set_response_cache(cache)
+
+    params = {"text": "python", "date_from": "2025-01-01T09:00:00"}
+    first = await search_vacancies(params, limit=10, client=client)
+    # тот же запрос чуть позже — date_from округлён до того же часа
+    params = {"text": "Python", "date_from": "2025-01-01T09:00:00"}
+    second = await search_vacancies(params, limit=10, client=client)
+    await client.aclose()
+
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
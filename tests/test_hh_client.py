@@ -0,0 +1,55 @@
+# tests/test_hh_client.py
+
+import httpx
+import pytest
+
+from app.services import hh_client as hh_client_module
+from app.services.hh_client import HHClient, get_hh_client, set_hh_client
+
+
+def make_fake_hh(calls: list[httpx.Request]) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if request.url.path == "/vacancies":
+            return httpx.Response(200, json={"items": [{"id": "1", "name": "Python"}]})
+        return httpx.Response(404, json={"errors": [{"type": "not_found"}]})
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_hh_client_reuses_connection_pool_and_sends_user_agent():
+    calls: list[httpx.Request] = []
+    client = HHClient(user_agent="hh-bot-test", transport=make_fake_hh(calls))
+
+    first = await client.get_json("/vacancies", params={"text": "python"})
+    second = await client.get_json("/vacancies", params={"text": "python"})
+    await client.aclose()
+
+    assert first == second == {"items": [{"id": "1", "name": "Python"}]}
+    assert len(calls) == 2
+    assert calls[0].headers["User-Agent"] == "hh-bot-test"
+    assert calls[0].url.params["text"] == "python"
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_hh_client_raises_on_error_status():
+    client = HHClient(transport=make_fake_hh([]))
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_json("/unknown")
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_set_hh_client_injects_shared_client(monkeypatch):
+    monkeypatch.setattr(hh_client_module, "_hh_client", None)
+    fake = HHClient(transport=make_fake_hh([]))
+
+    set_hh_client(fake)
+    assert get_hh_client() is fake
+
+    await fake.aclose()
+    # закрытый клиент не возвращаем — создаётся новый
+    assert get_hh_client() is not fake
+    await hh_client_module.close_hh_client()
@@ -0,0 +1,94 @@
+# tests/test_hh_pagination.py
+
+import httpx
+import pytest
+
+from app.services.hh_client import HHClient
+from app.services.hh_service import search_vacancies
+
+
+def make_paged_hh(
+    total_pages: int, per_page: int, requested: list[int], found: int | None = None
+):
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("page", 0))
+        requested.append(page)
+        items = [{"id": f"{page}-{i}", "name": "Python"} for i in range(per_page)]
+        return httpx.Response(
+            200,
+            json={
+                "items": items,
+                "page": page,
+                "pages": total_pages,
+                "found": found or total_pages * per_page,
+            },
+        )
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_search_vacancies_reads_all_pages_up_to_cap():
+    requested: list[int] = []
+    client = HHClient(transport=make_paged_hh(total_pages=10, per_page=3, requested=requested))
+
+    items = await search_vacancies({"text": "python"}, limit=3, client=client, max_pages=6)
+    await client.aclose()
+
+    assert sorted(requested) == [0, 1, 2, 3, 4, 5]
+    assert len(items) == 18
+    assert len({item["id"] for item in items}) == 18
+
+
+@pytest.mark.asyncio
+async def test_search_vacancies_beyond_hh_depth_is_incomplete():
+    requested: list[int] = []
+    # hh.ru нашёл 5000, но pages урезаны до глубины 2000
+    transport = make_paged_hh(total_pages=20, per_page=100, requested=requested, found=5000)
+    client = HHClient(transport=transport)
+
+    items = await search_vacancies({"text": "python"}, limit=100, client=client, max_pages=20)
+    too_deep = await search_vacancies(
+        {"text": "python"}, limit=100, client=client, max_pages=20, max_found=2000
+    )
+    await client.aclose()
+
+    assert len(items) == 2000
+    assert items.complete is False
+    # max_found: страницы дальше первой не читаются — запрос будут дробить
+    assert len(too_deep) == 100 and too_deep.complete is False
+    assert len(requested) == 21
+
+
+@pytest.mark.asyncio
+async def test_search_vacancies_single_page_by_default():
+    requested: list[int] = []
+    client = HHClient(transport=make_paged_hh(total_pages=10, per_page=3, requested=requested))
+
+    items = await search_vacancies({"text": "python"}, limit=3, client=client)
+    await client.aclose()
+
+    assert requested == [0]
+    assert len(items) == 3
+
+
+@pytest.mark.asyncio
+async def test_search_vacancies_stops_when_enough_new_found():
+    requested: list[int] = []
+    client = HHClient(transport=make_paged_hh(total_pages=20, per_page=5, requested=requested))
+    # первая страница уже видена пользователем целиком
+    known = {f"0-{i}" for i in range(5)}
+
+    items = await search_vacancies(
+        {"text": "python"},
+        limit=5,
+        client=client,
+        max_pages=20,
+        want_new=5,
+        known_ids=known,
+    )
+    await client.aclose()
+
+    new_items = [item for item in items if item["id"] not in known]
+    assert len(new_items) >= 5
+    assert len(requested) < 20
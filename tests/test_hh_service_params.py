@@ -2,6 +2,10 @@
 
 from types import SimpleNamespace
 
+import httpx
+import pytest
+
+from app.services.hh_client import HHClient
 from app.services.hh_service import _build_hh_params
 
 
@@ -22,6 +26,7 @@ def make_filter(
     freshness_days: int | None = None,
     experience_level: str | None = None,
     employment_types: list[str] | None = None,
+    metro_ids: list[str] | None = None,
 ):
     return SimpleNamespace(
         position=position,
@@ -31,6 +36,7 @@ def make_filter(
         employment_types=employment_types,
         experience_level=experience_level,
         metro_stations=None,
+        metro_ids=metro_ids,
         only_direct_employers=True,
         company_size=None,
         only_top_companies=False,
@@ -78,3 +84,109 @@ def test_build_hh_params_experience_and_employment():
     assert "full" in params["employment"]
     assert "schedule" in params
     assert "remote" in params["schedule"]
+
+
+def test_hh_query_fingerprint_same_for_equivalent_queries():
+    from app.services.hh_service import hh_query_fingerprint
+
+    a = {
+        "text": "Python  Developer",
+        "area": 1,
+        "employment": ["part", "full"],
+        "date_from": "2025-01-01T09:05:13",
+    }
+    b = {
+        "text": "python developer",
+        "area": 1,
+        "employment": ["full", "part"],
+        "date_from": "2025-01-01T09:05:13",
+    }
+
+    assert hh_query_fingerprint(a) == hh_query_fingerprint(b)
+    # другое окно — другая выдача: курсор не должен получить чужую страницу
+    assert hh_query_fingerprint(a) != hh_query_fingerprint(
+        {**b, "date_from": "2025-01-01T09:00:00"}
+    )
+
+
+def test_hh_query_fingerprint_differs_by_area():
+    from app.services.hh_service import hh_query_fingerprint
+
+    user = make_user(desired_position="Программист")
+    msk = _build_hh_params(user, make_filter(city="Москва"))
+    spb = _build_hh_params(user, make_filter(city="Санкт-Петербург"))
+
+    assert hh_query_fingerprint(msk) != hh_query_fingerprint(spb)
+
+
+def test_build_hh_params_since_narrows_date_from_window():
+    from datetime import datetime, timedelta
+
+    user = make_user(desired_position="Программист")
+    filt = make_filter(freshness_days=3)
+    since = datetime.utcnow() - timedelta(hours=2)
+
+    narrowed = _build_hh_params(user, filt, since=since)
+    # запрос округлён вниз до часа: шире курсора, лишнее отсечёт сам курсор
+    hour = since.replace(minute=0, second=0, microsecond=0)
+    assert narrowed["date_from"] == hour.isoformat(timespec="seconds")
+    later = _build_hh_params(user, filt, since=hour + timedelta(minutes=59))
+    assert later["date_from"] == narrowed["date_from"]
+
+    # курсор старше окна свежести окно не расширяет
+    stale = _build_hh_params(user, filt, since=since - timedelta(days=10))
+    assert stale["date_from"] > (since - timedelta(days=4)).isoformat()
+
+
+def test_build_hh_params_passes_metro_ids():
+    user = make_user(desired_position="Программист", city="Москва")
+
+    params = _build_hh_params(user, make_filter(metro_ids=["6.8", "5.95"]))
+    assert params["metro"] == ["6.8", "5.95"]
+
+    assert "metro" not in _build_hh_params(user, make_filter())
+
+
+def test_metro_index_resolves_station_names():
+    from app.services.metro import MetroIndex
+
+    index = MetroIndex(
+        [
+            {
+                "id": "1",
+                "name": "Москва",
+                "lines": [
+                    {"id": "5", "stations": [{"id": "5.95", "name": "Таганская"}]},
+                    {"id": "7", "stations": [{"id": "7.96", "name": "Таганская"}]},
+                    {"id": "6", "stations": [{"id": "6.8", "name": "Китай-город"}]},
+                ],
+            }
+        ]
+    )
+
+    ids, unknown = index.resolve_many(1, ["таганская", "Китай город", "Нарния"])
+    assert ids == ["5.95", "7.96", "6.8"]
+    assert unknown == ["Нарния"]
+    # город без метро — ничего не распознаём
+    assert index.resolve_many(2, ["Таганская"]) == ([], ["Таганская"])
+
+
+@pytest.mark.asyncio
+async def test_metro_index_is_loaded_from_api(monkeypatch):
+    from app.services import metro
+
+    monkeypatch.setattr(metro, "_metro_index", None)
+    cities = [
+        {
+            "id": "1",
+            "name": "Москва",
+            "lines": [{"id": "6", "stations": [{"id": "6.8", "name": "Китай-город"}]}],
+        }
+    ]
+    client = HHClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, json=cities)))
+    index = await metro.init_metro_index(client)
+    await client.aclose()
+
+    # в репозитории справочник пустой — станции известны только из API
+    assert metro.get_metro_index() is index
+    assert index.resolve_many(1, ["Китай город"]) == (["6.8"], [])
@@ -0,0 +1,39 @@
+# tests/test_json_codec.py
+
+import json
+
+from app.services.llm_service import parse_chat_content
+from app.utils import json_codec
+
+
+def test_loads_and_dumps_roundtrip_cyrillic():
+    obj = {"name": "Разработчик", "salary": {"from": 100, "to": None}, "ids": [1, 2]}
+    data = json_codec.dumps(obj)
+    assert isinstance(data, bytes)
+    assert "Разработчик".encode() in data
+    assert json_codec.loads(data) == obj
+    assert json_codec.loads(data.decode()) == obj
+
+
+def test_loads_without_orjson_uses_stdlib(monkeypatch):
+    monkeypatch.setattr(json_codec, "orjson", None)
+    assert json_codec.loads(b'{"a": [1, "\xd0\xb1"]}') == {"a": [1, "б"]}
+    assert json_codec.dumps({"a": "б"}) == '{"a":"б"}'.encode()
+
+
+def test_parse_chat_content_ignores_extra_fields():
+    body = json.dumps(
+        {
+            "id": "chatcmpl-1",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "Привет"},
+                    "logprobs": None,
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"total_tokens": 10},
+        }
+    ).encode()
+    assert parse_chat_content(body) == "Привет"
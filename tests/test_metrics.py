@@ -0,0 +1,87 @@
+# tests/test_metrics.py
+
+import dataclasses
+import socket
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.config import BotConfig, config
+from app.services.metrics_server import (
+    build_metrics_app,
+    close_metrics_server,
+    init_metrics_server,
+)
+from app.utils.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_and_gauge_render_prometheus_text():
+    registry = Registry()
+    sent = Counter("sent_total", "Sent messages", ("chat",), registry=registry)
+    depth = Gauge("queue_depth", "Queue depth", registry=registry)
+    sent.labels(1).inc()
+    sent.labels(1).inc(2)
+    sent.labels('a"b').inc()
+    depth.set_function(lambda: 7)
+
+    text = registry.render()
+
+    assert "# TYPE sent_total counter" in text
+    assert 'sent_total{chat="1"} 3' in text
+    assert 'sent_total{chat="a\\"b"} 1' in text
+    assert "queue_depth 7" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = Histogram(
+        "latency_seconds", "Latency", ("status",), buckets=(0.1, 1.0), registry=registry
+    )
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.labels(200).observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_bucket{status="200",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{status="200",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{status="200",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{status="200"} 3.65' in lines
+    assert 'latency_seconds_count{status="200"} 4' in lines
+
+
+def test_duplicate_metric_and_wrong_labels_are_rejected():
+    registry = Registry()
+    Counter("dup_total", "First", ("kind",), registry=registry)
+    with pytest.raises(ValueError):
+        Counter("dup_total", "Second", registry=registry)
+    with pytest.raises(ValueError):
+        registry.get("dup_total").labels("a", "b")
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_registry():
+    registry = Registry()
+    Counter("hits_total", "Hits", registry=registry).inc()
+
+    async with TestClient(TestServer(build_metrics_app(registry))) as client:
+        resp = await client.get("/metrics")
+        body = await resp.text()
+
+    assert resp.status == 200
+    assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "hits_total 1" in body
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_is_off_by_default_and_survives_busy_port():
+    assert BotConfig.metrics_port == 0
+    assert await init_metrics_server(dataclasses.replace(config, metrics_port=0)) is None
+
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        port = busy.getsockname()[1]
+        cfg = dataclasses.replace(config, metrics_host="127.0.0.1", metrics_port=port)
+        # второй процесс на том же порту не падает, а работает без метрик
+        assert await init_metrics_server(cfg) is None
+    await close_metrics_server()
@@ -0,0 +1,230 @@
+# tests/test_notification_outbox.py
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.config import config
+from app.db.crud import link_user_vacancies, mark_vacancies_as_sent
+from app.db.models import (
+    NotificationOutbox,
+    OutboxStatus,
+    User,
+    UserVacancy,
+    Vacancy,
+    VacancyStatus,
+)
+from app.services import notification_outbox
+from app.services.notification_outbox import (
+    drain_outbox,
+    lease_notifications,
+    release_notifications,
+)
+
+from conftest import FakeBot
+
+
+@pytest.fixture
+def outbox_env(monkeypatch, session_maker):
+    async def get_session():
+        async with session_maker() as session:
+            yield session
+
+    monkeypatch.setattr(notification_outbox, "get_session", get_session)
+    # у SQLite в памяти одно соединение на все сессии — пишем последовательно
+    monkeypatch.setattr(config, "digest_concurrency", 1)
+    monkeypatch.setattr(config, "outbox_max_attempts", 2)
+    return session_maker
+
+
+async def make_links(maker, users: int, vacancies: int) -> None:
+    async with maker() as session:
+        for telegram_id in range(1, users + 1):
+            session.add(User(id=telegram_id, telegram_id=telegram_id))
+        for i in range(1, vacancies + 1):
+            session.add(Vacancy(id=i, hh_id=str(i), title=f"Python {i}", company="Corp", url=""))
+        await session.flush()
+        pairs = [(u, v) for u in range(1, users + 1) for v in range(1, vacancies + 1)]
+        await link_user_vacancies(session, pairs)
+        await session.commit()
+
+
+async def outbox_rows(session) -> list[NotificationOutbox]:
+    result = await session.execute(select(NotificationOutbox).order_by(NotificationOutbox.id))
+    return list(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_links_enqueue_held_notifications_once(outbox_env):
+    await make_links(outbox_env, users=2, vacancies=3)
+    async with outbox_env() as session:
+        # повторная привязка тех же вакансий (второй поиск, второй процесс)
+        await link_user_vacancies(session, [(1, 1), (1, 2)])
+        await session.commit()
+        rows = await outbox_rows(session)
+        nothing_yet = await lease_notifications(session, datetime.utcnow(), 100, 60)
+
+    assert len(rows) == 6
+    assert {row.idempotency_key for row in rows} == {f"{u}:{v}" for u in (1, 2) for v in (1, 2, 3)}
+    # до слота пользователя отправлять нечего
+    assert all(row.available_at is None for row in rows)
+    assert nothing_yet is None
+
+
+@pytest.mark.asyncio
+async def test_release_and_drain_send_one_message_per_user(outbox_env):
+    await make_links(outbox_env, users=2, vacancies=12)
+    async with outbox_env() as session:
+        assert await release_notifications(session, 1, datetime.utcnow()) == 10
+        await session.commit()
+
+    bot = FakeBot()
+    stats = await drain_outbox(bot)
+
+    assert bot.chats == [1]
+    assert bot.sent[0][1].count("Python") == 10
+    assert stats.messages == 1 and stats.sent == 10
+
+    async with outbox_env() as session:
+        statuses = (
+            await session.execute(
+                select(UserVacancy.user_id, UserVacancy.status).where(
+                    UserVacancy.status == VacancyStatus.sent
+                )
+            )
+        ).all()
+        # остаток ждёт следующего слота
+        assert await release_notifications(session, 1, datetime.utcnow()) == 2
+        await session.commit()
+    assert {user_id for user_id, _ in statuses} == {1}
+    assert len(statuses) == 10
+
+    # повторный проход ничего не шлёт дважды
+    await drain_outbox(bot)
+    assert bot.chats == [1, 1]
+    assert bot.sent[1][1].count("Python") == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried_with_backoff_then_failed(outbox_env):
+    await make_links(outbox_env, users=1, vacancies=2)
+    now = datetime.utcnow()
+    async with outbox_env() as session:
+        await release_notifications(session, 1, now)
+        await session.commit()
+
+    bot = FakeBot(fail_for={1})
+    stats = await drain_outbox(bot, now)
+    assert stats.retried == 2 and bot.sent == []
+
+    async with outbox_env() as session:
+        rows = await outbox_rows(session)
+    assert all(row.status == OutboxStatus.pending for row in rows)
+    assert all(row.available_at >= now + timedelta(seconds=59) for row in rows)
+
+    # до конца паузы повтора нет; после — вторая (последняя) попытка
+    assert (await drain_outbox(bot, now)).retried == 0
+    stats = await drain_outbox(bot, now + timedelta(minutes=2))
+    assert stats.failed == 2
+
+    async with outbox_env() as session:
+        rows = await outbox_rows(session)
+    assert [row.status for row in rows] == [OutboxStatus.failed] * 2
+
+
+@pytest.mark.asyncio
+async def test_shown_vacancies_leave_outbox(outbox_env):
+    await make_links(outbox_env, users=1, vacancies=3)
+    async with outbox_env() as session:
+        user = await session.get(User, 1)
+        shown = [await session.get(Vacancy, 1)]
+        # /vacancies показал вакансию до слота
+        await mark_vacancies_as_sent(session, user, shown)
+        await release_notifications(session, 1, datetime.utcnow())
+        await session.commit()
+
+    bot = FakeBot()
+    await drain_outbox(bot)
+
+    assert len(bot.sent) == 1
+    assert "Python 1\n" not in bot.sent[0][1]
+    assert bot.sent[0][1].count("Python") == 2
+
+
+@pytest.mark.asyncio
+async def test_crashed_sender_lease_expires(outbox_env):
+    await make_links(outbox_env, users=1, vacancies=1)
+    now = datetime.utcnow()
+    async with outbox_env() as session:
+        await release_notifications(session, 1, now)
+        await session.commit()
+        # процесс взял уведомление и упал до отправки
+        assert await lease_notifications(session, now, 100, 60) is not None
+        assert await lease_notifications(session, now, 100, 60) is None
+
+    bot = FakeBot()
+    await drain_outbox(bot, now + timedelta(seconds=61))
+    assert bot.chats == [1]
+
+
+@pytest.mark.asyncio
+async def test_notifications_of_deleted_user_are_cancelled(outbox_env):
+    await make_links(outbox_env, users=1, vacancies=2)
+    now = datetime.utcnow()
+    async with outbox_env() as session:
+        await release_notifications(session, 1, now)
+        await session.execute(delete(User).where(User.id == 1))
+        await session.commit()
+
+    bot = FakeBot()
+    stats = await drain_outbox(bot, now)
+    assert stats.cancelled == 2 and bot.sent == []
+
+    async with outbox_env() as session:
+        rows = await outbox_rows(session)
+        # аренда истекла — забирать больше нечего
+        assert await lease_notifications(session, now + timedelta(minutes=5), 100, 60) is None
+    assert [row.status for row in rows] == [OutboxStatus.cancelled] * 2
+    assert all(row.error == "user not found" and row.lease_token is None for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_release_prefers_newest_and_caps_backlog(outbox_env):
+    await make_links(outbox_env, users=1, vacancies=30)
+    async with outbox_env() as session:
+        assert await release_notifications(session, 1, datetime.utcnow(), max_backlog=5) == 10
+        await session.commit()
+        rows = await outbox_rows(session)
+
+    released = [row.vacancy_id for row in rows if row.available_at is not None]
+    held = [row.vacancy_id for row in rows if row.status == OutboxStatus.pending]
+    cancelled = [row.vacancy_id for row in rows if row.status == OutboxStatus.cancelled]
+    # в слот уходят самые свежие, в очереди остаётся не больше max_backlog
+    assert released == list(range(21, 31))
+    assert sorted(set(held) - set(released)) == [16, 17, 18, 19, 20]
+    assert cancelled == list(range(1, 16))
+
+
+@pytest.mark.asyncio
+async def test_long_delivery_keeps_outbox_lease(outbox_env, monkeypatch):
+    await make_links(outbox_env, users=1, vacancies=1)
+    async with outbox_env() as session:
+        await release_notifications(session, 1, datetime.utcnow())
+        await session.commit()
+
+    extended: list[int] = []
+    real_extend = notification_outbox.extend_outbox_lease
+
+    async def extend(*args, **kwargs):
+        extended.append(await real_extend(*args, **kwargs))
+        return extended[-1]
+
+    monkeypatch.setattr(notification_outbox, "extend_outbox_lease", extend)
+    monkeypatch.setattr(config, "outbox_lease_seconds", 0.15)
+    # отправка дольше аренды — пачку продлевает heartbeat
+    bot = FakeBot(delay=0.3)
+    stats = await drain_outbox(bot)
+
+    assert stats.sent == 1
+    assert extended and extended[0] == 1
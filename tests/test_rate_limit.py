@@ -0,0 +1,124 @@
+# tests/test_rate_limit.py
+
+import httpx
+import pytest
+
+from app.services import hh_client
+from app.services.hh_client import HHClient, _parse_retry_after
+from app.utils.metrics import REGISTRY
+from app.utils.rate_limit import AIMDLimiter, TokenBucket
+
+from conftest import FakeClock
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    clock = FakeClock()
+    slept: list[float] = []
+
+    async def fake_sleep(seconds: float) -> None:
+        slept.append(seconds)
+        clock.now += seconds
+
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=fake_sleep)
+    for _ in range(3):
+        await bucket.acquire()
+
+    assert slept == [pytest.approx(0.5)]
+
+
+def test_token_bucket_pause():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+
+    # Retry-After: 0 — полный бакет не трогаем
+    bucket.pause(0)
+    assert bucket.tokens == 2
+
+    bucket.pause(1.5)
+    assert bucket.try_acquire() == 2.0
+    clock.now += 2.0
+    assert bucket.try_acquire() == 0.0
+
+
+def test_aimd_limiter_grows_additively_and_halves_on_throttle():
+    clock = FakeClock()
+    limiter = AIMDLimiter(initial=4, max_limit=16, cooldown=1.0, clock=clock)
+
+    # +1/limit за каждый успех: примерно +1 за «окно» из limit запросов
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.limit == 5
+
+    limiter.on_throttle()
+    limiter.on_throttle()  # тот же всплеск — повторно не режем
+    assert limiter.limit == 2
+
+    clock.now = 2.0
+    limiter.on_throttle()
+    assert limiter.limit == 1
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after("3") == 3.0
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_hh_client_retries_after_429_and_reports_stats():
+    responses = iter(
+        [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(503),
+            httpx.Response(200, json={"items": []}),
+        ]
+    )
+    client = HHClient(
+        transport=httpx.MockTransport(lambda request: next(responses)),
+        backoff_base=0.001,
+        initial_concurrency=8,
+    )
+
+    assert await client.get_json("/vacancies") == {"items": []}
+    stats = client.limiter_stats()
+    await client.aclose()
+
+    assert stats["throttled"] == 2
+    assert stats["retries"] == 2
+    assert stats["concurrency_limit"] == 4
+
+
+@pytest.mark.asyncio
+async def test_hh_limiter_state_is_exported_as_gauges(monkeypatch):
+    client = HHClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(429, headers={"Retry-After": "0"})
+        ),
+        max_retries=0,
+        initial_concurrency=8,
+    )
+    monkeypatch.setattr(hh_client, "_hh_client", client)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_json("/vacancies")
+    text = REGISTRY.render()
+    await client.aclose()
+
+    assert "hh_concurrency_limit 4\n" in text
+    assert "hh_requests_in_flight 0\n" in text
+    assert "hh_limiter_tokens " in text
+
+
+@pytest.mark.asyncio
+async def test_hh_client_gives_up_after_max_retries():
+    client = HHClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(502)),
+        max_retries=2,
+        backoff_base=0.001,
+    )
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_json("/vacancies")
+    assert client.retries == 2
+    await client.aclose()
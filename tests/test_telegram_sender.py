@@ -0,0 +1,127 @@
+# tests/test_telegram_sender.py
+
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.services import telegram_sender
+from app.services.telegram_sender import (
+    PRIORITY_DIGEST,
+    PRIORITY_INTERACTIVE,
+    TelegramSender,
+    deliver,
+)
+
+from conftest import FakeBot
+
+
+@pytest.mark.asyncio
+async def test_interactive_messages_go_before_digest():
+    bot = FakeBot()
+    sender = TelegramSender(bot, global_rate=1000, chat_rate=1000, workers=1)
+    pending = [
+        sender.submit(i, lambda i=i: bot.send_message(i, "digest"), PRIORITY_DIGEST)
+        for i in range(1, 4)
+    ]
+    pending.append(
+        sender.submit(99, lambda: bot.send_message(99, "reply"), PRIORITY_INTERACTIVE)
+    )
+    sender.start()
+    await asyncio.gather(*pending)
+    await sender.stop()
+
+    assert bot.sent[0] == (99, "reply")
+    # внутри одного приоритета порядок сохраняется
+    assert [chat for chat, _ in bot.sent[1:]] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_per_chat_limit_does_not_block_other_chats():
+    bot = FakeBot()
+    sender = TelegramSender(bot, global_rate=1000, chat_rate=10, workers=2)
+    sender.start()
+    await asyncio.gather(
+        *(sender.send_message(1, f"m{i}") for i in range(3)),
+        sender.send_message(2, "other"),
+    )
+    await sender.stop()
+
+    chat1 = [t for (chat, _), t in zip(bot.sent, bot.times) if chat == 1]
+    assert len(chat1) == 3
+    # 10 сообщений/с в чат — не чаще раза в 0.1 с
+    assert chat1[2] - chat1[0] >= 0.18
+    # второй чат не ждал очереди первого
+    assert bot.sent.index((2, "other")) < 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_retried_and_counted():
+    bot = FakeBot(flood_for={1: 2})
+    sender = TelegramSender(bot, global_rate=1000, chat_rate=1000, max_retries=3)
+    sender.start()
+    result = await sender.send_message(1, "hello")
+    stats = sender.stats()
+    await sender.stop()
+
+    assert result == 1
+    assert bot.sent == [(1, "hello")]
+    assert stats["retried"] == 2
+    assert stats["sent"] == 1
+    assert stats["latency_p95"] >= 0.1
+    assert stats["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_caller():
+    bot = FakeBot(flood_for={1: 5}, fail_for={2})
+    sender = TelegramSender(bot, global_rate=1000, chat_rate=1000, max_retries=1)
+    sender.start()
+    with pytest.raises(TelegramRetryAfter):
+        await sender.send_message(1, "flood")
+    with pytest.raises(RuntimeError):
+        await sender.send_message(2, "missing")
+    assert sender.stats()["failed"] == 2
+    await sender.stop()
+
+
+@pytest.mark.asyncio
+async def test_retry_after_for_cancelled_caller_is_not_a_worker_error(caplog):
+    bot = FakeBot(flood_for={1: 1}, delay=0.05)
+    sender = TelegramSender(bot, global_rate=1000, chat_rate=1000, max_retries=0)
+    sender.start()
+    # вызывающий перестал ждать, пока шла отправка, и она вернула RetryAfter
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(sender.send_message(1, "flood"), 0.01)
+    await asyncio.sleep(0.1)
+
+    assert sender.stats()["failed"] == 1
+    assert await sender.send_message(2, "next") == 1
+    await sender.stop()
+    assert "worker failed" not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_delayed_retries():
+    bot = FakeBot(flood_for={1: 1})
+    sender = TelegramSender(bot, global_rate=1000, chat_rate=1000, max_retries=3)
+    sender.start()
+    pending = asyncio.ensure_future(sender.send_message(1, "hello"))
+    # первый ответ — RetryAfter, задание ждёт повтора на таймере
+    while not sender.stats()["delayed"]:
+        await asyncio.sleep(0.001)
+    await sender.stop()
+
+    assert sender.stats()["delayed"] == 0
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(pending, 1)
+    await asyncio.sleep(0.1)
+    assert bot.sent == []
+
+
+@pytest.mark.asyncio
+async def test_deliver_without_running_sender_sends_directly(monkeypatch):
+    monkeypatch.setattr(telegram_sender, "_sender", None)
+    bot = FakeBot()
+    assert await deliver(bot, 5, "direct") == 1
+    assert bot.sent == [(5, "direct")]
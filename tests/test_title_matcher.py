@@ -0,0 +1,110 @@
+# tests/test_title_matcher.py
+
+from types import SimpleNamespace
+import random
+
+import pytest
+
+from app.services.title_matcher import TitleMatcher, normalize_title
+from app.services.vacancy_filters import filter_items
+
+POSITIONS = {
+    1: "Python",
+    2: "python developer",
+    3: "Developer",
+    4: "Java",
+    5: "Ведущий разработчик",
+    6: "разработчик",
+    7: "  ",
+}
+
+
+def make_matcher(positions=POSITIONS) -> TitleMatcher:
+    matcher = TitleMatcher()
+    matcher.sync(positions)
+    return matcher
+
+
+def naive(title: str, positions=POSITIONS) -> set[int]:
+    text = normalize_title(title)
+    return {
+        owner
+        for owner, position in positions.items()
+        if normalize_title(position) and normalize_title(position) in text
+    }
+
+
+@pytest.mark.parametrize(
+    "title",
+    [
+        "Senior Python Developer",
+        "JavaScript-разработчик",
+        "Ведущий разработчик Python",
+        "ВЕДУЩИЙ  РАЗРАБОТЧИК",
+        "Повар",
+        "",
+    ],
+)
+def test_match_returns_every_owner_like_substring_check(title):
+    assert make_matcher().match(title) == naive(title)
+
+
+def test_match_normalizes_yo():
+    matcher = make_matcher({1: "Всё включено"})
+    assert matcher.match("Отель «все включено», администратор") == {1}
+
+
+def test_matches_random_titles_like_naive_check():
+    rnd = random.Random(42)
+    alphabet = "abc "
+    positions = {
+        i: "".join(rnd.choice(alphabet) for _ in range(rnd.randint(1, 4))) for i in range(40)
+    }
+    matcher = make_matcher(positions)
+    for _ in range(300):
+        title = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 20)))
+        assert matcher.match(title) == naive(title, positions)
+
+
+def test_incremental_updates_touch_only_changed_owners():
+    matcher = make_matcher()
+    assert 4 in matcher.match("Java developer")
+    rebuilds = matcher.rebuilds
+
+    # тот же набор — автомат не трогаем
+    matcher.sync(POSITIONS)
+    matcher.match("Kotlin developer")
+    assert matcher.rebuilds == rebuilds
+
+    # удаление не требует пересчёта ссылок
+    positions = {k: v for k, v in POSITIONS.items() if k != 4}
+    matcher.sync(positions)
+    assert matcher.match("Java developer") == {3}
+    assert matcher.rebuilds == rebuilds
+
+    # смена должности
+    matcher.update(3, "Kotlin")
+    assert matcher.match("Kotlin developer") == {3}
+    assert matcher.pattern_of(3) == "kotlin"
+    assert matcher.match("Senior Python Developer") == {1, 2}
+
+
+@pytest.mark.asyncio
+async def test_filter_items_with_matcher_keeps_same_items():
+    matcher = make_matcher()
+    items = [
+        {"id": "1", "name": "Senior Python Developer", "employer": {"id": "1"}},
+        {"id": "2", "name": "Java разработчик", "employer": {"id": "1"}},
+        {"id": "3", "name": "Повар", "employer": {"id": "1"}},
+    ]
+    for owner, position in POSITIONS.items():
+        filt = SimpleNamespace(
+            id=owner,
+            position=position,
+            only_direct_employers=False,
+            company_size=None,
+            only_top_companies=False,
+        )
+        with_matcher = await filter_items(items, filt, title_matcher=matcher)
+        plain = await filter_items(items, filt)
+        assert with_matcher == plain
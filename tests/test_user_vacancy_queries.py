@@ -0,0 +1,127 @@
+# tests/test_user_vacancy_queries.py
+
+import pytest
+from sqlalchemy import insert, select, text
+
+from app.db.crud import (
+    _history_query,
+    _unsent_query,
+    get_unsent_vacancies_for_user,
+    get_user_history,
+)
+from app.db.models import (
+    DocumentType,
+    GeneratedDocument,
+    User,
+    UserVacancy,
+    Vacancy,
+    VacancyStatus,
+)
+
+USERS = 20
+PER_USER = 500
+
+
+async def seed(maker) -> None:
+    """20 пользователей по 500 связок: половина показана, каждая десятая скрыта."""
+    async with maker() as session:
+        await session.execute(
+            insert(User), [{"id": u, "telegram_id": u} for u in range(1, USERS + 1)]
+        )
+        await session.execute(
+            insert(Vacancy),
+            [
+                {
+                    "id": v,
+                    "hh_id": str(v),
+                    "title": f"Python {v}",
+                    "company": "Corp",
+                    "url": "",
+                }
+                for v in range(1, PER_USER + 1)
+            ],
+        )
+        await session.execute(
+            insert(UserVacancy),
+            [
+                {
+                    "user_id": u,
+                    "vacancy_id": v,
+                    "status": VacancyStatus.sent if v % 2 else VacancyStatus.new,
+                    "skipped": v % 10 == 0,
+                }
+                for u in range(1, USERS + 1)
+                for v in range(1, PER_USER + 1)
+            ],
+        )
+        await session.execute(
+            insert(GeneratedDocument),
+            [
+                {
+                    "user_id": u,
+                    "vacancy_id": v,
+                    "doc_type": DocumentType.resume,
+                    "content": "",
+                }
+                for u in range(1, USERS + 1)
+                for v in range(1, PER_USER + 1, 5)
+            ],
+        )
+        await session.execute(text("ANALYZE"))
+        await session.commit()
+
+
+async def query_plan(session, stmt) -> str:
+    sql = stmt.compile(session.get_bind(), compile_kwargs={"literal_binds": True})
+    result = await session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+    return "\n".join(row[-1] for row in result.all())
+
+
+@pytest.mark.asyncio
+async def test_unsent_vacancies_newest_first_without_skipped(session_maker):
+    await seed(session_maker)
+    async with session_maker() as session:
+        user = await session.get(User, 3)
+        first = await get_unsent_vacancies_for_user(session, user, limit=5)
+        history = await get_user_history(session, 3, limit=3)
+
+    # новые (чётные), без каждой десятой, новые первыми
+    assert [v.id for v in first] == [498, 496, 494, 492, 488]
+    assert [vac.id for _, vac in history] == [500, 499, 498]
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_do_not_overlap(session_maker):
+    await seed(session_maker)
+    async with session_maker() as session:
+        user = await session.get(User, 1)
+        page = await get_user_history(session, 1, limit=50)
+        next_page = await get_user_history(session, 1, limit=50, before_id=page[-1][0].id)
+        older = await get_unsent_vacancies_for_user(
+            session, user, limit=2, before_id=page[-1][0].id
+        )
+
+    assert not {uv.id for uv, _ in page} & {uv.id for uv, _ in next_page}
+    assert [vac.id for _, vac in next_page] == list(range(450, 400, -1))
+    assert [v.id for v in older] == [448, 446]
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_composite_indexes(session_maker):
+    await seed(session_maker)
+    async with session_maker() as session:
+        unsent = await query_plan(session, _unsent_query(7, 5, before_id=1000))
+        history = await query_plan(session, _history_query(7, 10))
+        docs = await query_plan(
+            session,
+            select(GeneratedDocument).where(
+                GeneratedDocument.user_id == 7, GeneratedDocument.vacancy_id.in_([1, 6])
+            ),
+        )
+
+    assert "USING INDEX ix_user_vacancies_unsent" in unsent
+    assert "USING INDEX ix_user_vacancies_user_id_id" in history
+    # порядок уже дан индексом — отдельной сортировки нет
+    assert "TEMP B-TREE" not in unsent
+    assert "TEMP B-TREE" not in history
+    assert "USING INDEX ix_generated_documents_user_vacancy" in docs
@@ -0,0 +1,140 @@
+# tests/test_vacancy_details.py
+
+from datetime import datetime, timedelta
+import asyncio
+
+import httpx
+import pytest
+
+from app.db.models import Vacancy, VacancyDetail
+from app.services.hh_client import HHClient
+from app.services.vacancy_details import VacancyDetailFetcher, html_to_text
+
+from conftest import FakeClock
+
+DESCRIPTION = (
+    "<p><strong>Чем заниматься:</strong></p>"
+    "<ul><li>писать сервисы на Python</li><li>ревьюить код</li></ul>"
+    "<p>Зарплата &mdash; по итогам собеседования</p>"
+)
+
+
+def make_fake_hh(calls: list[httpx.Request], delay: float = 0.0) -> HHClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(delay)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        hh_id = request.url.path.rsplit("/", 1)[-1]
+        if hh_id == "404":
+            return httpx.Response(404, json={"errors": [{"type": "not_found"}]})
+        return httpx.Response(
+            200,
+            json={"id": hh_id, "description": DESCRIPTION, "key_skills": [{"name": "SQL"}]},
+            headers={"ETag": '"v1"'},
+        )
+
+    return HHClient(transport=httpx.MockTransport(handler), backoff_base=0)
+
+
+async def make_vacancies(maker, *hh_ids: str) -> list[Vacancy]:
+    async with maker() as session:
+        vacancies = [
+            Vacancy(hh_id=hh_id, title="Python", company="Corp", url="", snippet="Сниппет")
+            for hh_id in hh_ids
+        ]
+        session.add_all(vacancies)
+        await session.commit()
+        return vacancies
+
+
+def test_html_to_text_keeps_paragraphs_and_list_items():
+    assert html_to_text(DESCRIPTION) == (
+        "Чем заниматься:\n"
+        "- писать сервисы на Python\n"
+        "- ревьюить код\n"
+        "Зарплата — по итогам собеседования"
+    )
+    assert html_to_text(None) == ""
+
+
+@pytest.mark.asyncio
+async def test_detail_is_fetched_once_and_shared_between_calls(session_maker):
+    [vacancy] = await make_vacancies(session_maker, "1")
+    calls: list[httpx.Request] = []
+    fetcher = VacancyDetailFetcher(ttl=60, client=make_fake_hh(calls))
+
+    async with session_maker() as session:
+        first = await fetcher.get_description(session, vacancy)
+    async with session_maker() as session:
+        second = await fetcher.get_description(session, vacancy)
+
+    assert first == second
+    assert first.startswith("Чем заниматься:")
+    assert first.endswith("Ключевые навыки: SQL")
+    assert len(calls) == 1
+    assert fetcher.stats() == {"hits": 1, "misses": 1, "revalidated": 0}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_for_same_vacancy_share_one_hh_call(session_maker):
+    [vacancy] = await make_vacancies(session_maker, "1")
+    calls: list[httpx.Request] = []
+    fetcher = VacancyDetailFetcher(ttl=60, client=make_fake_hh(calls, delay=0.05))
+
+    async def generate():
+        async with session_maker() as session:
+            return await fetcher.get_description(session, vacancy)
+
+    results = await asyncio.gather(*(generate() for _ in range(5)))
+
+    assert len(set(results)) == 1
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_caller_without_body_does_not_share_conditional_request():
+    calls: list[httpx.Request] = []
+    fetcher = VacancyDetailFetcher(ttl=60, client=make_fake_hh(calls, delay=0.05))
+
+    # один перепроверяет свою копию, у другого описания ещё нет
+    revalidated, fresh = await asyncio.gather(
+        fetcher._fetch("1", '"v1"'), fetcher._fetch("1", None)
+    )
+
+    assert revalidated["not_modified"] is True
+    assert fresh["not_modified"] is False
+    assert fresh["description"].startswith("Чем заниматься:")
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_detail_is_revalidated_with_etag(session_maker):
+    [vacancy] = await make_vacancies(session_maker, "1")
+    calls: list[httpx.Request] = []
+    clock = FakeClock(datetime(2026, 1, 1, 12, 0))
+    fetcher = VacancyDetailFetcher(ttl=60, client=make_fake_hh(calls), clock=clock)
+
+    async with session_maker() as session:
+        first = await fetcher.get_description(session, vacancy)
+    clock.now += timedelta(seconds=120)
+    async with session_maker() as session:
+        second = await fetcher.get_description(session, vacancy)
+        detail = await session.get(VacancyDetail, vacancy.id)
+
+    assert second == first
+    assert calls[1].headers["If-None-Match"] == '"v1"'
+    assert fetcher.revalidated == 1
+    assert detail.expires_at == clock.now + timedelta(seconds=60)
+
+
+@pytest.mark.asyncio
+async def test_failed_fetch_returns_none_and_keeps_other_vacancies(session_maker):
+    ok, missing = await make_vacancies(session_maker, "1", "404")
+    fetcher = VacancyDetailFetcher(ttl=60, client=make_fake_hh([]))
+
+    async with session_maker() as session:
+        result = await fetcher.get_descriptions(session, [ok, missing])
+
+    assert result[ok.id].startswith("Чем заниматься:")
+    assert result[missing.id] is None
@@ -0,0 +1,103 @@
+# tests/test_vacancy_filters.py
+
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.db.models import CompanySize
+from app.services.hh_client import HHClient
+from app.services.vacancy_filters import EmployerDetailCache, compile_filter, filter_items
+
+
+def make_filter(**kwargs):
+    values = dict(
+        position=None,
+        only_direct_employers=False,
+        company_size=None,
+        only_top_companies=False,
+    )
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+def item(hh_id: str, title: str = "Python developer", **employer) -> dict:
+    return {"id": hh_id, "name": title, "employer": employer}
+
+
+EMPLOYERS = {
+    "10": {"type": "company", "open_vacancies": 120, "trusted": True},
+    "20": {"type": "agency", "open_vacancies": 300, "trusted": True},
+    "30": {"type": "company", "open_vacancies": 2, "trusted": False},
+}
+
+
+def make_employer_cache(calls: list[str]) -> EmployerDetailCache:
+    def handler(request: httpx.Request) -> httpx.Response:
+        employer_id = request.url.path.rsplit("/", 1)[-1]
+        calls.append(employer_id)
+        return httpx.Response(200, json={"id": employer_id, **EMPLOYERS[employer_id]})
+
+    client = HHClient(transport=httpx.MockTransport(handler))
+    return EmployerDetailCache(ttl=60, max_size=100, client=client)
+
+
+ITEMS = [
+    item("1", id="10", name="Big Corp"),
+    item("2", id="20", name="Staffing Agency"),
+    item("3", id="30", name="Small Startup"),
+    item("4", name="Anonymous"),
+    item("5", title="Повар", id="10", name="Big Corp"),
+]
+
+
+def test_empty_filter_compiles_to_nothing():
+    assert not compile_filter(make_filter())
+    assert compile_filter(make_filter(position="python")).needs_employer_details is False
+
+
+@pytest.mark.asyncio
+async def test_filter_items_without_filters_keeps_everything():
+    assert await filter_items(ITEMS, make_filter()) == ITEMS
+
+
+@pytest.mark.asyncio
+async def test_direct_employers_use_cached_employer_details():
+    calls: list[str] = []
+    cache = make_employer_cache(calls)
+    filt = make_filter(position="python", only_direct_employers=True)
+
+    kept = await filter_items(ITEMS, filt, employer_cache=cache)
+    again = await filter_items(ITEMS, filt, employer_cache=cache)
+
+    assert [i["id"] for i in kept] == ["1", "3"]
+    assert again == kept
+    # каждая карточка загружена один раз
+    assert sorted(calls) == ["10", "20", "30"]
+
+
+@pytest.mark.asyncio
+async def test_employer_details_only_for_items_passing_title():
+    calls: list[str] = []
+    cache = make_employer_cache(calls)
+    filt = make_filter(position="повар", only_direct_employers=True)
+
+    kept = await filter_items(ITEMS, filt, employer_cache=cache)
+
+    assert [i["id"] for i in kept] == ["5"]
+    # остальные отсеяны по названию — их работодателей не запрашиваем
+    assert calls == ["10"]
+
+
+@pytest.mark.asyncio
+async def test_company_size_and_top_companies():
+    cache = make_employer_cache([])
+
+    large = await filter_items(
+        ITEMS, make_filter(company_size=CompanySize.large), employer_cache=cache
+    )
+    top = await filter_items(ITEMS, make_filter(only_top_companies=True), employer_cache=cache)
+
+    # у анонимной вакансии размер неизвестен — не выкидываем
+    assert [i["id"] for i in large] == ["1", "2", "4", "5"]
+    assert [i["id"] for i in top] == ["1", "2", "5"]
@@ -0,0 +1,211 @@
+# tests/test_vacancy_ingestion.py
+
+from datetime import datetime
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.db import crud
+from app.db.crud import get_search_cursors, get_vacancy_raw, link_vacancies_to_user
+from app.db.models import SearchFilter, User, UserVacancy, Vacancy, VacancyPayload
+from app.services import hh_service
+from app.services.hh_service import cursor_since, store_vacancies_for_user
+from app.utils.compression import CODEC_ZLIB, CODEC_ZSTD, compress_json, decompress_json
+
+
+def make_items(n: int, start: int = 0, published_at: str | None = None) -> list[dict]:
+    return [
+        {
+            "id": str(1000 + i),
+            "name": f"Python developer {i}",
+            "employer": {"id": "1", "name": "ООО Рога и Копыта"},
+            "area": {"id": "1", "name": "Москва"},
+            "salary": {"from": 100000, "to": None, "currency": "RUR"},
+            "alternate_url": f"https://hh.ru/vacancy/{1000 + i}",
+            "published_at": published_at,
+        }
+        for i in range(start, start + n)
+    ]
+
+
+async def make_user(
+    maker, telegram_id: int, position: str | None = None
+) -> tuple[User, SearchFilter]:
+    async with maker() as session:
+        user = User(telegram_id=telegram_id)
+        session.add(user)
+        await session.flush()
+        filt = SearchFilter(user_id=user.id, position=position)
+        session.add(filt)
+        await session.commit()
+        return user, filt
+
+
+@pytest.mark.asyncio
+async def test_store_vacancies_uses_constant_number_of_statements(session_maker):
+    user, filt = await make_user(session_maker, 1)
+    # первый вызов заводит курсор фильтра — его не считаем
+    async with session_maker() as session:
+        await store_vacancies_for_user(session, user, filt, make_items(1, 500))
+
+    counts = []
+    for n, start in ((10, 0), (100, 10)):
+        session_maker.statements.clear()
+        async with session_maker() as session:
+            new = await store_vacancies_for_user(session, user, filt, make_items(n, start))
+        assert len(new) == n
+        counts.append(len(session_maker.statements))
+
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.asyncio
+async def test_store_vacancies_is_idempotent_and_shares_vacancies(session_maker):
+    first, first_filt = await make_user(session_maker, 1, position="python")
+    second, second_filt = await make_user(session_maker, 2, position="python")
+    items = make_items(5)
+
+    async with session_maker() as session:
+        assert len(await store_vacancies_for_user(session, first, first_filt, items)) == 5
+        # повторная загрузка тех же вакансий ничего не дублирует
+        assert await store_vacancies_for_user(session, first, first_filt, items) == []
+        # второй пользователь получает те же строки vacancies
+        assert await store_vacancies_for_user(session, second, second_filt, items) == []
+
+        vacancies = await session.scalar(select(func.count()).select_from(Vacancy))
+        links = await session.scalar(select(func.count()).select_from(UserVacancy))
+
+    assert vacancies == 5
+    assert links == 10
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_splits_rows_into_chunks(session_maker, monkeypatch):
+    monkeypatch.setattr(crud, "VACANCY_CHUNK_SIZE", 4)
+    rows = [hh_service._vacancy_row(item) for item in make_items(10)]
+
+    async with session_maker() as session:
+        # часть строк уже есть — в разных пачках
+        await crud.bulk_upsert_vacancies(session, [rows[1], rows[6]])
+        session_maker.statements.clear()
+        new, ids_by_hh_id = await crud.bulk_upsert_vacancies(session, rows)
+        await session.commit()
+        stored = await session.scalar(select(func.count()).select_from(Vacancy))
+
+    inserts = [s for s in session_maker.statements if s.startswith("INSERT INTO vacancies")]
+    assert len(inserts) == 3
+    assert len(new) == 8
+    assert stored == 10
+    assert set(ids_by_hh_id) == {row["hh_id"] for row in rows}
+
+
+@pytest.mark.asyncio
+async def test_link_vacancies_ignores_existing_links(session_maker):
+    user, filt = await make_user(session_maker, 1)
+
+    async with session_maker() as session:
+        await store_vacancies_for_user(session, user, filt, make_items(3))
+        ids = (await session.scalars(select(Vacancy.id))).all()
+
+        # имитируем параллельный поиск, который уже вставил те же связки
+        assert await link_vacancies_to_user(session, user.id, list(ids)) == []
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_cursor_skips_already_seen_vacancies(session_maker):
+    user, filt = await make_user(session_maker, 1)
+    older = make_items(3, published_at="2025-01-01T12:00:00+0300")
+    newer = make_items(2, start=3, published_at="2025-01-01T13:00:00+0300")
+
+    async with session_maker() as session:
+        await store_vacancies_for_user(session, user, filt, older + newer)
+        cursor = (await get_search_cursors(session, [filt.id]))[filt.id]
+        assert cursor.last_published_at == datetime(2025, 1, 1, 10, 0)
+        assert cursor.last_hh_ids == ["1003", "1004"]
+
+        # повторная выдача с тем же окном: всё уже видено, в БД не пишем
+        session_maker.statements.clear()
+        await store_vacancies_for_user(session, user, filt, older + newer)
+        assert not any(st.startswith("INSERT INTO vacancies") for st in session_maker.statements)
+
+
+@pytest.mark.asyncio
+async def test_filters_see_only_items_after_cursor(session_maker, monkeypatch):
+    user, filt = await make_user(session_maker, 1, position="python")
+    older = make_items(3, published_at="2025-01-01T12:00:00+0300")
+    newer = make_items(2, start=3, published_at="2025-01-01T13:00:00+0300")
+    filtered: list[list[str]] = []
+    real_filter_items = hh_service.filter_items
+
+    async def filter_items(items, *args, **kwargs):
+        filtered.append([item["id"] for item in items])
+        return await real_filter_items(items, *args, **kwargs)
+
+    monkeypatch.setattr(hh_service, "filter_items", filter_items)
+
+    async with session_maker() as session:
+        await store_vacancies_for_user(session, user, filt, older)
+        await store_vacancies_for_user(session, user, filt, older + newer)
+
+    # уже виденное отсекается курсором до фильтров (и карточек работодателей)
+    assert filtered == [["1000", "1001", "1002"], ["1003", "1004"]]
+
+
+@pytest.mark.asyncio
+async def test_cursor_not_advanced_for_incomplete_result_and_reset_on_filter_change(
+    session_maker,
+):
+    user, filt = await make_user(session_maker, 1)
+    items = make_items(2, published_at="2025-01-01T12:00:00+0300")
+
+    async with session_maker() as session:
+        await store_vacancies_for_user(session, user, filt, items, complete=False)
+        assert await get_search_cursors(session, [filt.id]) == {}
+
+        await store_vacancies_for_user(session, user, filt, items)
+        cursor = (await get_search_cursors(session, [filt.id]))[filt.id]
+        assert cursor_since(filt, cursor) == datetime(2025, 1, 1, 9, 0)
+
+        filt.updated_at = datetime(2030, 1, 1)
+        assert cursor_since(filt, cursor) is None
+
+
+@pytest.mark.asyncio
+async def test_store_vacancies_fills_columns_and_compresses_payload(session_maker):
+    user, filt = await make_user(session_maker, 1)
+    item = make_items(1)[0]
+    item.update(
+        snippet={
+            "responsibility": "Писать сервисы на <highlighttext>Python</highlighttext>",
+            "requirement": None,
+        },
+        schedule={"id": "remote", "name": "Удаленная работа"},
+        experience={"id": "between1And3", "name": "От 1 года до 3 лет"},
+    )
+
+    async with session_maker() as session:
+        [vacancy] = await store_vacancies_for_user(session, user, filt, [item])
+        payload = await session.get(VacancyPayload, vacancy.id)
+        raw = await get_vacancy_raw(session, vacancy.id)
+
+    assert vacancy.employer_id == "1"
+    assert vacancy.snippet == "Писать сервисы на Python"
+    assert vacancy.schedule == "remote"
+    assert vacancy.experience == "between1And3"
+    assert payload.codec == CODEC_ZSTD
+    assert raw == item
+
+
+@pytest.mark.parametrize("codec", [CODEC_ZLIB, CODEC_ZSTD])
+def test_compress_json_roundtrip(codec):
+    obj = {"id": "1", "name": "Разработчик", "items": list(range(100))}
+    written, data = compress_json(obj, codec=codec)
+    assert written == codec
+    assert len(data) < len(json.dumps(obj, ensure_ascii=False).encode())
+    assert decompress_json(codec, data) == obj
+
+
+def test_new_payloads_are_zstd():
+    assert compress_json({"id": "1"})[0] == CODEC_ZSTD
@@ -0,0 +1,233 @@
+# tests/test_vacancy_pool.py
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app.config import config
+from app.db.models import PoolCursor, SearchFilter, User, UserVacancy
+from app.services.hh_client import HHClient
+from app.services.vacancy_pool import CrawlSpec, Percolator, crawl_pool, crawl_specs, percolate
+
+
+def hh_time(delta_minutes: int = 0) -> str:
+    moment = datetime.utcnow() - timedelta(minutes=delta_minutes)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S+0000")
+
+
+def make_target(filter_id: int, **kwargs):
+    values = dict(
+        id=filter_id,
+        position=None,
+        city=None,
+        min_salary=None,
+        metro_ids=None,
+        freshness_days=1,
+        employment_types=None,
+        experience_level=None,
+        only_direct_employers=False,
+        company_size=None,
+        only_top_companies=False,
+    )
+    values.update(kwargs)
+    user = SimpleNamespace(id=100 + filter_id, desired_position=None, city=None)
+    return user, SimpleNamespace(**values)
+
+
+def make_item(hh_id: str, name: str = "Python developer", **extra) -> dict:
+    item = {
+        "id": hh_id,
+        "name": name,
+        "employer": {"id": "1", "name": "Corp"},
+        "area": {"id": "1", "name": "Москва"},
+        "salary": None,
+        "alternate_url": f"https://hh.ru/vacancy/{hh_id}",
+        "published_at": hh_time(),
+    }
+    item.update(extra)
+    return item
+
+
+TARGETS = [
+    make_target(1, position="python", city="Москва"),
+    make_target(2, position="java", city="Москва"),
+    make_target(3, position="python", city="Санкт-Петербург"),
+    make_target(4, city="Россия"),
+    make_target(5, position="python", min_salary=200000),
+    make_target(6, position="python", experience_level="3-6", employment_types=["remote"]),
+    make_target(7, metro_ids=["1.61"]),
+]
+
+
+def matches(percolator: Percolator, item: dict) -> set[int]:
+    candidates = percolator.candidates(item)
+    return percolator.match(item, candidates, item["employer"])
+
+
+def test_percolator_uses_area_hierarchy_and_title():
+    percolator = Percolator(TARGETS)
+    # 4 — вся Россия: Москва входит в неё
+    assert matches(percolator, make_item("1")) == {1, 4}
+    assert matches(percolator, make_item("2", area={"id": "2"})) == {3, 4}
+    assert matches(percolator, make_item("3", name="Java developer")) == {2, 4}
+
+
+def test_percolator_salary_experience_schedule_and_metro():
+    percolator = Percolator(TARGETS)
+    rich = make_item("1", salary={"from": 150000, "to": 250000, "currency": "RUR"})
+    assert 5 in matches(percolator, rich)
+    poor = make_item("2", salary={"from": 100000, "to": 150000, "currency": "RUR"})
+    assert 5 not in matches(percolator, poor)
+
+    remote = make_item(
+        "3",
+        experience={"id": "between3And6"},
+        schedule={"id": "remote"},
+    )
+    assert 6 in matches(percolator, remote)
+    assert 6 not in matches(percolator, make_item("4", schedule={"id": "remote"}))
+
+    near_metro = make_item(
+        "5", name="Повар", address={"metro_stations": [{"station_id": "1.61"}]}
+    )
+    assert matches(percolator, near_metro) == {4, 7}
+
+
+def test_percolator_salary_matches_hh_semantics():
+    percolator = Percolator(
+        [make_target(1, min_salary=200000)],
+        currency_rates={"RUR": 1.0, "USD": 0.01},
+    )
+    # вилка должна включать сумму фильтра
+    assert matches(percolator, make_item("1", salary={"from": 150000, "currency": "RUR"})) == {1}
+    assert matches(percolator, make_item("2", salary={"from": 300000, "currency": "RUR"})) == set()
+    assert matches(percolator, make_item("3", salary={"to": 180000, "currency": "RUR"})) == set()
+    # 2500 USD = 250 000 ₽ по курсу hh.ru
+    usd = make_item("4", salary={"from": 1500, "to": 2500, "currency": "USD"})
+    assert matches(percolator, usd) == {1}
+    # без зарплаты — отсекает only_with_salary, как и в запросе к hh.ru
+    assert matches(percolator, make_item("5")) == set()
+    # валюта без курса — не теряем
+    assert matches(percolator, make_item("6", salary={"from": 1, "currency": "XYZ"})) == {1}
+
+
+def test_percolator_checks_freshness_and_employer_filters():
+    percolator = Percolator(
+        [make_target(1, freshness_days=1), make_target(2, only_direct_employers=True)]
+    )
+    stale = make_item("1", published_at=hh_time(60 * 24 * 2))
+    assert matches(percolator, stale) == set()
+    anonymous = make_item("2", employer={"name": "Аноним"})
+    assert matches(percolator, anonymous) == {1}
+
+
+def test_crawl_specs_one_per_area():
+    specs = crawl_specs(TARGETS, roles=("96",))
+    assert [s.area for s in specs] == [1, 2, 113, None]
+    assert all(s.roles == ("96",) for s in specs)
+    assert specs[0].params(None)["professional_role"] == ["96"]
+
+
+def make_fake_hh(pages: dict[str, list[dict]], calls: list[httpx.Request]) -> HHClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        items = pages.get(request.url.params.get("area"), [])
+        return httpx.Response(200, json={"items": items, "found": len(items), "pages": 1})
+
+    return HHClient(transport=httpx.MockTransport(handler))
+
+
+async def make_db_targets(maker) -> list[tuple[User, SearchFilter]]:
+    async with maker() as session:
+        targets = []
+        for telegram_id, position in ((1, "python"), (2, "java"), (3, None)):
+            user = User(telegram_id=telegram_id)
+            session.add(user)
+            await session.flush()
+            filt = SearchFilter(user_id=user.id, position=position, city="Москва")
+            session.add(filt)
+            targets.append((user, filt))
+        await session.commit()
+        return targets
+
+
+@pytest.mark.asyncio
+async def test_crawl_and_percolate_link_users_in_bulk(session_maker):
+    targets = await make_db_targets(session_maker)
+    moscow = [
+        make_item("1", "Senior Python developer"),
+        make_item("2", "Java developer"),
+        make_item("3", "Повар"),
+    ]
+    calls: list[httpx.Request] = []
+    client = make_fake_hh({"1": moscow}, calls)
+    specs = crawl_specs(targets)
+    assert [s.area for s in specs] == [1]
+
+    async with session_maker() as session:
+        docs = await crawl_pool(session, specs, client=client)
+        session_maker.statements.clear()
+        created = await percolate(session, docs, Percolator(targets))
+        inserts = [s for s in session_maker.statements if s.startswith("INSERT INTO user_vacancies")]
+
+        links = (await session.execute(select(UserVacancy.user_id, UserVacancy.vacancy_id))).all()
+        cursor = await session.get(PoolCursor, specs[0].key)
+
+    assert len(docs) == 3
+    assert len(calls) == 1
+    # python -> 1, java -> 1, без должности -> все 3
+    assert created == len(links) == 5
+    assert len(inserts) == 1
+    assert cursor.last_published_at is not None
+
+    # повторный цикл: отметка отсекает уже виденное
+    async with session_maker() as session:
+        again = await crawl_pool(session, specs, client=client)
+    assert again == []
+    assert "date_from" in calls[1].url.params
+
+
+@pytest.mark.asyncio
+async def test_crawl_splits_windows_deeper_than_hh_returns(session_maker, monkeypatch):
+    monkeypatch.setattr(config, "hh_pool_max_pages", 1)
+    # 250 вакансий за последние 5 часов, а один поиск отдаёт только 100
+    items = [make_item(str(i), published_at=hh_time(i)) for i in range(250)]
+    calls: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        params = request.url.params
+        date_from = datetime.fromisoformat(params["date_from"])
+        date_to = datetime.fromisoformat(params.get("date_to", "9999-01-01T00:00:00"))
+        window = [
+            item
+            for item in items
+            if date_from
+            <= datetime.strptime(item["published_at"], "%Y-%m-%dT%H:%M:%S+0000")
+            <= date_to
+        ]
+        page = window[:100]
+        return httpx.Response(
+            200, json={"items": page, "found": len(window), "pages": -(-len(window) // 100)}
+        )
+
+    client = HHClient(transport=httpx.MockTransport(handler))
+    spec = CrawlSpec(1)
+    async with session_maker() as session:
+        docs = await crawl_pool(session, [spec], client=client)
+        cursor = await session.get(PoolCursor, spec.key)
+
+    assert len(docs) == 250
+    assert len(calls) > 1
+    assert any(c.url.params.get("date_to") for c in calls)
+    # все окна прочитаны целиком — отметка сдвинута
+    assert cursor is not None and cursor.last_published_at is not None
+
+
+def test_crawl_spec_key_ignores_date():
+    spec = CrawlSpec(1, ("96",))
+    assert spec.key == CrawlSpec(1, ("96",)).key
+    assert spec.key != CrawlSpec(2, ("96",)).key